@@ -1,159 +1,324 @@
+import os
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
-import re
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from difflib import SequenceMatcher
-import spacy
+from functools import lru_cache
+from .embeddings import encode
+from .phrase_cache import phrase_cache
 
-model = SentenceTransformer('all-MiniLM-L6-v2')
-nlp = spacy.load('en_core_web_sm', disable=['ner', 'parser'])
+SKILL_FUZZY_THRESHOLD = 0.4
+SKILL_STRONG_MATCH = 0.6
+# 'sequence' gives the SequenceMatcher ratios scores have always used, computed once per distinct pair of skills;
+# 'ngram' compares character n-gram vectors in one sparse product, no faster once scikit-learn is loaded and it moves
+# skills scores by up to ~0.14. benchmarks/skill_match_benchmark.py measures both against the original per-pair loop
+SKILL_FUZZY_METHOD = os.getenv("SKILL_FUZZY_METHOD", "sequence")
+# Skill names repeat across CVs and uploads, so their pairwise ratios are cached
+SKILL_FUZZY_CACHE_ENTRIES = int(os.getenv("SKILL_FUZZY_CACHE_ENTRIES", "200000"))
+
+_char_vectorizer = None
+
+SECTIONS = ('skills', 'education', 'experience', 'industry', 'projects', 'certifications')
+
+DEFAULT_CONFIG = {
+    'weights': {
+        'skills': 0.35,
+        'education': 0.15,
+        'experience': 0.25,
+        'industry': 0.10,
+        'projects': 0.10,
+        'certifications': 0.05
+    }
+}
+
+# The section scores each structured JD field feeds into
+JD_FIELD_SECTIONS = {
+    'skills': ('skills',),
+    'education': ('education',),
+    'field_of_study': ('education',),
+    'experience': ('experience',),
+    'responsibilities': ('experience',),
+    'industry': ('industry',),
+    'projects': ('projects',),
+    'certifications': ('certifications',)
+}
+# The extract_sections texts each section score is computed from
+SECTION_TEXT_KEYS = {
+    'skills': ('skills',),
+    'education': ('field_of_study',),
+    'experience': ('experience_text',),
+    'industry': ('industry',),
+    'projects': ('projects',),
+    'certifications': ('certifications',)
+}
+
+EDU_LEVELS = {'high school': 1, 'associate': 1.5, 'bachelor': 2, 'master': 3, 'phd': 4, 'doctorate': 4}
 
 def normalize_text(text: str) -> str:
     return text.lower().strip() if isinstance(text, str) else ""
 
+@lru_cache(maxsize=SKILL_FUZZY_CACHE_ENTRIES)
+def _sequence_ratio(a: str, b: str) -> float:
+    return SequenceMatcher(None, a, b).ratio()
+
 def fuzzy_match(a: str, b: str) -> float:
-    return SequenceMatcher(None, a.lower(), b.lower()).ratio()
+    return _sequence_ratio(a.lower(), b.lower())
+
+def flatten_text(value) -> str:
+    # Gemini returns sections as strings, lists of strings or lists of objects
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return " ".join(flatten_text(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return " ".join(t for t in (flatten_text(v) for v in value) if t)
+    return ""
 
 def precompute_embeddings(texts: List[str]) -> np.ndarray:
     texts = [normalize_text(t) for t in texts if isinstance(t, str) and t.strip()]
-    return model.encode(texts, batch_size=16, show_progress_bar=False) if texts else np.array([])
+    return encode(texts) if texts else np.array([])
+
+def embed_texts(texts: List[str]) -> Dict[str, np.ndarray]:
+    """Encode every distinct text in a single pass and return L2-normalised vectors keyed by text."""
+    unique = list(dict.fromkeys(t for t in texts if t))
+    if not unique:
+        return {}
+    embs = phrase_cache.encode(unique)
+    norms = np.linalg.norm(embs, axis=1, keepdims=True)
+    embs = embs / np.where(norms == 0, 1.0, norms)
+    return dict(zip(unique, embs))
 
-def skill_similarity(jd_skill_emb, cv_skill_embs, jd_skill_raw, cv_skill_raws, threshold=0.4) -> float:
-    if jd_skill_emb.size == 0 or cv_skill_embs.size == 0:
+def _skill_list(value) -> List[str]:
+    skills = value if isinstance(value, list) else (value.split(',') if isinstance(value, str) else [])
+    return [s for s in skills if isinstance(s, str) and s.strip()]
+
+def _years(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
         return 0.0
-    cosine_scores = cosine_similarity(jd_skill_emb.reshape(1, -1), cv_skill_embs)[0]
-    max_cosine = np.max(cosine_scores)
-    if max_cosine >= threshold:
-        return max_cosine
-    fuzzy_scores = [fuzzy_match(jd_skill_raw, cv) for cv in cv_skill_raws]
-    return max(fuzzy_scores, default=0.0)
 
-def calculate_match_score(jd_data: Dict, cv_data: Dict, config: Dict = None) -> Dict[str, float]:
-    config = config or {
-        'weights': {
-            'skills': 0.35,
-            'education': 0.15,
-            'experience': 0.25,
-            'industry': 0.10,
-            'projects': 0.10,
-            'certifications': 0.05
-        }
+def _joined(value) -> str:
+    return normalize_text(" ".join(value) if isinstance(value, list) else value)
+
+def extract_sections(data: Dict, experience_key: str) -> Dict:
+    return {
+        'skills': _skill_list(data.get('skills', [])),
+        'education': normalize_text(data.get('education', '')),
+        'field_of_study': normalize_text(data.get('field_of_study', '')),
+        'experience': _years(data.get('experience', 0)),
+        'experience_text': normalize_text(flatten_text(data.get(experience_key, ''))),
+        'industry': _joined(data.get('industry', '')),
+        'projects': normalize_text(flatten_text(data.get('projects', ''))),
+        'certifications': normalize_text(flatten_text(data.get('certifications', '')))
     }
 
-    weights = config['weights']
+TEXT_SECTIONS = ('field_of_study', 'experience_text', 'industry', 'projects', 'certifications')
+
+def _section_texts(sections: Dict) -> List[str]:
+    texts = [normalize_text(s) for s in sections['skills']]
+    texts += [sections[k] for k in TEXT_SECTIONS]
+    return texts
+
+def _grouped_texts(sections: Dict) -> Dict[str, List[str]]:
+    grouped = {'skills': list(dict.fromkeys(t for t in (normalize_text(s) for s in sections['skills']) if t))}
+    grouped.update({k: [sections[k]] if sections[k] else [] for k in TEXT_SECTIONS})
+    return grouped
+
+def _stack(texts: List[str], vectors: Dict[str, np.ndarray]) -> np.ndarray:
+    return np.stack([vectors[t] for t in texts]) if texts else np.empty((0, 0), dtype=np.float32)
+
+def compute_embeddings(items: List[Dict], experience_key: str) -> List[Dict[str, Tuple[List[str], np.ndarray]]]:
+    """Per-section embeddings for many parsed JDs or CVs, encoded in a single pass."""
+    grouped = [_grouped_texts(extract_sections(item, experience_key)) for item in items]
+    vectors = embed_texts([t for g in grouped for texts in g.values() for t in texts])
+    return [{section: (texts, _stack(texts, vectors)) for section, texts in g.items()} for g in grouped]
+
+def compute_jd_embeddings(jd_data: Dict) -> Dict[str, Tuple[List[str], np.ndarray]]:
+    """Embed the JD side once so it can be stored and reused for every later CV batch."""
+    return compute_embeddings([jd_data], 'responsibilities')[0]
+
+def compute_cv_embeddings(cvs: List[Dict]) -> List[Dict[str, Tuple[List[str], np.ndarray]]]:
+    return compute_embeddings(cvs, 'work_experience')
+
+def update_jd_embeddings(jd_data: Dict, previous: Dict) -> Tuple[Dict[str, Tuple[List[str], np.ndarray]], List[str]]:
+    """JD embeddings that reuse the previous ones wherever a section's texts are unchanged; also the re-embedded sections."""
+    grouped = _grouped_texts(extract_sections(jd_data, 'responsibilities'))
+    changed = [section for section, texts in grouped.items() if section not in previous or previous[section][0] != texts]
+    vectors = embed_texts([t for section in changed for t in grouped[section]])
+    embeddings = {
+        section: (texts, _stack(texts, vectors)) if section in changed else previous[section]
+        for section, texts in grouped.items()
+    }
+    return embeddings, changed
 
-    # --- Skills Match ---
-    jd_skills = jd_data.get('skills', [])
-    cv_skills = cv_data.get('skills', [])
-    jd_skills = jd_skills if isinstance(jd_skills, list) else jd_skills.split(',')
-    cv_skills = cv_skills if isinstance(cv_skills, list) else cv_skills.split(',')
+def affected_sections(fields) -> Tuple[str, ...]:
+    """Section scores that depend on any of the given JD fields, in SECTIONS order."""
+    touched = {section for field in fields for section in JD_FIELD_SECTIONS.get(field, ())}
+    return tuple(section for section in SECTIONS if section in touched)
 
-    jd_skill_embs = precompute_embeddings(jd_skills)
-    cv_skill_embs = precompute_embeddings(cv_skills)
+def _pairwise(jd_texts: List[str], cv_texts: List[str], vectors: Dict[str, np.ndarray], default: float) -> np.ndarray:
+    """Cosine similarity of every JD text to every CV text, shape (len(jd_texts), len(cv_texts)); default where either is empty."""
+    scores = np.full((len(jd_texts), len(cv_texts)), default, dtype=np.float64)
+    jd_idx = [j for j, t in enumerate(jd_texts) if t]
+    idx = [i for i, t in enumerate(cv_texts) if t]
+    if jd_idx and idx:
+        jd_mat = np.stack([vectors[jd_texts[j]] for j in jd_idx])
+        cv_mat = np.stack([vectors[cv_texts[i]] for i in idx])
+        scores[np.ix_(jd_idx, idx)] = jd_mat @ cv_mat.T
+    return scores
 
-    skills_score = 0.0
-    if jd_skill_embs.size and cv_skill_embs.size:
-        sims = [
-            skill_similarity(jd_skill_embs[i], cv_skill_embs, jd_skills[i], cv_skills)
-            for i in range(len(jd_skills))
-        ]
-        skills_score = np.mean(sims)
+def _get_char_vectorizer():
+    global _char_vectorizer
+    if _char_vectorizer is None:
+        from sklearn.feature_extraction.text import HashingVectorizer
+        # Unigram+bigram character profiles track SequenceMatcher.ratio() most closely on skill names
+        _char_vectorizer = HashingVectorizer(analyzer='char', ngram_range=(1, 2), alternate_sign=False, norm='l2', n_features=2 ** 18)
+    return _char_vectorizer
+
+def _distinct(b: List[str]) -> tuple:
+    """Distinct lowered strings of b, and the index of each b among them."""
+    lowered = [s.lower() for s in b]
+    position = {s: i for i, s in enumerate(dict.fromkeys(lowered))}
+    return list(position), [position[s] for s in lowered]
+
+def _ngram_similarity(a: List[str], b: List[str]) -> np.ndarray:
+    vectorizer = _get_char_vectorizer()
+    distinct, index = _distinct(b)
+    return (vectorizer.transform([s.lower() for s in a]) @ vectorizer.transform(distinct).T).toarray()[:, index]
+
+def _sequence_similarity(a: List[str], b: List[str]) -> np.ndarray:
+    """fuzzy_match of every a against every b, computed once per distinct (a, b) pair."""
+    distinct, index = _distinct(b)
+    ratios = np.array([[_sequence_ratio(x.lower(), y) for y in distinct] for x in a], dtype=np.float64)
+    return ratios[:, index]
+
+def _skills_scores(jd_skill_lists: List[List[str]], cv_skill_lists: List[List[str]],
+                   vectors: Dict[str, np.ndarray]) -> np.ndarray:
+    """Skills score of every CV against every JD, shape (len(jd_skill_lists), len(cv_skill_lists))."""
+    scores = np.zeros((len(jd_skill_lists), len(cv_skill_lists)), dtype=np.float64)
+    counts = np.array([len(s) for s in cv_skill_lists])
+    has = np.flatnonzero(counts)
+    flat_jd_skills = [s for skills in jd_skill_lists for s in skills]
+    if not flat_jd_skills or not has.size:
+        return scores
+
+    flat_cv_skills = [s for i in has for s in cv_skill_lists[i]]
+    jd_mat = np.stack([vectors[normalize_text(s)] for s in flat_jd_skills])
+    cv_mat = np.stack([vectors[normalize_text(s)] for s in flat_cv_skills])
+    starts = np.concatenate(([0], np.cumsum(counts[has])[:-1]))
+    # Best CV skill for every JD skill of every JD, per candidate: (total JD skills, n_candidates)
+    all_best = np.maximum.reduceat(jd_mat @ cv_mat.T, starts, axis=1).astype(np.float64)
+
+    offset = 0
+    for j, jd_skills in enumerate(jd_skill_lists):
+        if not jd_skills:
+            continue
+        best = all_best[offset:offset + len(jd_skills)]
+        offset += len(jd_skills)
+
+        # Fall back to string similarity wherever the semantic match is weak
+        weak = best < SKILL_FUZZY_THRESHOLD
+        if weak.any():
+            similarity = _sequence_similarity if SKILL_FUZZY_METHOD == 'sequence' else _ngram_similarity
+            rows = np.flatnonzero(weak.any(axis=1))
+            fuzzy = np.zeros_like(best)
+            fuzzy[rows] = np.maximum.reduceat(similarity([jd_skills[r] for r in rows], flat_cv_skills), starts, axis=1)
+            best = np.where(weak, fuzzy, best)
 
         # Boost score if strong overlap
-        matched = [sim for sim in sims if sim >= 0.6]
-        if len(matched) / len(jd_skills) >= 0.75:
-            skills_score += 0.1
-        skills_score = min(skills_score, 1.0)
-
-    # --- Education Match ---
-    edu_levels = {'high school': 1, 'associate': 1.5, 'bachelor': 2, 'master': 3, 'phd': 4, 'doctorate': 4}
-    jd_edu = normalize_text(jd_data.get('education', ''))
-    cv_edu = normalize_text(cv_data.get('education', ''))
-
-    def extract_level(text):
-        for level in edu_levels:
-            if level in text:
-                return edu_levels[level]
-        return 0
-
-    jd_level = extract_level(jd_edu)
-    cv_level = extract_level(cv_edu)
-    education_score = 1.0 if jd_level == 0 else min(cv_level / jd_level, 1.0)
-
-    jd_field = normalize_text(jd_data.get('field_of_study', ''))
-    cv_field = normalize_text(cv_data.get('field_of_study', ''))
-    field_score = 1.0
-    if jd_field and cv_field:
-        emb = model.encode([jd_field, cv_field])
-        field_score = cosine_similarity([emb[0]], [emb[1]])[0][0]
-    education_score *= 0.6 + 0.4 * field_score
-
-    # --- Experience Match ---
-    jd_exp_years = float(jd_data.get('experience', 0))
-    cv_exp_years = float(cv_data.get('experience', 0))
-    exp_years_score = min(cv_exp_years / jd_exp_years, 1.0) if jd_exp_years > 0 else 1.0
-
-    jd_resp = jd_data.get('responsibilities', '')
-    cv_exp = cv_data.get('work_experience', '')
-
-    jd_resp_embs = precompute_embeddings([jd_resp])
-    cv_exp_embs = precompute_embeddings([cv_exp])
-    resp_score = 0.0
-    if jd_resp_embs.size and cv_exp_embs.size:
-        resp_score = cosine_similarity(jd_resp_embs, cv_exp_embs)[0][0]
-
-    experience_score = 0.7 * exp_years_score + 0.3 * resp_score
+        strong = np.count_nonzero(best >= SKILL_STRONG_MATCH, axis=0) / len(jd_skills)
+        scores[j, has] = np.minimum(best.mean(axis=0) + np.where(strong >= 0.75, 0.1, 0.0), 1.0)
+    return scores
+
+def _extract_level(text: str) -> float:
+    for level in EDU_LEVELS:
+        if level in text:
+            return EDU_LEVELS[level]
+    return 0
+
+def section_scores(jd_data: Dict, cvs: List[Dict], jd_embeddings: Dict = None, cv_embeddings: List[Dict] = None) -> np.ndarray:
+    """Raw per-section scores for every CV against one JD, shape (len(cvs), len(SECTIONS))."""
+    return section_score_blocks([jd_data], cvs, [jd_embeddings], cv_embeddings)[0]
+
+def section_score_blocks(jds: List[Dict], cvs: List[Dict], jd_embeddings: List[Dict] = None,
+                         cv_embeddings: List[Dict] = None, sections: Tuple[str, ...] = SECTIONS) -> np.ndarray:
+    """Raw per-section scores for every CV against every JD, shape (len(jds), len(cvs), len(sections)).
+
+    Each section is one matrix product of all JD vectors against all CV vectors; sections not asked for are skipped.
+    """
+    jd_sections = [extract_sections(jd, 'responsibilities') for jd in jds]
+    cv_sections = [extract_sections(cv, 'work_experience') for cv in cvs]
 
+    vectors = {}
+    for embeddings in list(jd_embeddings or []) + list(cv_embeddings or []):
+        for texts, embs in (embeddings or {}).values():
+            vectors.update(zip(texts, embs))
+    keys = {key for section in sections for key in SECTION_TEXT_KEYS[section]}
+    texts = []
+    for extracted in jd_sections + cv_sections:
+        if 'skills' in keys:
+            texts += [normalize_text(s) for s in extracted['skills']]
+        texts += [extracted[k] for k in TEXT_SECTIONS if k in keys]
+    vectors.update(embed_texts([t for t in texts if t not in vectors]))
+
+    def column(extracted, key):
+        return [s[key] for s in extracted]
+
+    scores = {}
+    if 'skills' in sections:
+        scores['skills'] = _skills_scores(column(jd_sections, 'skills'), column(cv_sections, 'skills'), vectors)
+    if 'education' in sections:
+        scores['education'] = _education_scores(jd_sections, cv_sections, vectors)
+    if 'experience' in sections:
+        scores['experience'] = _experience_scores(jd_sections, cv_sections, vectors)
+    # --- Industry / Projects / Certifications ---
+    for section in ('industry', 'projects', 'certifications'):
+        if section in sections:
+            scores[section] = _pairwise(column(jd_sections, section), column(cv_sections, section), vectors, 0.5)
+    return np.stack([scores[section] for section in sections], axis=-1)
+
+def _education_scores(jd_sections: List[Dict], cv_sections: List[Dict], vectors: Dict[str, np.ndarray]) -> np.ndarray:
+    jd_levels = np.array([_extract_level(s['education']) for s in jd_sections], dtype=np.float64)[:, None]
+    cv_levels = np.array([_extract_level(s['education']) for s in cv_sections], dtype=np.float64)
+    education = np.where(jd_levels == 0, 1.0, np.minimum(cv_levels / np.where(jd_levels == 0, 1.0, jd_levels), 1.0))
+    field = _pairwise([s['field_of_study'] for s in jd_sections], [s['field_of_study'] for s in cv_sections], vectors, 1.0)
+    return education * (0.6 + 0.4 * field)
+
+def _experience_scores(jd_sections: List[Dict], cv_sections: List[Dict], vectors: Dict[str, np.ndarray]) -> np.ndarray:
+    jd_years = np.array([s['experience'] for s in jd_sections], dtype=np.float64)[:, None]
+    cv_years = np.array([s['experience'] for s in cv_sections], dtype=np.float64)
+    years = np.where(jd_years > 0, np.minimum(cv_years / np.where(jd_years > 0, jd_years, 1.0), 1.0), 1.0)
+    resp = _pairwise([s['experience_text'] for s in jd_sections], [s['experience_text'] for s in cv_sections], vectors, 0.0)
+    experience = 0.7 * years + 0.3 * resp
     # Boost for strong alignment
-    if exp_years_score >= 0.9 and resp_score >= 0.6:
-        experience_score += 0.1
-    experience_score = min(experience_score, 1.0)
-
-    # --- Industry Match ---
-    jd_industry = normalize_text(" ".join(jd_data.get('industry', [])) if isinstance(jd_data.get('industry'), list) else jd_data.get('industry', ''))
-    cv_industry = normalize_text(" ".join(cv_data.get('industry', [])) if isinstance(cv_data.get('industry'), list) else cv_data.get('industry', ''))
-    industry_score = 0.5
-    if jd_industry and cv_industry:
-        emb = model.encode([jd_industry, cv_industry])
-        industry_score = cosine_similarity([emb[0]], [emb[1]])[0][0]
-
-    # --- Projects Match ---
-    jd_proj = jd_data.get('projects', '')
-    cv_proj = cv_data.get('projects', '')
-    proj_score = 0.5
-    if jd_proj and cv_proj:
-        jd_proj_emb = precompute_embeddings([jd_proj])
-        cv_proj_emb = precompute_embeddings([cv_proj])
-        if jd_proj_emb.size and cv_proj_emb.size:
-            proj_score = cosine_similarity(jd_proj_emb, cv_proj_emb)[0][0]
-
-    # --- Certifications Match ---
-    jd_certs = jd_data.get('certifications', '')
-    cv_certs = cv_data.get('certifications', '')
-    cert_score = 0.5
-    if jd_certs and cv_certs:
-        jd_cert_emb = precompute_embeddings([jd_certs])
-        cv_cert_emb = precompute_embeddings([cv_certs])
-        if jd_cert_emb.size and cv_cert_emb.size:
-            cert_score = cosine_similarity(jd_cert_emb, cv_cert_emb)[0][0]
-
-    # --- Final Weighted Score ---
-    final_score = (
-        weights['skills'] * skills_score +
-        weights['education'] * education_score +
-        weights['experience'] * experience_score +
-        weights['industry'] * industry_score +
-        weights['projects'] * proj_score +
-        weights['certifications'] * cert_score
-    )
+    experience += np.where((years >= 0.9) & (resp >= 0.6), 0.1, 0.0)
+    return np.minimum(experience, 1.0)
 
-    return {
-        'overall_match': round(final_score, 2),
-        'skills_match': round(skills_score, 2),
-        'education_match': round(education_score, 2),
-        'experience_relevance': round(experience_score, 2),
-        'industry_relevance': round(industry_score, 2),
-        'projects_similarity': round(proj_score, 2),
-        'certifications_match': round(cert_score, 2)
-    }
\ No newline at end of file
+def weight_vector(weights: Dict[str, float]) -> np.ndarray:
+    return np.array([weights[s] for s in SECTIONS], dtype=np.float64)
+
+def scores_from_sections(scores: np.ndarray, config: Dict = None) -> List[Dict[str, float]]:
+    """Turn an N x len(SECTIONS) matrix from section_scores into the per-CV score dicts."""
+    final = scores @ weight_vector((config or DEFAULT_CONFIG)['weights'])
+    return [
+        {
+            'overall_match': round(float(final[i]), 2),
+            'skills_match': round(float(row[0]), 2),
+            'education_match': round(float(row[1]), 2),
+            'experience_relevance': round(float(row[2]), 2),
+            'industry_relevance': round(float(row[3]), 2),
+            'projects_similarity': round(float(row[4]), 2),
+            'certifications_match': round(float(row[5]), 2)
+        }
+        for i, row in enumerate(scores)
+    ]
+
+def calculate_match_scores(jd_data: Dict, cvs: List[Dict], config: Dict = None, jd_embeddings: Dict = None,
+                           cv_embeddings: List[Dict] = None) -> List[Dict[str, float]]:
+    """Score a batch of parsed CVs against one JD with a single embedding pass."""
+    if not cvs:
+        return []
+    return scores_from_sections(section_scores(jd_data, cvs, jd_embeddings, cv_embeddings), config)
+
+def calculate_match_score(jd_data: Dict, cv_data: Dict, config: Dict = None) -> Dict[str, float]:
+    return calculate_match_scores(jd_data, [cv_data], config)[0]
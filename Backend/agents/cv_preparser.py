@@ -0,0 +1,330 @@
+import logging
+import os
+import re
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SKILL_GAZETTEER_FILE = os.getenv("SKILL_GAZETTEER_FILE", "")
+
+SKILLS = [
+    "Python", "Java", "JavaScript", "TypeScript", "C++", "C#", "Go", "Golang", "Rust", "Ruby", "PHP", "Kotlin", "Swift",
+    "Scala", "Perl", "MATLAB", "Bash", "Shell Scripting", "PowerShell", "Objective-C", "Dart", "Julia", "Haskell",
+    "HTML", "CSS", "Sass", "React", "React Native", "Angular", "Vue.js", "Next.js", "Node.js", "Express.js", "jQuery",
+    "Redux", "Tailwind CSS", "Bootstrap", "Flutter", "Django", "Flask", "FastAPI", "Spring", "Spring Boot", "Hibernate",
+    ".NET", "ASP.NET", "Ruby on Rails", "Laravel", "GraphQL", "REST APIs", "REST", "gRPC", "Microservices",
+    "SQL", "MySQL", "PostgreSQL", "SQLite", "Oracle", "SQL Server", "MongoDB", "Cassandra", "DynamoDB", "Redis",
+    "Elasticsearch", "Neo4j", "Snowflake", "BigQuery", "Redshift", "Hive", "HBase",
+    "AWS", "Azure", "GCP", "Google Cloud", "Docker", "Kubernetes", "Terraform", "Ansible", "Jenkins", "GitHub Actions",
+    "GitLab CI", "CI/CD", "Git", "Linux", "Unix", "Nginx", "Prometheus", "Grafana", "Helm", "OpenShift", "Serverless",
+    "Machine Learning", "Deep Learning", "NLP", "Natural Language Processing", "Computer Vision", "Data Science",
+    "Data Analysis", "Data Engineering", "Data Visualization", "Statistics", "A/B Testing", "MLOps", "LLMs",
+    "Generative AI", "Reinforcement Learning", "Time Series", "Feature Engineering",
+    "PyTorch", "TensorFlow", "Keras", "scikit-learn", "Pandas", "NumPy", "SciPy", "Matplotlib", "OpenCV", "Hugging Face",
+    "LangChain", "XGBoost", "Spark", "PySpark", "Hadoop", "Kafka", "Airflow", "dbt", "Databricks", "ETL",
+    "Tableau", "Power BI", "Looker", "Excel", "SAS", "SPSS", "R",
+    "Selenium", "Cypress", "Jest", "PyTest", "JUnit", "Unit Testing", "Test Automation",
+    "Agile", "Scrum", "Kanban", "Jira", "Confluence", "Project Management", "Product Management", "Stakeholder Management",
+    "Figma", "UI/UX", "SEO", "Salesforce", "SAP", "Blockchain", "Solidity", "Embedded Systems", "IoT", "Networking",
+    "Cybersecurity", "Penetration Testing", "Android", "iOS", "Unity", "System Design", "Distributed Systems"
+]
+# Short or everyday words only count as skills when written with the canonical capitalisation
+CASE_SENSITIVE_SKILLS = {"Go", "R", "Swift", "Spring", "REST", "Excel", "Rust", "Dart", "Unity", "Hive", "Oracle", "SAS", "Jest"}
+
+SECTION_HEADINGS = {
+    "summary": ("summary", "profile", "professional summary", "objective", "about me", "career objective"),
+    "skills": ("skills", "technical skills", "key skills", "core competencies", "technologies", "skills and tools"),
+    "experience": ("experience", "work experience", "professional experience", "employment", "employment history",
+                   "work history", "career history"),
+    "education": ("education", "academic background", "qualifications", "academics", "educational qualifications"),
+    "projects": ("projects", "personal projects", "academic projects", "key projects"),
+    "certifications": ("certifications", "certificates", "licenses and certifications", "courses and certifications")
+}
+HEADING_LOOKUP = {title: section for section, titles in SECTION_HEADINGS.items() for title in titles}
+
+# Which sections an LLM needs to see to fill each field
+FIELD_SECTIONS = {
+    "name": ("header",), "email": ("header",), "phone": ("header",), "skills": ("skills",),
+    "education": ("education",), "field_of_study": ("education",), "experience": ("experience",),
+    "work_experience": ("experience",), "experience_details": ("experience",), "projects": ("projects",),
+    "certifications": ("certifications",), "industry": ("summary", "experience")
+}
+# How much each field matters to matching; the overall confidence is the weighted mean
+FIELD_WEIGHTS = {
+    "name": 0.1, "email": 0.05, "phone": 0.05, "skills": 0.25, "experience": 0.1, "experience_details": 0.05,
+    "work_experience": 0.1, "education": 0.1, "field_of_study": 0.05, "industry": 0.05, "projects": 0.05,
+    "certifications": 0.05
+}
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+PHONE_RE = re.compile(r"(?<![\w/])(\+?\(?\d[\d ()-]{8,}\d)(?![\w/])")
+MONTHS = {m: i for i, m in enumerate(("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), 1)}
+_DATE = r"(?:(?:({months})[a-z]*\.?,?\s+)|(\d{{1,2}})[/.-])?((?:19|20)\d{{2}})".format(months="|".join(MONTHS))
+DATE_RANGE_RE = re.compile(
+    _DATE + r"\s*(?:-|–|—|to|until)\s*(?:" + _DATE + r"|(present|current|now|till date|today|ongoing))", re.I
+)
+DEGREE_RE = re.compile(
+    r"\b(bachelor|master|doctor|ph\.?\s?d|doctorate|associate|diploma|high school|mba|bba|bca|mca|"
+    r"b\.?\s?tech|m\.?\s?tech|b\.?\s?e\b|m\.?\s?e\b|b\.?\s?sc|m\.?\s?sc|b\.?\s?s\b|m\.?\s?s\b|b\.?\s?a\b|m\.?\s?a\b|b\.?\s?com|m\.?\s?com)",
+    re.I
+)
+INSTITUTION_RE = re.compile(r"\b(university|institute|college|school|academy|iit|nit|iiit|bits|polytechnic)\b", re.I)
+GPA_RE = re.compile(r"\b(?:c?gpa|grade)\s*:?\s*(\d+(?:\.\d+)?(?:\s*/\s*\d+(?:\.\d+)?)?)", re.I)
+LABEL_RE = re.compile(r"^\s*(industry|sector|domain)\s*:\s*(.+)$", re.I | re.M)
+NAME_RE = re.compile(r"^[A-Z][\w'.-]*(?: [A-Z][\w'.-]*){1,3}$")
+NOT_NAMES = {"curriculum vitae", "resume", "résumé", "cv", "bio data", "biodata"}
+BULLET_RE = re.compile(r"^\s*(?:[-*•●▪◦‣·]|\d+[.)])\s*")
+ROLE_SPLIT_RE = re.compile(r"\s+(?:at|@)\s+|\s+[|–—-]\s+|,\s+")
+
+class SkillGazetteer:
+    """Aho-Corasick automaton over lower-cased skill names: every known skill in a text is found in one pass."""
+
+    def __init__(self, skills: List[str]):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for skill in dict.fromkeys(s.strip() for s in skills if s.strip()):
+            self._add(skill)
+        self._build()
+
+    def _add(self, skill: str):
+        state = 0
+        for ch in skill.lower():
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(skill), skill))
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0) if self._goto[fail].get(ch, 0) != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> List[str]:
+        """Known skills in order of first appearance, matched on word boundaries."""
+        lowered = text.lower()
+        found = {}
+        state = 0
+        for pos, ch in enumerate(lowered):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for length, skill in self._out[state]:
+                start = pos - length + 1
+                if skill in found:
+                    continue
+                if (start > 0 and lowered[start - 1].isalnum()) or (pos + 1 < len(lowered) and lowered[pos + 1].isalnum()):
+                    continue
+                if skill in CASE_SENSITIVE_SKILLS and text[start:pos + 1] != skill:
+                    continue
+                found[skill] = start
+        # Drop matches contained in a longer one ("Spring" inside "Spring Boot")
+        names = sorted(found, key=found.get)
+        return [s for s in names if not any(
+            o != s and found[o] <= found[s] and found[o] + len(o) >= found[s] + len(s) for o in names
+        )]
+
+def _load_gazetteer() -> SkillGazetteer:
+    skills = list(SKILLS)
+    if SKILL_GAZETTEER_FILE:
+        try:
+            with open(SKILL_GAZETTEER_FILE, encoding="utf-8") as f:
+                skills += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        except OSError as e:
+            logger.error(f"Failed to read skill gazetteer {SKILL_GAZETTEER_FILE}: {str(e)}")
+    return SkillGazetteer(skills)
+
+skill_gazetteer = _load_gazetteer()
+
+def _heading(line: str) -> Optional[str]:
+    text = line.strip().strip(":").strip()
+    if not text or len(text) > 40:
+        return None
+    return HEADING_LOOKUP.get(re.sub(r"\s+", " ", text.lower().replace("&", "and")))
+
+def split_sections(text: str) -> Dict[str, List[str]]:
+    """Lines of the CV grouped under the standard section headings; lines before the first heading are the header."""
+    sections = {"header": []}
+    current = "header"
+    for line in text.splitlines():
+        section = _heading(line)
+        if LABEL_RE.match(line):
+            # "Industry: ..." style labels often trail the last section; they describe the whole CV
+            sections["header"].append(line.strip())
+        elif section:
+            current = section
+            sections.setdefault(current, [])
+        elif line.strip():
+            sections.setdefault(current, []).append(line.strip())
+    return sections
+
+def _items(lines: List[str]) -> List[str]:
+    return [BULLET_RE.sub("", line).strip() for line in lines if BULLET_RE.sub("", line).strip()]
+
+def _month_index(month_name: Optional[str], month_number: Optional[str], year: str) -> int:
+    # Bare years count from January, so "2019-2021" is two years as a reader would say
+    month = 1
+    if month_name:
+        month = MONTHS[month_name[:3].lower()]
+    elif month_number and 1 <= int(month_number) <= 12:
+        month = int(month_number)
+    return int(year) * 12 + month - 1
+
+def date_ranges(text: str) -> List[Tuple[int, int, str]]:
+    """(start month index, end month index, matched text) for every date range in the text."""
+    now = time.localtime()
+    ranges = []
+    for match in DATE_RANGE_RE.finditer(text):
+        m1, n1, y1, m2, n2, y2, current = match.groups()
+        start = _month_index(m1, n1, y1)
+        end = now.tm_year * 12 + now.tm_mon - 1 if current else _month_index(m2, n2, y2) if y2 else None
+        if end is not None and end >= start:
+            ranges.append((start, end, match.group(0)))
+    return ranges
+
+def total_years(ranges: List[Tuple[int, int, str]]) -> int:
+    # Overlapping jobs are only counted once
+    months, last_end = 0, None
+    for start, end, _ in sorted(ranges):
+        if last_end is not None and start <= last_end:
+            if end > last_end:
+                months += end - last_end
+                last_end = end
+            continue
+        months += end - start
+        last_end = end
+    return months // 12
+
+def _role_and_company(line: str, matched: str) -> Tuple[str, str]:
+    rest = line.replace(matched, " ")
+    rest = re.sub(r"[()\[\]]", " ", rest).strip(" ,|–—-")
+    parts = [p.strip() for p in ROLE_SPLIT_RE.split(rest, maxsplit=1) if p.strip()]
+    if len(parts) == 2:
+        return parts[0], parts[1]
+    return (parts[0], "") if parts else ("", "")
+
+def _parse_education(lines: List[str]) -> Tuple[dict, str, float]:
+    for line in lines:
+        degree_match = DEGREE_RE.search(line)
+        if not degree_match:
+            continue
+        parts = [p.strip() for p in re.split(r",|\||–|—| - ", line) if p.strip()]
+        degree = next((p for p in parts if DEGREE_RE.search(p)), parts[0])
+        institution = next((p for p in parts if INSTITUTION_RE.search(p) and p != degree), "")
+        confidence = 1.0 if institution else 0.6
+        if not institution:
+            # Otherwise the part after the degree, unless it is a grade or a year
+            after = parts[parts.index(degree) + 1:]
+            if after and not GPA_RE.search(after[0]) and not re.search(r"\d{4}", after[0]):
+                institution, confidence = after[0], 0.8
+        gpa_match = GPA_RE.search(line)
+        field = ""
+        field_match = re.search(r"\bin\s+([A-Z][\w&/ ]+)$", degree) or re.search(r"\bof\s+([A-Z][\w&/ ]+)$", degree)
+        if field_match:
+            field = field_match.group(1).strip()
+        education = {"institution": institution, "degree": degree, "gpa": gpa_match.group(1) if gpa_match else ""}
+        return education, field, confidence
+    return {"institution": "", "degree": "", "gpa": ""}, "", 0.0
+
+def preparse_cv(text: str) -> Tuple[dict, Dict[str, float]]:
+    """Fields extracted deterministically from a CV, with a 0-1 confidence for each one."""
+    sections = split_sections(text)
+    header = sections.get("header", [])
+    confidence = {}
+
+    name = next((line for line in header[:3] if NAME_RE.match(line) and line.lower() not in NOT_NAMES), "")
+    confidence["name"] = 1.0 if name else 0.0
+    email = EMAIL_RE.search(text)
+    # Long digit runs that are not 10-15 digits are dates, IDs or postcodes
+    phone = next((m for m in PHONE_RE.finditer("\n".join(header) or text)
+                  if 10 <= sum(c.isdigit() for c in m.group(1)) <= 15), None)
+    confidence["email"] = 1.0 if email else 0.0
+    confidence["phone"] = 1.0 if phone else 0.0
+
+    listed = []
+    for item in _items(sections.get("skills", [])):
+        listed += [s.strip() for s in re.split(r"[,;|•]", item.split(":", 1)[-1]) if 0 < len(s.strip()) <= 40]
+    known = skill_gazetteer.find(text)
+    seen = {s.lower() for s in listed}
+    # A proper skills list is taken as written; the gazetteer fills in for CVs without one
+    skills = listed if len(listed) >= 3 else listed + [s for s in known if s.lower() not in seen]
+    confidence["skills"] = 1.0 if len(listed) >= 3 else 0.7 if len(known) >= 5 else 0.4 if skills else 0.0
+
+    experience_lines = sections.get("experience", [])
+    details, work = [], []
+    ranges = []
+    for line in experience_lines:
+        found = date_ranges(line)
+        if found:
+            ranges += found
+            role, company = _role_and_company(line, found[0][2])
+            details.append({"company": company, "role": role, "duration": found[0][2]})
+        else:
+            work.append(BULLET_RE.sub("", line).strip())
+    if experience_lines:
+        confidence["experience"] = 1.0 if ranges else 0.3
+        confidence["experience_details"] = (1.0 if all(d["company"] for d in details) else 0.6) if details else 0.3
+        confidence["work_experience"] = 1.0 if work else 0.5
+    else:
+        # No heading to anchor on; dates elsewhere may be education or projects
+        confidence["experience"] = confidence["experience_details"] = confidence["work_experience"] = 0.0
+
+    education, field_of_study, confidence["education"] = _parse_education(sections.get("education", []))
+    confidence["field_of_study"] = 1.0 if field_of_study else 0.0
+
+    label = LABEL_RE.search(text)
+    industry = label.group(2).strip() if label else ""
+    confidence["industry"] = 1.0 if industry else 0.0
+
+    # A missing projects or certifications heading usually means the CV has none
+    projects = _items(sections.get("projects", []))
+    certifications = _items(sections.get("certifications", []))
+    confidence["projects"] = 1.0 if "projects" in sections else 0.8
+    confidence["certifications"] = 1.0 if "certifications" in sections else 0.8
+
+    data = {
+        "name": name or "Unknown",
+        "email": email.group(0) if email else "",
+        "phone": phone.group(1).strip() if phone else "",
+        "skills": skills,
+        "education": education,
+        "experience": total_years(ranges),
+        "work_experience": work,
+        "certifications": certifications,
+        "projects": projects,
+        "field_of_study": field_of_study,
+        "industry": industry,
+        "experience_details": details
+    }
+    return data, confidence
+
+def overall_confidence(confidence: Dict[str, float]) -> float:
+    return round(sum(FIELD_WEIGHTS[field] * confidence.get(field, 0.0) for field in FIELD_WEIGHTS), 3)
+
+def excerpt(text: str, fields: List[str]) -> str:
+    """The header plus only the sections an LLM needs to fill the given fields."""
+    sections = split_sections(text)
+    wanted = {"header", "summary"}
+    for field in fields:
+        wanted.update(FIELD_SECTIONS.get(field, ()))
+    if not any(section in sections for section in wanted - {"header", "summary"}):
+        return text
+    parts = []
+    for section, lines in sections.items():
+        if section in wanted and lines:
+            parts.append((section.title() + "\n" if section != "header" else "") + "\n".join(lines))
+    return "\n\n".join(parts)
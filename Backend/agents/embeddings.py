@@ -0,0 +1,246 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List
+import numpy as np
+from .metrics import timed
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# torch (full-precision PyTorch), onnx (ONNX Runtime export) or onnx-int8 (dynamically quantized ONNX)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+ENCODE_BATCH_SIZE = int(os.getenv("ENCODE_BATCH_SIZE", "64"))
+# 0 leaves the thread count to the runtime, which uses every core
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+# Time a few batch sizes and thread counts on load and keep the fastest
+EMBEDDING_AUTOTUNE = os.getenv("EMBEDDING_AUTOTUNE", "0") == "1"
+# Compare a non-torch backend against PyTorch on load and fall back to PyTorch if it drifts too far
+EMBEDDING_ACCURACY_CHECK = os.getenv("EMBEDDING_ACCURACY_CHECK", "1") == "1"
+EMBEDDING_MIN_COSINE = float(os.getenv("EMBEDDING_MIN_COSINE", "0.98"))
+# Named like sentence-transformers' exports, onnx/model_<dtype>_<target>.onnx; avx2 runs on nearly every x86 server
+EMBEDDING_ONNX_INT8_FILE = os.getenv("EMBEDDING_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+# Where a quantized export is written when the model repository does not ship one
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "onnx_models")
+
+AUTOTUNE_BATCH_SIZES = (8, 16, 32, 64, 128)
+
+# Short phrases and longer passages, like the skills, industries and experience summaries that get scored
+REFERENCE_TEXTS = [
+    "Python", "machine learning", "React", "project management", "SQL", "Kubernetes", "data analysis",
+    "Bachelor of Science in Computer Science", "Master of Business Administration", "Healthcare", "Fintech",
+    "customer relationship management", "natural language processing", "financial reporting",
+    "Senior Software Engineer at Acme Corp, building REST APIs in Python and maintaining a PostgreSQL data warehouse",
+    "Led a team of five analysts delivering weekly sales dashboards in Tableau and Excel for regional managers",
+    "Registered nurse with eight years of experience in intensive care, patient assessment and medication safety",
+    "Designed and deployed microservices on AWS using Docker, Kubernetes and Terraform with CI/CD pipelines",
+    "Marketing coordinator responsible for social media campaigns, SEO, content calendars and event logistics",
+    "Mechanical engineer experienced in CAD, finite element analysis and manufacturing process improvement"
+]
+
+class EmbeddingEngine:
+    """Runs the sentence-embedding model; backends differ only in how the model is executed."""
+    name = "base"
+
+    def __init__(self, model_name: str = MODEL_NAME, threads: int = EMBEDDING_THREADS):
+        self.model_name = model_name
+        self.threads = threads
+
+    def encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        raise NotImplementedError
+
+    def set_threads(self, threads: int) -> bool:
+        """Change the thread count in place; False when the backend fixes it at load time."""
+        return False
+
+class TorchEngine(EmbeddingEngine):
+    name = "torch"
+
+    def __init__(self, model_name: str = MODEL_NAME, threads: int = EMBEDDING_THREADS):
+        super().__init__(model_name, threads)
+        from sentence_transformers import SentenceTransformer
+        if threads:
+            self.set_threads(threads)
+        self.model = SentenceTransformer(model_name, device="cpu", **self._load_kwargs())
+
+    def _load_kwargs(self) -> dict:
+        return {}
+
+    def encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        vectors = self.model.encode(texts, batch_size=batch_size, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def set_threads(self, threads: int) -> bool:
+        try:
+            import torch
+        except ImportError:
+            return False
+        torch.set_num_threads(threads)
+        self.threads = threads
+        return True
+
+class OnnxEngine(TorchEngine):
+    """The model exported to ONNX and run by ONNX Runtime; needs sentence-transformers[onnx]."""
+    name = "onnx"
+    file_name = None
+
+    def _load_kwargs(self) -> dict:
+        model_kwargs = {"provider": "CPUExecutionProvider"}
+        if self.file_name:
+            model_kwargs["file_name"] = self.file_name
+        if self.threads:
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = self.threads
+            model_kwargs["session_options"] = options
+        return {"backend": "onnx", "model_kwargs": model_kwargs}
+
+    def set_threads(self, threads: int) -> bool:
+        # ONNX Runtime sizes its thread pool when the session is created
+        return False
+
+class OnnxInt8Engine(OnnxEngine):
+    """ONNX Runtime with int8 dynamically quantized weights.
+
+    Uses the quantized file shipped in the model repository, or quantizes the ONNX export into EMBEDDING_ONNX_DIR once.
+    """
+    name = "onnx-int8"
+    file_name = EMBEDDING_ONNX_INT8_FILE
+
+    def __init__(self, model_name: str = MODEL_NAME, threads: int = EMBEDDING_THREADS):
+        try:
+            super().__init__(model_name, threads)
+        except Exception as e:
+            local_dir = os.path.join(EMBEDDING_ONNX_DIR, model_name.replace("/", "__"))
+            if not os.path.exists(os.path.join(local_dir, self.file_name)):
+                logger.info(f"No quantized model for {model_name} ({str(e)}), exporting to {local_dir}")
+                self._export(model_name, local_dir)
+            super().__init__(local_dir, threads)
+            self.model_name = model_name
+
+    def _export(self, model_name: str, local_dir: str):
+        from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+        model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+        model.save(local_dir)
+        suffix = os.path.splitext(os.path.basename(self.file_name))[0][len("model_"):]
+        export_dynamic_quantized_onnx_model(model, suffix.split("_", 1)[1], local_dir, file_suffix=suffix)
+
+ENGINES: Dict[str, Callable[..., EmbeddingEngine]] = {
+    "torch": TorchEngine,
+    "onnx": OnnxEngine,
+    "onnx-int8": OnnxInt8Engine
+}
+
+def register_engine(name: str, factory: Callable[..., EmbeddingEngine]):
+    ENGINES[name] = factory
+
+def load_engine(backend: str = EMBEDDING_BACKEND, model_name: str = MODEL_NAME,
+                threads: int = EMBEDDING_THREADS) -> EmbeddingEngine:
+    if backend not in ENGINES:
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {', '.join(ENGINES)}")
+    started = time.perf_counter()
+    engine = ENGINES[backend](model_name, threads)
+    logger.info(f"Loaded embedding model {model_name} ({backend}) in {time.perf_counter() - started:.2f}s")
+    return engine
+
+def engine_key(backend: str = EMBEDDING_BACKEND, model_name: str = MODEL_NAME) -> str:
+    """Name stored vectors are keyed by, so vectors from different backends are never mixed.
+
+    Torch keeps the bare model name, which vectors stored before other backends existed already use.
+    """
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+def accuracy_check(engine: EmbeddingEngine, baseline: EmbeddingEngine, texts: List[str] = None) -> dict:
+    """Cosine similarity between an engine's embeddings and the baseline's for the same texts."""
+    texts = texts or REFERENCE_TEXTS
+    a = engine.encode(texts, ENCODE_BATCH_SIZE)
+    b = baseline.encode(texts, ENCODE_BATCH_SIZE)
+    cosines = np.sum(a * b, axis=1) / np.maximum(np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1), 1e-12)
+    return {"min_cosine": float(cosines.min()), "mean_cosine": float(cosines.mean()), "texts": len(texts)}
+
+def autotune(engine: EmbeddingEngine, texts: List[str] = None, rounds: int = 2) -> dict:
+    """Pick the fastest batch size, and thread count where the backend can change it, for a sample workload."""
+    # Repeat the reference texts into a batch about the size of one CV upload's phrases
+    texts = texts or REFERENCE_TEXTS * 13
+    cpus = os.cpu_count() or 1
+    thread_counts = sorted({1, max(1, cpus // 2), cpus}) if engine.set_threads(engine.threads or cpus) else [engine.threads]
+
+    def best_time(batch_size):
+        return min(_time_encode(engine, texts, batch_size) for _ in range(rounds))
+
+    engine.encode(texts[:8], 8)
+    best = None
+    for threads in thread_counts:
+        if threads:
+            engine.set_threads(threads)
+        for batch_size in AUTOTUNE_BATCH_SIZES:
+            seconds = best_time(batch_size)
+            if best is None or seconds < best["seconds"]:
+                best = {"batch_size": batch_size, "threads": threads, "seconds": seconds}
+    if best["threads"]:
+        engine.set_threads(best["threads"])
+    best["texts_per_s"] = round(len(texts) / best["seconds"], 1)
+    return best
+
+def _time_encode(engine: EmbeddingEngine, texts: List[str], batch_size: int) -> float:
+    started = time.perf_counter()
+    engine.encode(texts, batch_size)
+    return time.perf_counter() - started
+
+_engine = None
+_batch_size = ENCODE_BATCH_SIZE
+_engine_lock = threading.Lock()
+
+def _prepare_engine() -> EmbeddingEngine:
+    global _batch_size
+    engine = load_engine()
+    if EMBEDDING_ACCURACY_CHECK and engine.name != "torch":
+        report = accuracy_check(engine, load_engine("torch"))
+        if report["min_cosine"] < EMBEDDING_MIN_COSINE:
+            logger.error(f"Embedding backend {engine.name} drifted from PyTorch (min cosine {report['min_cosine']:.4f} "
+                         f"< {EMBEDDING_MIN_COSINE}), falling back to torch")
+            engine = load_engine("torch")
+        else:
+            logger.info(f"Embedding backend {engine.name} matches PyTorch: min cosine {report['min_cosine']:.4f}, "
+                        f"mean {report['mean_cosine']:.4f}")
+    if EMBEDDING_AUTOTUNE:
+        tuned = autotune(engine)
+        _batch_size = tuned["batch_size"]
+        logger.info(f"Auto-tuned {engine.name} embeddings: batch size {tuned['batch_size']}, "
+                    f"{tuned['threads'] or 'default'} threads, {tuned['texts_per_s']} texts/s")
+    return engine
+
+def get_engine() -> EmbeddingEngine:
+    """Load the embedding engine on first use; importing torch is most of the server's startup cost."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _prepare_engine()
+    return _engine
+
+def set_engine(engine: EmbeddingEngine, batch_size: int = ENCODE_BATCH_SIZE):
+    """Swap the engine used by encode(), e.g. to compare backends in one process."""
+    global _engine, _batch_size
+    with _engine_lock:
+        _engine = engine
+        _batch_size = batch_size
+
+def embedding_key() -> str:
+    """engine_key() of the engine encode() runs, which may be torch after a failed accuracy check."""
+    engine = get_engine()
+    return engine_key(engine.name, engine.model_name)
+
+def expected_embedding_key() -> str:
+    """embedding_key() without loading the engine: the configured backend's key until the engine is loaded."""
+    engine = _engine
+    return engine_key(engine.name, engine.model_name) if engine is not None else engine_key()
+
+def encode(texts: List[str]) -> np.ndarray:
+    engine = get_engine()
+    with timed("embed", len(texts)):
+        return engine.encode(texts, _batch_size)
+
+def warm_up():
+    encode(["warm up"])
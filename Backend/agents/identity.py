@@ -0,0 +1,80 @@
+import hashlib
+import os
+import re
+from typing import List, Optional
+import numpy as np
+
+# Link re-uploaded CVs to the candidate already on file instead of storing them again
+IDENTITY_DEDUP = os.getenv("IDENTITY_DEDUP", "1") == "1"
+# Estimated Jaccard similarity of word shingles above which a CV is linked to the stored one's candidate, unless their contact details differ
+IDENTITY_NEAR_DUP_THRESHOLD = float(os.getenv("IDENTITY_NEAR_DUP_THRESHOLD", "0.9"))
+SHINGLE_SIZE = 5
+MINHASH_PERMUTATIONS = 128
+# 16 bands of 8 rows: texts at 0.9 similarity share a band almost surely, texts at 0.5 rarely do
+LSH_BANDS = 16
+MIN_PHONE_DIGITS = 7
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240611)
+_A = _rng.integers(1, _PRIME, size=MINHASH_PERMUTATIONS, dtype=np.int64)
+_B = _rng.integers(0, _PRIME, size=MINHASH_PERMUTATIONS, dtype=np.int64)
+
+_NON_WORD = re.compile(r"\W+")
+
+def normalize_text(text: str) -> str:
+    """Lower-cased words separated by single spaces, so layout and punctuation changes do not matter."""
+    return " ".join(_NON_WORD.sub(" ", (text or "").lower()).split())
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+def normalize_email(email) -> Optional[str]:
+    if not isinstance(email, str):
+        return None
+    email = email.strip().lower()
+    return email if re.fullmatch(r"[^@\s]+@[^@\s]+\.[^@\s]+", email) else None
+
+def normalize_phone(phone) -> Optional[str]:
+    """The last ten digits, so the same number with and without a country code matches."""
+    if not isinstance(phone, str):
+        return None
+    digits = re.sub(r"\D", "", phone)
+    return digits[-10:] if len(digits) >= MIN_PHONE_DIGITS else None
+
+def _shingle_hashes(text: str) -> np.ndarray:
+    words = normalize_text(text).split()
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles],
+        dtype=np.int64
+    )
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature of the text's word shingles; the share of equal entries estimates their Jaccard similarity."""
+    hashes = _shingle_hashes(text) % _PRIME
+    return ((hashes[:, None] * _A + _B) % _PRIME).min(axis=0).astype(np.uint32)
+
+def lsh_buckets(signature: np.ndarray) -> List[tuple]:
+    """(band, bucket) pairs; near-duplicate texts share at least one."""
+    return [
+        (band, int.from_bytes(hashlib.blake2b(rows.tobytes(), digest_size=8).digest(), "little", signed=True))
+        for band, rows in enumerate(np.array_split(signature, LSH_BANDS))
+    ]
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+def fingerprint(text: str) -> dict:
+    signature = minhash(text)
+    return {
+        "content_hash": content_hash(text),
+        "signature": signature,
+        "buckets": lsh_buckets(signature),
+        "source_cv_id": None,
+        "near_cv_id": None
+    }
+
+def identity_keys(cv_data: dict) -> List[tuple]:
+    """(kind, key) pairs identifying the person behind a parsed CV."""
+    keys = [("email", normalize_email(cv_data.get("email"))), ("phone", normalize_phone(cv_data.get("phone")))]
+    return [(kind, key) for kind, key in keys if key]
@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import os
+import tarfile
+import tempfile
+import zipfile
+from contextlib import nullcontext
+from typing import AsyncIterator, Iterator, List, Optional
+from fastapi import HTTPException, Request
+from .jd_summarizer import CV_BATCH_MAX_ITEMS, CV_BATCH_PARSING, parse_uploaded_cvs, score_and_store
+from .text_extractor import SUPPORTED_TYPES, extract_upload_text
+from .metrics import inc
+
+logger = logging.getLogger(__name__)
+
+# CVs read but not yet stored; bounds memory however large the upload is
+INGEST_WINDOW = int(os.getenv("INGEST_WINDOW", "32"))
+INGEST_MAX_FILE_BYTES = int(os.getenv("INGEST_MAX_FILE_BYTES", str(10 * 1024 * 1024)))
+INGEST_MAX_UPLOAD_BYTES = int(os.getenv("INGEST_MAX_UPLOAD_BYTES", str(4 * 1024 ** 3)))
+# Counts the uncompressed size of archive members, so a zip bomb is stopped here
+INGEST_MAX_TOTAL_BYTES = int(os.getenv("INGEST_MAX_TOTAL_BYTES", str(8 * 1024 ** 3)))
+INGEST_MAX_ENTRIES = int(os.getenv("INGEST_MAX_ENTRIES", "20000"))
+# A raw archive body is kept in memory up to this size and spilled to a temporary file beyond it
+INGEST_SPOOL_MEMORY_BYTES = int(os.getenv("INGEST_SPOOL_MEMORY_BYTES", str(1024 * 1024)))
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR") or None
+
+EXTENSION_TYPES = {
+    ".txt": "text/plain",
+    ".pdf": "application/pdf",
+    ".doc": "application/msword",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+}
+
+def content_type_for(filename: str, declared: Optional[str] = None) -> Optional[str]:
+    if declared in SUPPORTED_TYPES:
+        return declared
+    return EXTENSION_TYPES.get(os.path.splitext(filename or "")[1].lower())
+
+def _skipped(name: str) -> bool:
+    # Folders and the metadata macOS and editors leave in archives
+    base = os.path.basename(name.rstrip("/"))
+    return not base or base.startswith(".") or name.startswith("__MACOSX/") or "/__MACOSX/" in name
+
+def _open_archive(fileobj):
+    """A ZipFile or TarFile over a seekable file, or None if it is neither."""
+    fileobj.seek(0)
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        return zipfile.ZipFile(fileobj)
+    fileobj.seek(0)
+    try:
+        return tarfile.open(fileobj=fileobj, mode="r:*")
+    except tarfile.TarError:
+        return None
+
+def archive_entries(archive) -> Iterator[tuple]:
+    """(filename, content_type, size, open) for every file in an open zip or tar archive, in archive order."""
+    with archive:
+        if isinstance(archive, zipfile.ZipFile):
+            for info in archive.infolist():
+                if not info.is_dir() and not _skipped(info.filename):
+                    yield info.filename, content_type_for(info.filename), info.file_size, lambda info=info: archive.open(info)
+        else:
+            # Members must be read before the next one is reached; seeking back in a compressed tar restarts it
+            for member in archive:
+                if member.isfile() and not _skipped(member.name):
+                    yield member.name, content_type_for(member.name), member.size, lambda member=member: archive.extractfile(member)
+
+def upload_entries(files: List) -> Iterator[tuple]:
+    """Entries for multipart files; a part that is not a supported document but is a zip or tar is expanded."""
+    for file in files:
+        content_type = content_type_for(file.filename, file.content_type)
+        archive = None if content_type else _open_archive(file.file)
+        if archive is not None:
+            yield from archive_entries(archive)
+        else:
+            # Multipart files are closed with the form, not after reading
+            file.file.seek(0)
+            yield file.filename, content_type, file.size, lambda file=file: nullcontext(file.file)
+
+def read_entries(entries: Iterator[tuple]) -> Iterator[tuple]:
+    """(filename, content_type, content, error) for each entry, enforcing the per-file and whole-upload caps.
+
+    Content is read only when the entry is reached, so a caller that pulls entries lazily holds one file at a time.
+    """
+    total = 0
+    for count, (filename, content_type, size, open_file) in enumerate(entries):
+        if count >= INGEST_MAX_ENTRIES:
+            yield None, None, None, f"Upload has more than {INGEST_MAX_ENTRIES} files, the rest were skipped"
+            return
+        if content_type is None:
+            yield filename, None, None, "Unsupported file type"
+            continue
+        if size is not None and size > INGEST_MAX_FILE_BYTES:
+            yield filename, content_type, None, f"File is larger than {INGEST_MAX_FILE_BYTES} bytes"
+            continue
+        with open_file() as f:
+            content = f.read(INGEST_MAX_FILE_BYTES + 1)
+        # Declared sizes in archives can lie, so the cap is checked on what was actually read
+        if len(content) > INGEST_MAX_FILE_BYTES:
+            yield filename, content_type, None, f"File is larger than {INGEST_MAX_FILE_BYTES} bytes"
+            continue
+        total += len(content)
+        if total > INGEST_MAX_TOTAL_BYTES:
+            yield None, None, None, f"Upload is larger than {INGEST_MAX_TOTAL_BYTES} bytes uncompressed, the rest was skipped"
+            return
+        yield filename, content_type, content, None
+
+async def _spool_body(request: Request):
+    spool = tempfile.SpooledTemporaryFile(max_size=INGEST_SPOOL_MEMORY_BYTES, dir=INGEST_SPOOL_DIR)
+    size = 0
+    try:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > INGEST_MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail=f"Upload is larger than {INGEST_MAX_UPLOAD_BYTES} bytes")
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    return spool
+
+async def receive_upload(request: Request) -> tuple:
+    """(entries, close) for a multipart upload of documents and archives, or for a zip or tar sent as the raw body.
+
+    Uploads are spooled to disk rather than held in memory; close releases them once processing finishes.
+    """
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > INGEST_MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload is larger than {INGEST_MAX_UPLOAD_BYTES} bytes")
+    if INGEST_SPOOL_DIR:
+        os.makedirs(INGEST_SPOOL_DIR, exist_ok=True)
+
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form(max_files=INGEST_MAX_ENTRIES)
+        files = [value for _, value in form.multi_items() if not isinstance(value, str)]
+        if not files:
+            await form.close()
+            raise HTTPException(status_code=400, detail="No files uploaded")
+        return read_entries(upload_entries(files)), form.close
+
+    spool = await _spool_body(request)
+    archive = await asyncio.to_thread(_open_archive, spool)
+    if archive is None:
+        spool.close()
+        raise HTTPException(status_code=400, detail="Request body is not a zip or tar archive")
+
+    async def close():
+        spool.close()
+    return read_entries(archive_entries(archive)), close
+
+async def ingest_cvs(jd_id: int, entries: Iterator[tuple], jd_data: dict, jd_embeddings: dict,
+                     window: int = INGEST_WINDOW) -> AsyncIterator[dict]:
+    """Yield candidate, error and progress events for (filename, content_type, content, error) entries.
+
+    Entries are pulled one at a time and at most `window` CVs are between being read and being stored, so peak memory
+    is independent of the number of files. A slow client holds back reading as well.
+    """
+    window = max(1, window)
+    batch_size = max(1, min(CV_BATCH_MAX_ITEMS if CV_BATCH_PARSING else 1, window))
+    slots = asyncio.Semaphore(window)
+    events = asyncio.Queue(maxsize=window)
+    extracted = asyncio.Queue()
+    tasks = set()
+    state = {"read": 0, "completed": 0}
+
+    def spawn(coro):
+        task = asyncio.create_task(coro)
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        return task
+
+    async def finish(items: list, candidates: list, failed: list, errors: list):
+        for (index, filename, _), candidate in candidates:
+            await events.put({"type": "candidate", "index": index, "file": filename, "candidate": candidate})
+        for index, filename, _ in failed:
+            await events.put({"type": "error", "index": index, "file": filename, "detail": "Failed to parse CV"})
+        for index, filename, detail in errors:
+            await events.put({"type": "error", "index": index, "file": filename, "detail": detail})
+        state["completed"] += len(items)
+        for _ in items:
+            slots.release()
+        # Same keys as /stream; an archive's size is only known once it has been read, so total counts files read so far
+        await events.put({"type": "progress", "total": state["read"], "completed": state["completed"]})
+
+    async def handle(batch: list):
+        try:
+            parsed = await parse_uploaded_cvs([text for _, _, text in batch])
+            ok = [(item, cv_data) for item, cv_data in zip(batch, parsed) if cv_data is not None]
+            failed = [item for item, cv_data in zip(batch, parsed) if cv_data is None]
+            candidates = await asyncio.to_thread(score_and_store, jd_id, jd_data, jd_embeddings, [cv for _, cv in ok])
+            candidates = list(zip([item for item, _ in ok], candidates))
+        except Exception as e:
+            logger.error(f"Error processing CV batch: {str(e)}", exc_info=True)
+            candidates, failed = [], batch
+        await finish(batch, candidates, failed, [])
+
+    async def extract(index: int, filename: str, content_type: str, content: bytes):
+        try:
+            await extracted.put((index, filename, await extract_upload_text(content_type, content), None))
+        except Exception as e:
+            await extracted.put((index, filename, None, str(e)))
+
+    async def produce():
+        iterator = iter(entries)
+        pending = set()
+        try:
+            while True:
+                await slots.acquire()
+                entry = await asyncio.to_thread(next, iterator, None)
+                if entry is None:
+                    slots.release()
+                    break
+                filename, content_type, content, error = entry
+                index = state["read"]
+                state["read"] += 1
+                inc("stage_items_total", stage="ingest_read")
+                if error:
+                    await extracted.put((index, filename, None, error))
+                else:
+                    pending.add(spawn(extract(index, filename, content_type, content)))
+                    pending = {task for task in pending if not task.done()}
+        except Exception as e:
+            logger.error(f"Failed to read upload: {str(e)}", exc_info=True)
+            await events.put({"type": "error", "index": None, "file": None, "detail": f"Failed to read upload: {str(e)}"})
+        await asyncio.gather(*pending)
+        await extracted.put(None)
+
+    async def collect():
+        batch = []
+        handlers = []
+        while True:
+            item = await extracted.get()
+            if item is None:
+                break
+            index, filename, text, error = item
+            if error:
+                logger.warning(f"Skipping {filename}: {error}")
+                await finish([item], [], [], [(index, filename, error)])
+                continue
+            batch.append((index, filename, text))
+            if len(batch) >= batch_size:
+                handlers.append(spawn(handle(batch)))
+                batch = []
+        if batch:
+            handlers.append(spawn(handle(batch)))
+        await asyncio.gather(*handlers)
+        await events.put(None)
+
+    spawn(produce())
+    spawn(collect())
+    next_id = 1
+    try:
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            if event["type"] == "candidate":
+                event["candidate"]["id"] = next_id
+                next_id += 1
+            yield event
+    finally:
+        # Stop reading and parsing if the client disconnects mid-stream
+        for task in list(tasks):
+            task.cancel()
+
+    yield {"type": "done", "total": state["read"], "processed": next_id - 1}
@@ -1,155 +1,108 @@
+import asyncio
+import copy
 import json
 import re
-import requests
 import logging
 import sqlite3
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List
-from .cv_matcher import calculate_match_score
-from pdfminer.high_level import extract_text
-import docx
+from .cv_matcher import (
+    calculate_match_scores, compute_jd_embeddings, compute_cv_embeddings, section_scores, section_score_blocks,
+    scores_from_sections, weight_vector, update_jd_embeddings, affected_sections, DEFAULT_CONFIG, SECTIONS
+)
+from .embeddings import embedding_key
+from .parse_cache import parse_cache
+from .vector_index import candidate_index, profile_vector
+from .text_extractor import extract_upload_texts
+from .llm_client import LLMError, estimate_tokens, gemini_client
+from .cv_preparser import excerpt, overall_confidence, preparse_cv
+from .metrics import inc, timed
+from .identity import IDENTITY_DEDUP, IDENTITY_NEAR_DUP_THRESHOLD, fingerprint, identity_keys, similarity
+from db.database import (
+    save_jd_to_db, load_jd, save_jd_embeddings, load_jd_embeddings, load_cv_embeddings, load_cvs, save_cvs,
+    save_section_scores, load_section_scores, unscored_cv_ids, load_candidate_summaries, save_jd_update,
+    find_cvs_by_content, find_signatures_in_buckets, save_linked_cvs
+)
 import os
+import numpy as np
 logger = logging.getLogger(__name__)
 
 
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "your_default_api_key_here")
-GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1/models/gemini-1.5-flash:generateContent?key={GEMINI_API_KEY}"
-
-DB_FILE = "job_descriptions.db"
-
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS job_descriptions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT,
-            summary TEXT,
-            skills TEXT,
-            responsibilities TEXT,
-            requirements TEXT,
-            keywords TEXT,
-            education TEXT,
-            experience INTEGER,
-            projects TEXT,
-            field_of_study TEXT,
-            industry TEXT,
-            original_text TEXT
-        )
-    ''')
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS cvs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            jd_id INTEGER,
-            name TEXT,
-            email TEXT,
-            phone TEXT,
-            skills TEXT,
-            education TEXT,
-            experience INTEGER,
-            work_experience TEXT,
-            certifications TEXT,
-            projects TEXT,
-            field_of_study TEXT,
-            industry TEXT,
-            match_score REAL,
-            match_breakdown TEXT,
-            experience_details TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-def save_jd_to_db(jd_data: dict):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    serialized_jd_data = {
-        'title': jd_data['title'],
-        'summary': jd_data['summary'],
-        'skills': json.dumps(jd_data['skills']),
-        'responsibilities': json.dumps(jd_data['responsibilities']),
-        'requirements': json.dumps(jd_data['requirements']),
-        'keywords': json.dumps(jd_data['keywords']),
-        'education': json.dumps(jd_data['education']),
-        'experience': jd_data['experience'],
-        'projects': json.dumps(jd_data['projects']),
-        'field_of_study': jd_data['field_of_study'],
-        'industry': jd_data['industry'],
-        'originalText': jd_data['originalText']
-    }
+# Bump these whenever a prompt changes so cached parse results are not reused
+JD_PROMPT_VERSION = "jd-v1"
+CV_PROMPT_VERSION = "cv-v1"
+CV_FIELDS_PROMPT_VERSION = "cv-fields-v1"
+
+# Several CVs are packed into one prompt up to this many (estimated) input tokens
+CV_BATCH_PARSING = os.getenv("CV_BATCH_PARSING", "1") == "1"
+CV_BATCH_TOKEN_BUDGET = int(os.getenv("CV_BATCH_TOKEN_BUDGET", "24000"))
+# Bounded by the response size: each parsed CV costs several hundred output tokens
+CV_BATCH_MAX_ITEMS = int(os.getenv("CV_BATCH_MAX_ITEMS", "8"))
+# CVs the local pre-parser reads with at least this confidence skip Gemini entirely
+CV_PREPARSE = os.getenv("CV_PREPARSE", "1") == "1"
+CV_PREPARSE_SKIP_CONFIDENCE = float(os.getenv("CV_PREPARSE_SKIP_CONFIDENCE", "0.97"))
+# Between the two thresholds Gemini only sees the relevant sections and is asked for the uncertain fields
+CV_PREPARSE_SHORT_CONFIDENCE = float(os.getenv("CV_PREPARSE_SHORT_CONFIDENCE", "0.6"))
+CV_PREPARSE_FIELD_CONFIDENCE = float(os.getenv("CV_PREPARSE_FIELD_CONFIDENCE", "0.8"))
+# Candidate search retrieves this many times top_k from the vector index before rescoring
+SEARCH_RERANK_FACTOR = int(os.getenv("SEARCH_RERANK_FACTOR", "3"))
+# CVs scored per block in bulk matching; memory is bounded by one JDs x chunk block instead of the full matrix
+BULK_MATCH_CHUNK_SIZE = int(os.getenv("BULK_MATCH_CHUNK_SIZE", "500"))
+
+def _decode_gemini_response(response_data: dict, kind: str) -> dict:
     try:
-        cursor.execute('''
-            INSERT INTO job_descriptions (
-                title, summary, skills, responsibilities, requirements, keywords,
-                education, experience, projects, field_of_study, industry, original_text
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            serialized_jd_data['title'],
-            serialized_jd_data['summary'],
-            serialized_jd_data['skills'],
-            serialized_jd_data['responsibilities'],
-            serialized_jd_data['requirements'],
-            serialized_jd_data['keywords'],
-            serialized_jd_data['education'],
-            serialized_jd_data['experience'],
-            serialized_jd_data['projects'],
-            serialized_jd_data['field_of_study'],
-            serialized_jd_data['industry'],
-            serialized_jd_data['originalText']
-        ))
-        jd_id = cursor.lastrowid
-        conn.commit()
-        logger.debug(f"JD saved with ID: {jd_id}")
-        return jd_id
-    except sqlite3.Error as e:
-        logger.error(f"Database error while saving JD: {str(e)}")
-        raise
-    finally:
-        conn.close()
-
-def save_cv_to_db(jd_id: int, cv_data: dict, match_score: float, match_breakdown: dict, experience_details: list):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    education = cv_data['education']
-    if isinstance(education, (list, dict)):
-        education = json.dumps(education)
-    # Serialize experience_details as JSON
-    experience_details_json = json.dumps(experience_details) if experience_details else "[]"
-    # Serialize field_of_study and industry to handle lists or dictionaries
-    field_of_study = json.dumps(cv_data['field_of_study']) if isinstance(cv_data['field_of_study'], (list, dict)) else cv_data['field_of_study']
-    industry = json.dumps(cv_data['industry']) if isinstance(cv_data['industry'], (list, dict)) else cv_data['industry']
+        generated_text = response_data["candidates"][0]["content"]["parts"][0]["text"]
+        cleaned_text = re.sub(r'^```json\s*|\s*```\s*$', '', generated_text, flags=re.MULTILINE).strip()
+        data = json.loads(cleaned_text)
+        logger.debug("Raw Gemini response data for %s: %s", kind, data)
+        return data
+    except (KeyError, IndexError, TypeError, json.JSONDecodeError) as e:
+        logger.error(f"Failed to parse Gemini API response for {kind}: {str(e)}")
+        inc("gemini_requests_total", kind=kind, outcome="bad_response")
+        raise HTTPException(status_code=500, detail=f"Failed to parse response: {str(e)}")
+
+def generate_json(prompt: str, kind: str, prompt_version: str, text: str) -> dict:
+    cached = parse_cache.get(kind, prompt_version, text)
+    if cached is not None:
+        logger.info(f"Parse cache hit for {kind}")
+        return cached
+
     try:
-        cursor.execute('''
-            INSERT INTO cvs (
-                jd_id, name, email, phone, skills, education, experience, work_experience,
-                certifications, projects, field_of_study, industry, match_score, match_breakdown, experience_details
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            jd_id,
-            cv_data['name'],
-            cv_data['email'],
-            cv_data['phone'],
-            json.dumps(cv_data['skills']),
-            education,
-            int(cv_data['experience']),
-            json.dumps(cv_data['work_experience']),
-            json.dumps(cv_data['certifications']),
-            json.dumps(cv_data['projects']),
-            field_of_study,  # Now serialized if it was a list or dict
-            industry,       # Now serialized if it was a list or dict
-            match_score,
-            json.dumps(match_breakdown),
-            experience_details_json
-        ))
-        conn.commit()
-        logger.debug(f"CV saved with JD ID {jd_id} for {cv_data['name']}")
-    except sqlite3.Error as e:
-        logger.error(f"Database error while saving CV: {str(e)}", exc_info=True)
-        raise
-    finally:
-        conn.close()
+        response_data = gemini_client.generate(prompt, kind)
+    except LLMError as e:
+        logger.error(f"Gemini API request failed for {kind}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error from Gemini API: {str(e)}")
+
+    data = _decode_gemini_response(response_data, kind)
+    parse_cache.put(kind, prompt_version, text, data)
+    return data
+
+async def request_json_async(prompt: str, kind: str, items: int = 1):
+    try:
+        response_data = await gemini_client.generate_async(prompt, kind, items)
+    except LLMError as e:
+        logger.error(f"Gemini API request failed for {kind}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error from Gemini API: {str(e)}")
+
+    return _decode_gemini_response(response_data, kind)
+
+async def generate_json_async(prompt: str, kind: str, prompt_version: str, text: str) -> dict:
+    # The cache is SQLite, so reads and writes stay off the event loop
+    cached = await asyncio.to_thread(parse_cache.get, kind, prompt_version, text)
+    if cached is not None:
+        logger.info(f"Parse cache hit for {kind}")
+        return cached
+
+    data = await request_json_async(prompt, kind)
+    await asyncio.to_thread(parse_cache.put, kind, prompt_version, text, data)
+    return data
+
+def normalize_jd_education(education) -> dict:
+    if isinstance(education, dict):
+        return education
+    return {"institution": "", "degree": "", "gpa": ""} if not education else {"institution": str(education), "degree": "", "gpa": ""}
 
 def summarize_job_description(text: str) -> tuple[dict, int]:
     if not text:
@@ -169,33 +122,9 @@ def summarize_job_description(text: str) -> tuple[dict, int]:
         "Job Description:\n" + text
     )
 
-    try:
-        logger.info("Sending request to Gemini API for JD")
-        response = requests.post(
-            GEMINI_API_URL,
-            headers={"Content-Type": "application/json"},
-            json={
-                "contents": [{"parts": [{"text": prompt}]}]
-            }
-        )
-        response.raise_for_status()
-    except requests.RequestException as e:
-        logger.error(f"Gemini API request failed for JD: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error from Gemini API: {str(e)}")
+    data = generate_json(prompt, "JD", JD_PROMPT_VERSION, text)
 
-    try:
-        response_data = response.json()
-        generated_text = response_data["candidates"][0]["content"]["parts"][0]["text"]
-        cleaned_text = re.sub(r'^```json\s*|\s*```\s*$', '', generated_text, flags=re.MULTILINE).strip()
-        data = json.loads(cleaned_text)
-        logger.debug(f"Raw Gemini response data for JD: {data}")
-    except (KeyError, json.JSONDecodeError) as e:
-        logger.error(f"Failed to parse Gemini API response for JD: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to parse response: {str(e)}")
-
-    education = data.get("education", {})
-    if not isinstance(education, dict):
-        education = {"institution": "", "degree": "", "gpa": ""} if not education else {"institution": str(education), "degree": "", "gpa": ""}
+    education = normalize_jd_education(data.get("education", {}))
 
     jd_data = {
         "title": data.get("title", "Unknown Title"),
@@ -211,68 +140,111 @@ def summarize_job_description(text: str) -> tuple[dict, int]:
         "industry": data.get("industry", ""),
         "originalText": text
     }
-    logger.debug(f"JD data before saving: {jd_data}")
-    jd_id = save_jd_to_db(jd_data)
+    logger.debug("JD data before saving: %s", jd_data)
+    with timed("db_write", 1):
+        jd_id = save_jd_to_db(jd_data)
+    try:
+        save_jd_embeddings(jd_id, compute_jd_embeddings(jd_data), embedding_key())
+    except Exception as e:
+        # Scoring falls back to embedding the JD on the fly, so this must not fail the upload
+        logger.error(f"Failed to precompute embeddings for JD ID {jd_id}: {str(e)}", exc_info=True)
     return jd_data, jd_id
 
-def parse_cv(text: str) -> dict:
-    if not text:
-        logger.warning("Empty CV text provided")
-        return {
-            "name": "Unknown",
-            "email": "",
-            "phone": "",
-            "skills": [],
-            "education": {"institution": "", "degree": "", "gpa": ""},
-            "experience": 0,
-            "work_experience": [],
-            "certifications": [],
-            "projects": [],
-            "field_of_study": "",
-            "industry": "",
-            "experience_details": []
-        }
+def empty_cv_data() -> dict:
+    return {
+        "name": "Unknown",
+        "email": "",
+        "phone": "",
+        "skills": [],
+        "education": {"institution": "", "degree": "", "gpa": ""},
+        "experience": 0,
+        "work_experience": [],
+        "certifications": [],
+        "projects": [],
+        "field_of_study": "",
+        "industry": "",
+        "experience_details": []
+    }
 
-    prompt = (
+CV_FIELDS_SPEC = (
+    "'name', 'email', 'phone', "
+    "'skills', 'education', 'experience', 'work_experience', 'certifications', 'projects', "
+    "'field_of_study', 'industry', 'experience_details'. 'experience_details' should be a list "
+    "of objects with 'company', 'role', and 'duration' keys. 'education' should be an object with "
+    "'institution' (string), 'degree' (string), and 'gpa' (string or number) if available, or an empty string if not applicable. "
+    "Each value should be a string or a list of strings, except 'experience' which should be an integer "
+    "(years of experience, default 0 if unclear). If a field cannot be determined, use appropriate defaults "
+    "(e.g., 'Unknown' for name, empty list [] for lists, '' for strings, 0 for experience). "
+)
+
+CV_FIELD_SPECS = {
+    "name": "'name' (string)",
+    "email": "'email' (string)",
+    "phone": "'phone' (string)",
+    "skills": "'skills' (list of strings)",
+    "education": "'education' (object with 'institution', 'degree' and 'gpa')",
+    "experience": "'experience' (integer years of experience)",
+    "work_experience": "'work_experience' (list of strings)",
+    "certifications": "'certifications' (list of strings)",
+    "projects": "'projects' (list of strings)",
+    "field_of_study": "'field_of_study' (string)",
+    "industry": "'industry' (string)",
+    "experience_details": "'experience_details' (list of objects with 'company', 'role' and 'duration' keys)"
+}
+
+def _fields_spec(fields: tuple) -> str:
+    # The pre-parser already has the other fields, so only these are asked for
+    return (
+        "only these keys: " + ", ".join(CV_FIELD_SPECS[f] for f in fields) + ". If a field cannot be determined, "
+        "use '' for strings, [] for lists and 0 for numbers. "
+    )
+
+def build_cv_prompt(text: str, fields: tuple = None) -> str:
+    if fields:
+        return (
+            "You are an AI assistant tasked with analyzing an excerpt of a CV. Extract the following information "
+            "and return it as a valid JSON object with " + _fields_spec(fields) +
+            "Do not include any additional text or Markdown formatting outside the JSON object.\n\n"
+            "CV Text:\n" + excerpt(text, fields)
+        )
+    return (
         "You are an AI assistant tasked with analyzing a CV. Extract the following information "
-        "and return it as a valid JSON object with these exact keys: 'name', 'email', 'phone', "
-        "'skills', 'education', 'experience', 'work_experience', 'certifications', 'projects', "
-        "'field_of_study', 'industry', 'experience_details'. 'experience_details' should be a list "
-        "of objects with 'company', 'role', and 'duration' keys. 'education' should be an object with "
-        "'institution' (string), 'degree' (string), and 'gpa' (string or number) if available, or an empty string if not applicable. "
-        "Each value should be a string or a list of strings, except 'experience' which should be an integer "
-        "(years of experience, default 0 if unclear). If a field cannot be determined, use appropriate defaults "
-        "(e.g., 'Unknown' for name, empty list [] for lists, '' for strings, 0 for experience). "
+        "and return it as a valid JSON object with these exact keys: " + CV_FIELDS_SPEC +
         "Do not include any additional text or Markdown formatting outside the JSON object.\n\n"
         "CV Text:\n" + text
     )
 
-    try:
-        logger.info("Sending request to Gemini API for CV")
-        response = requests.post(
-            GEMINI_API_URL,
-            headers={"Content-Type": "application/json"},
-            json={
-                "contents": [{"parts": [{"text": prompt}]}]
-            }
-        )
-        response.raise_for_status()
-    except requests.RequestException as e:
-        logger.error(f"Gemini API request failed for CV: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error from Gemini API: {str(e)}")
+def build_cv_batch_prompt(texts: List[str], fields: tuple = None) -> str:
+    header = (
+        "You are an AI assistant tasked with analyzing several CVs. Each CV is wrapped in '<<<CV n>>>' and "
+        "'<<<END CV n>>>' markers. For every CV, extract the following information into a JSON object with an "
+        "integer 'id' key set to that CV's n and " + (_fields_spec(fields) if fields else "these exact keys: " + CV_FIELDS_SPEC) +
+        "Return a valid JSON array containing exactly one object per CV. Do not include any additional "
+        "text or Markdown formatting outside the JSON array.\n\n"
+    )
+    if fields:
+        texts = [excerpt(text, fields) for text in texts]
+    body = "\n\n".join(f"<<<CV {i}>>>\n{text}\n<<<END CV {i}>>>" for i, text in enumerate(texts))
+    return header + body
 
-    try:
-        response_data = response.json()
-        generated_text = response_data["candidates"][0]["content"]["parts"][0]["text"]
-        cleaned_text = re.sub(r'^```json\s*|\s*```\s*$', '', generated_text, flags=re.MULTILINE).strip()
-        data = json.loads(cleaned_text)
-        logger.debug(f"Raw Gemini response data for CV: {data}")
-    except (KeyError, json.JSONDecodeError) as e:
-        logger.error(f"Failed to parse Gemini API response for CV: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to parse response: {str(e)}")
+def pack_cv_batches(texts: List[str], fields: tuple = None) -> List[List[int]]:
+    overhead = estimate_tokens(build_cv_batch_prompt([], fields))
+    batches, current, used = [], [], overhead
+    for i, text in enumerate(texts):
+        cost = estimate_tokens(text) + 10
+        if current and (used + cost > CV_BATCH_TOKEN_BUDGET or len(current) >= CV_BATCH_MAX_ITEMS):
+            batches.append(current)
+            current, used = [], overhead
+        current.append(i)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
 
+def normalize_cv_data(data: dict) -> dict:
     experience_raw = data.get("experience", 0)
-    logger.info(f"Raw experience data for CV: {experience_raw}")
+    # Payloads are only formatted when debug logging is on
+    logger.debug("Raw experience data for CV: %s", experience_raw)
     if isinstance(experience_raw, list):
         exp_str = str(experience_raw[0]) if experience_raw else "0"
         experience = int(re.search(r'\d+', exp_str).group()) if re.search(r'\d+', exp_str) else 0
@@ -302,114 +274,636 @@ def parse_cv(text: str) -> dict:
         "industry": data.get("industry", ""),
         "experience_details": data.get("experience_details", [])
     }
-    logger.info(f"Processed CV data: {cv_data}")
+    logger.debug("Processed CV data: %s", cv_data)
     return cv_data
 
-async def process_cvs(jd_id: int, files: List[UploadFile]):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM job_descriptions WHERE id = ?", (jd_id,))
-    jd_row = cursor.fetchone()
-    conn.close()
+def preparse(text: str) -> tuple:
+    """(pre-parsed data, fields still needed from Gemini); no fields means Gemini can be skipped, None means a full parse."""
+    data, confidence = preparse_cv(text)
+    overall = overall_confidence(confidence)
+    if overall >= CV_PREPARSE_SKIP_CONFIDENCE:
+        inc("cv_preparse_total", outcome="skip")
+        return data, ()
+    if overall >= CV_PREPARSE_SHORT_CONFIDENCE:
+        fields = tuple(f for f in CV_FIELD_SPECS if confidence.get(f, 0.0) < CV_PREPARSE_FIELD_CONFIDENCE)
+        inc("cv_preparse_total", outcome="short" if fields else "skip")
+        return data, fields
+    inc("cv_preparse_total", outcome="full")
+    return None, None
 
-    if not jd_row:
-        raise HTTPException(status_code=404, detail="JD not found")
+def _fields_key(text: str, fields: tuple) -> str:
+    return ",".join(fields) + "\0" + text
 
-    jd_data = {
-        "skills": json.loads(jd_row[3]) if jd_row[3] else [],
-        "education": json.loads(jd_row[7]) if jd_row[7] else {},
-        "experience": jd_row[8],
-        "responsibilities": json.loads(jd_row[4]) if jd_row[4] else [],
-        "projects": json.loads(jd_row[9]) if jd_row[9] else [],
-        "field_of_study": jd_row[10],
-        "summary": jd_row[2],
-        "requirements": json.loads(jd_row[5]) if jd_row[5] else [],
-        "industry": jd_row[11]
-    }
-    logger.debug(f"Retrieved JD data for matching: {jd_data}")
+def merge_fields(data: dict, answer, fields: tuple) -> dict:
+    answer = answer if isinstance(answer, dict) else {}
+    return dict(data, **{f: answer[f] for f in fields if f in answer})
 
-    processed_cvs = []
-    supported_types = [
-        "text/plain",
-        "application/pdf",
-        "application/msword",
-        "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-    ]
+def parse_cv(text: str) -> dict:
+    if not text:
+        logger.warning("Empty CV text provided")
+        return empty_cv_data()
 
-    for file in files:
-        logger.info(f"Processing file: {file.filename}, type: {file.content_type}, size: {file.size} bytes")
-        if file.content_type not in supported_types:
-            logger.warning(f"Unsupported file type for {file.filename}: {file.content_type}")
-            continue
+    data, fields = preparse(text) if CV_PREPARSE else (None, None)
+    if fields is not None:
+        if fields:
+            answer = generate_json(build_cv_prompt(text, fields), "CV fields", CV_FIELDS_PROMPT_VERSION, _fields_key(text, fields))
+            data = merge_fields(data, answer, fields)
+        return normalize_cv_data(data)
+    data = generate_json(build_cv_prompt(text), "CV", CV_PROMPT_VERSION, text)
+    return normalize_cv_data(data)
 
-        try:
-            content = await file.read()
-            if file.content_type == "text/plain":
-                text = content.decode('utf-8').strip()
-                logger.debug(f"Extracted text (plain): {text[:500]}...")
-            elif file.content_type == "application/pdf":
-                text = extract_text(file.file).strip()
-                logger.debug(f"Extracted PDF text: {text[:500]}...")
-            elif file.content_type in [
-                "application/msword",
-                "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-            ]:
-                doc = docx.Document(file.file)
-                text = "\n".join([para.text for para in doc.paragraphs]).strip()
-                logger.debug(f"Extracted DOCX text: {text[:500]}...")
-            else:
-                logger.error(f"Unexpected file type: {file.content_type}")
+async def parse_cv_async(text: str) -> dict:
+    if not text:
+        logger.warning("Empty CV text provided")
+        return empty_cv_data()
+
+    data, fields = preparse(text) if CV_PREPARSE else (None, None)
+    if fields is not None:
+        if fields:
+            answer = await generate_json_async(
+                build_cv_prompt(text, fields), "CV fields", CV_FIELDS_PROMPT_VERSION, _fields_key(text, fields)
+            )
+            data = merge_fields(data, answer, fields)
+        return normalize_cv_data(data)
+    data = await generate_json_async(build_cv_prompt(text), "CV", CV_PROMPT_VERSION, text)
+    return normalize_cv_data(data)
+
+def _valid_cv_item(item, fields: tuple = None) -> bool:
+    if fields:
+        return isinstance(item, dict)
+    return isinstance(item, dict) and "name" in item and isinstance(item.get("skills", []), (list, str))
+
+async def _parse_cv_batch_async(texts: List[str], fields: tuple = None) -> list:
+    kind = "CV fields batch" if fields else "CV batch"
+    try:
+        data = await request_json_async(build_cv_batch_prompt(texts, fields), kind, len(texts))
+    except HTTPException as e:
+        logger.warning(f"Batched CV parse failed, falling back to single requests: {e.detail}")
+        return [None] * len(texts)
+    if not isinstance(data, list):
+        logger.warning("Batched CV parse did not return a JSON array, falling back to single requests")
+        return [None] * len(texts)
+
+    by_id = {}
+    for item in data:
+        if isinstance(item, dict):
+            try:
+                by_id[int(item.pop("id"))] = item
+            except (KeyError, TypeError, ValueError):
                 continue
+    if not by_id and len(data) == len(texts):
+        by_id = dict(enumerate(data))
+    return [by_id.get(i) if _valid_cv_item(by_id.get(i), fields) else None for i in range(len(texts))]
+
+async def parse_cvs_async(texts: List[str]) -> list:
+    """Parse many CVs, packing cache misses into multi-CV prompts. Unparseable CVs come back as None.
+
+    Well-structured CVs are read by the local pre-parser; Gemini only sees the ones it is unsure about.
+    """
+    results = [None] * len(texts)
+    pending = []
+    preparsed = {}
+    # Identical texts (the same file uploaded twice) are parsed once
+    first_index = {}
+    copies = []
 
+    def lookup():
+        for i, text in enumerate(texts):
             if not text:
-                logger.warning(f"Empty content in {file.filename}")
+                results[i] = empty_cv_data()
+                continue
+            if text in first_index:
+                copies.append((i, first_index[text]))
+                continue
+            first_index[text] = i
+            cached = parse_cache.get("CV", CV_PROMPT_VERSION, text)
+            if cached is not None:
+                results[i] = normalize_cv_data(cached)
                 continue
+            if CV_PREPARSE:
+                data, fields = preparse(text)
+                if fields == ():
+                    results[i] = normalize_cv_data(data)
+                    continue
+                if fields:
+                    cached = parse_cache.get("CV fields", CV_FIELDS_PROMPT_VERSION, _fields_key(text, fields))
+                    if cached is not None:
+                        results[i] = normalize_cv_data(merge_fields(data, cached, fields))
+                        continue
+                    preparsed[i] = (data, fields)
+            pending.append(i)
 
-            cv_data = parse_cv(text)
-            logger.debug(f"CV data before matching: {cv_data}")
-            scores = calculate_match_score(jd_data, cv_data)
-            match_score = scores['overall_match'] * 100
-            match_breakdown = {
-                "skills": scores['skills_match'] * 100,
-                "experience": scores['experience_relevance'] * 100,
-                "education": scores['education_match'] * 100,
-                "industryRelevance": scores['industry_relevance'] * 100
-            }
-            experience_details = cv_data.pop("experience_details", [])
+    # Cache reads are SQLite and pre-parsing is CPU-bound; one thread does both for the whole upload
+    await asyncio.to_thread(lookup)
+
+    # Full parses and each distinct set of missing fields go into separate prompts
+    groups = {}
+    for i in pending:
+        groups.setdefault(preparsed[i][1] if i in preparsed else None, []).append(i)
+    batches = []
+    for fields, indices in groups.items():
+        if CV_BATCH_PARSING:
+            sized = [excerpt(texts[i], fields) if fields else texts[i] for i in indices]
+            batches += [(fields, [indices[k] for k in batch]) for batch in pack_cv_batches(sized, fields)]
+        else:
+            batches += [(fields, [i]) for i in indices]
+
+    async def run(fields, batch):
+        items = await _parse_cv_batch_async([texts[i] for i in batch], fields) if len(batch) > 1 else [None]
+        for i, data in zip(batch, items):
             try:
-                save_cv_to_db(jd_id, cv_data, match_score, match_breakdown, experience_details)
-                processed_cvs.append({
-                    "id": len(processed_cvs) + 1,
-                    "name": cv_data['name'],
-                    "email": cv_data['email'],
-                    "phone": cv_data['phone'],
-                    "skills": cv_data['skills'],
-                    "education": cv_data['education'],
-                    "experience": cv_data['experience'],
-                    "experienceDetails": experience_details,
-                    "matchScore": round(match_score, 2),
-                    "matchBreakdown": match_breakdown
-                })
-                logger.info(f"Successfully processed CV: {cv_data['name']} with match score {match_score}%")
-            except sqlite3.Error as e:
-                logger.error(f"Database error for {cv_data['name']}: {str(e)}, but adding to response anyway", exc_info=True)
-                processed_cvs.append({
-                    "id": len(processed_cvs) + 1,
-                    "name": cv_data['name'],
-                    "email": cv_data['email'],
-                    "phone": cv_data['phone'],
-                    "skills": cv_data['skills'],
-                    "education": cv_data['education'],
-                    "experience": cv_data['experience'],
-                    "experienceDetails": experience_details,
-                    "matchScore": round(match_score, 2),
-                    "matchBreakdown": match_breakdown
-                })
-        except Exception as e:
-            logger.error(f"Error processing {file.filename}: {str(e)}", exc_info=True)
+                if data is None:
+                    if len(batch) > 1:
+                        inc("gemini_retries_total", reason="batch_fallback")
+                    data = await request_json_async(build_cv_prompt(texts[i], fields), "CV fields" if fields else "CV")
+                if fields:
+                    await asyncio.to_thread(
+                        parse_cache.put, "CV fields", CV_FIELDS_PROMPT_VERSION, _fields_key(texts[i], fields), data
+                    )
+                    data = merge_fields(preparsed[i][0], data, fields)
+                else:
+                    await asyncio.to_thread(parse_cache.put, "CV", CV_PROMPT_VERSION, texts[i], data)
+                results[i] = normalize_cv_data(data)
+            except Exception as e:
+                logger.error(f"Failed to parse CV #{i}: {str(e)}", exc_info=True)
+
+    await asyncio.gather(*(run(fields, batch) for fields, batch in batches))
+    for i, source in copies:
+        results[i] = normalize_cv_data(results[source]) if results[source] is not None else None
+    return results
+
+def _find_stored_cvs(texts: List[str]) -> tuple:
+    """Fingerprints of the texts and the parsed data of the stored CVs they reuse.
+
+    source_cv_id is set where the same text is stored. A near-identical text only sets near_cv_id: it may be another
+    person's CV on the same template, or an edited re-upload, so it is parsed again and at most linked to a candidate.
+    """
+    fingerprints = [fingerprint(text) if text else None for text in texts]
+    by_content = find_cvs_by_content(list({f["content_hash"] for f in fingerprints if f}))
+    for f in fingerprints:
+        if f is None:
+            continue
+        f["source_cv_id"] = by_content.get(f["content_hash"])
+        if f["source_cv_id"] is not None:
+            inc("identity_lookups_total", result="exact")
+            continue
+        signatures = find_signatures_in_buckets(f["buckets"])
+        best, best_cv_id = max(
+            ((similarity(f["signature"], np.frombuffer(blob, dtype=np.uint32)), cv_id) for cv_id, blob in signatures.items()),
+            default=(0.0, None)
+        )
+        if best >= IDENTITY_NEAR_DUP_THRESHOLD:
+            f["near_cv_id"] = best_cv_id
+        inc("identity_lookups_total", result="near" if f["near_cv_id"] is not None else "none")
+    return fingerprints, load_cvs(list({f["source_cv_id"] for f in fingerprints if f and f["source_cv_id"]}))
+
+async def parse_uploaded_cvs(texts: List[str]) -> list:
+    """parse_cvs_async for uploads: a CV whose text is already on file reuses its parsed data.
+
+    Each CV carries its identity fingerprint, which score_and_store uses to link it to its candidate.
+    """
+    if not IDENTITY_DEDUP:
+        return await parse_cvs_async(texts)
+    fingerprints, stored = await asyncio.to_thread(_find_stored_cvs, texts)
+    results = [None] * len(texts)
+    pending = []
+    for i, f in enumerate(fingerprints):
+        cv_data = stored.get(f["source_cv_id"]) if f else None
+        if cv_data is not None:
+            results[i] = {key: copy.deepcopy(value) for key, value in cv_data.items() if key != "jd_id"}
+        else:
+            if f:
+                f["source_cv_id"] = None
+            pending.append(i)
+    if len(pending) < len(texts):
+        logger.info(f"Reusing parsed data for {len(texts) - len(pending)} of {len(texts)} CVs already on file")
+    for i, cv_data in zip(pending, await parse_cvs_async([texts[i] for i in pending])):
+        results[i] = cv_data
+    for cv_data, f in zip(results, fingerprints):
+        if cv_data is not None and f is not None:
+            cv_data["identity"] = f
+    return results
+
+def match_breakdown_from_scores(scores: dict) -> dict:
+    return {
+        "skills": scores['skills_match'] * 100,
+        "experience": scores['experience_relevance'] * 100,
+        "education": scores['education_match'] * 100,
+        "industryRelevance": scores['industry_relevance'] * 100
+    }
+
+def store_scored_cvs(jd_id: int, parsed_cvs: List[dict], all_scores: List[dict], cv_embeddings: List[dict] = None,
+                     raw_scores: np.ndarray = None, model_name: str = None) -> List[dict]:
+    model_name = model_name or embedding_key()
+    scored = []
+    identities = []
+    for cv_data, scores in zip(parsed_cvs, all_scores):
+        match_score = scores['overall_match'] * 100
+        experience_details = cv_data.pop("experience_details", [])
+        identity = cv_data.pop("identity", None)
+        if identity is not None:
+            identity["keys"] = identity_keys(cv_data)
+        identities.append(identity)
+        scored.append((cv_data, match_score, match_breakdown_from_scores(scores), experience_details))
+
+    # The whole upload is written in one transaction
+    cv_ids = [None] * len(scored)
+    candidate_ids = [None] * len(scored)
+    try:
+        with timed("db_write", len(scored)):
+            if any(identities):
+                linked, moved = save_linked_cvs(jd_id, scored, identities, cv_embeddings, raw_scores, model_name)
+                cv_ids = [cv_id for cv_id, _, _ in linked]
+                candidate_ids = [candidate_id for _, candidate_id, _ in linked]
+                # Only CVs stored with their own embeddings are new to the search index
+                indexed = [status == "new" and (identity is None or identity["source_cv_id"] is None)
+                           for (_, _, status), identity in zip(linked, identities)]
+            else:
+                cv_ids = save_cvs(jd_id, scored, cv_embeddings, raw_scores, model_name)
+                indexed = [True] * len(cv_ids)
+                moved = {}
+        if cv_embeddings:
+            for cv_id, embeddings, index in zip(cv_ids, cv_embeddings, indexed):
+                if index:
+                    candidate_index.add(cv_id, embeddings)
+        if moved:
+            # Replaced CVs and those that took over their embeddings, as now stored
+            candidate_index.remove([cv_id for cv_id, holds in moved.items() if not holds])
+            holders = [cv_id for cv_id, holds in moved.items() if holds]
+            for cv_id, embeddings in load_cv_embeddings(holders, model_name).items():
+                candidate_index.add(cv_id, embeddings)
+        logger.info(f"Successfully stored {len(cv_ids)} CVs for JD ID {jd_id}")
+    except sqlite3.Error as e:
+        logger.error(f"Database error for JD ID {jd_id}: {str(e)}, but adding CVs to response anyway", exc_info=True)
+
+    processed_cvs = []
+    for cv_id, candidate_id, (cv_data, match_score, match_breakdown, experience_details) in zip(cv_ids, candidate_ids, scored):
+        processed_cvs.append({
+            "id": len(processed_cvs) + 1,
+            "cvId": cv_id,
+            "candidateId": candidate_id,
+            "name": cv_data['name'],
+            "email": cv_data['email'],
+            "phone": cv_data['phone'],
+            "skills": cv_data['skills'],
+            "education": cv_data['education'],
+            "experience": cv_data['experience'],
+            "experienceDetails": experience_details,
+            "matchScore": round(match_score, 2),
+            "matchBreakdown": match_breakdown
+        })
+    return processed_cvs
+
+def score_and_store(jd_id: int, jd_data: dict, jd_embeddings: dict, parsed_cvs: List[dict]) -> List[dict]:
+    # CV sections are embedded once, used for scoring and persisted for candidate search
+    model_name = embedding_key()
+    identities = [cv_data.get("identity") for cv_data in parsed_cvs]
+    sources = [identity["source_cv_id"] if identity else None for identity in identities]
+    # CVs already on file reuse their stored embeddings
+    stored = load_cv_embeddings(list({source for source in sources if source}), model_name) if any(sources) else {}
+    missing = [i for i, source in enumerate(sources) if source not in stored]
+    cv_embeddings = [stored.get(source) for source in sources]
+    for i, embeddings in zip(missing, compute_cv_embeddings([parsed_cvs[i] for i in missing])):
+        cv_embeddings[i] = embeddings
+        if identities[i]:
+            identities[i]["source_cv_id"] = None
+    with timed("score", len(parsed_cvs)):
+        raw_scores = section_scores(jd_data, parsed_cvs, jd_embeddings, cv_embeddings)
+        all_scores = scores_from_sections(raw_scores)
+    return store_scored_cvs(jd_id, parsed_cvs, all_scores, cv_embeddings, raw_scores, model_name)
+
+def search_candidates(jd_data: dict, jd_embeddings: dict, top_k: int) -> List[dict]:
+    """Rank every stored candidate against a JD: vector retrieval first, then full rescoring of the shortlist."""
+    model_name = embedding_key()
+    candidate_index.ensure_built(lambda: load_cv_embeddings(None, model_name))
+    query = profile_vector(jd_embeddings)
+    if query is None:
+        return []
+
+    hits = candidate_index.search(query, top_k * SEARCH_RERANK_FACTOR)
+    similarity = dict(hits)
+    cvs = load_cvs(list(similarity))
+    cv_ids = [cv_id for cv_id, _ in hits if cv_id in cvs]
+    cv_embeddings = load_cv_embeddings(cv_ids, model_name)
+    all_scores = calculate_match_scores(
+        jd_data, [cvs[cv_id] for cv_id in cv_ids], None, jd_embeddings, [cv_embeddings.get(cv_id, {}) for cv_id in cv_ids]
+    )
+
+    results = []
+    for cv_id, scores in zip(cv_ids, all_scores):
+        cv_data = cvs[cv_id]
+        results.append({
+            "cvId": cv_id,
+            "sourceJdId": cv_data['jd_id'],
+            "name": cv_data['name'],
+            "email": cv_data['email'],
+            "phone": cv_data['phone'],
+            "skills": cv_data['skills'],
+            "education": cv_data['education'],
+            "experience": cv_data['experience'],
+            "experienceDetails": cv_data['experience_details'],
+            "matchScore": round(scores['overall_match'] * 100, 2),
+            "matchBreakdown": match_breakdown_from_scores(scores),
+            "similarity": round(similarity[cv_id], 4)
+        })
+    results.sort(key=lambda c: c["matchScore"], reverse=True)
+    return results[:top_k]
+
+def backfill_section_scores(jd_id: int, jd_data: dict, jd_embeddings: dict, cv_ids: List[int]):
+    cvs = load_cvs(cv_ids)
+    cv_ids = [cv_id for cv_id in cv_ids if cv_id in cvs]
+    if not cv_ids:
+        return
+    cv_embeddings = load_cv_embeddings(cv_ids, embedding_key())
+    raw_scores = section_scores(
+        jd_data, [cvs[cv_id] for cv_id in cv_ids], jd_embeddings, [cv_embeddings.get(cv_id, {}) for cv_id in cv_ids]
+    )
+    save_section_scores(jd_id, cv_ids, raw_scores)
+    logger.info(f"Backfilled section scores for {len(cv_ids)} CVs of JD ID {jd_id}")
+
+def normalized_weights(weights: dict = None) -> np.ndarray:
+    """Section weight vector from overrides of the default weights, scaled to sum to 1."""
+    weights = weights or {}
+    unknown = set(weights) - set(SECTIONS)
+    if unknown:
+        raise ValueError(f"Unknown sections: {', '.join(sorted(unknown))}")
+    weights = dict(DEFAULT_CONFIG['weights'], **weights)
+    if any(w < 0 for w in weights.values()) or sum(weights.values()) <= 0:
+        raise ValueError("Weights must be non-negative and not all zero")
+    # Weights are normalised so slider percentages and fractions give the same 0-100 scale
+    w = weight_vector(weights)
+    return w / w.sum()
+
+def rerank_from_section_scores(jd_id: int, weights: dict, limit: int, offset: int = 0) -> dict:
+    """Re-rank every scored CV of a JD with new section weights; one matrix-vector product over the stored scores."""
+    w = normalized_weights(weights)
+    cv_ids, scores = load_section_scores(jd_id)
+    overall = scores @ w
+    order = np.lexsort((cv_ids, -overall))[offset:offset + limit]
+    summaries = load_candidate_summaries([int(cv_ids[i]) for i in order])
+
+    candidates = []
+    for i in order:
+        candidate = summaries.get(int(cv_ids[i]))
+        if candidate is None:
+            continue
+        candidate["matchScore"] = round(float(overall[i]) * 100, 2)
+        candidate["sectionScores"] = {section: round(float(score) * 100, 2) for section, score in zip(SECTIONS, scores[i])}
+        candidates.append(candidate)
+    return {
+        "jd_id": jd_id,
+        "weights": dict(zip(SECTIONS, (round(float(x), 4) for x in w))),
+        "total": int(cv_ids.size),
+        "offset": offset,
+        "candidates": candidates
+    }
+
+async def rerank_candidates(jd_id: int, weights: dict, limit: int, offset: int = 0) -> dict:
+    missing = await asyncio.to_thread(unscored_cv_ids, jd_id)
+    if missing:
+        jd_data, jd_embeddings = await load_jd_for_matching(jd_id)
+        await asyncio.to_thread(backfill_section_scores, jd_id, jd_data, jd_embeddings, missing)
+    return await asyncio.to_thread(rerank_from_section_scores, jd_id, weights, limit, offset)
+
+def bulk_match(jds: dict, cv_ids: List[int], top_k: int, weights: dict = None,
+               chunk_size: int = BULK_MATCH_CHUNK_SIZE) -> dict:
+    """Score stored CVs against several JDs; returns the top_k candidates per JD and the top_k JDs per candidate.
+
+    jds maps jd_id to (jd_data, jd_embeddings). CVs are loaded and scored chunk_size at a time and only the running
+    top_k per JD is kept between chunks.
+    """
+    w = normalized_weights(weights)
+    jd_ids = list(jds)
+    jd_list = [jds[jd_id][0] for jd_id in jd_ids]
+    jd_embeddings = [jds[jd_id][1] for jd_id in jd_ids]
+    jd_column = np.array(jd_ids, dtype=np.int64)[:, None]
+    cv_ids = list(dict.fromkeys(cv_ids))
+
+    best_scores = np.empty((len(jd_ids), 0))
+    best_ids = np.empty((len(jd_ids), 0), dtype=np.int64)
+    best_sections = np.empty((len(jd_ids), 0, len(SECTIONS)))
+    per_candidate = []
+    model_name = embedding_key()
+    for start in range(0, len(cv_ids), chunk_size):
+        cvs = load_cvs(cv_ids[start:start + chunk_size])
+        chunk = [cv_id for cv_id in cv_ids[start:start + chunk_size] if cv_id in cvs]
+        if not chunk:
             continue
+        cv_embeddings = load_cv_embeddings(chunk, model_name)
+        with timed("bulk_match", len(chunk) * len(jd_ids)):
+            raw = section_score_blocks(
+                jd_list, [cvs[cv_id] for cv_id in chunk], jd_embeddings, [cv_embeddings.get(cv_id, {}) for cv_id in chunk]
+            )
+            overall = raw @ w
+
+        # Every JD is in the block, so each candidate's best JDs are final; ties go to the lower id
+        jd_order = np.lexsort((np.broadcast_to(jd_column, overall.shape), -overall), axis=0)[:top_k]
+        for col, cv_id in enumerate(chunk):
+            per_candidate.append({
+                "cvId": cv_id,
+                "sourceJdId": cvs[cv_id]['jd_id'],
+                "name": cvs[cv_id]['name'],
+                "matches": [{"jd_id": jd_ids[row], "matchScore": round(float(overall[row, col]) * 100, 2)}
+                            for row in jd_order[:, col]]
+            })
+
+        scores = np.concatenate([best_scores, overall], axis=1)
+        ids = np.concatenate([best_ids, np.broadcast_to(np.array(chunk, dtype=np.int64), overall.shape)], axis=1)
+        sections = np.concatenate([best_sections, raw], axis=1)
+        keep = np.lexsort((ids, -scores), axis=1)[:, :top_k]
+        best_scores = np.take_along_axis(scores, keep, axis=1)
+        best_ids = np.take_along_axis(ids, keep, axis=1)
+        best_sections = np.take_along_axis(sections, keep[:, :, None], axis=1)
+
+    summaries = load_candidate_summaries(list({int(cv_id) for cv_id in best_ids.ravel()}))
+    per_jd = []
+    for row, jd_id in enumerate(jd_ids):
+        candidates = []
+        for cv_id, score, section_row in zip(best_ids[row], best_scores[row], best_sections[row]):
+            candidate = summaries.get(int(cv_id))
+            if candidate is None:
+                continue
+            candidates.append(dict(
+                candidate,
+                matchScore=round(float(score) * 100, 2),
+                sectionScores={section: round(float(s) * 100, 2) for section, s in zip(SECTIONS, section_row)}
+            ))
+        per_jd.append({"jd_id": jd_id, "candidates": candidates})
+
+    found = {c["cvId"] for c in per_candidate}
+    return {
+        "jd_ids": jd_ids,
+        "weights": dict(zip(SECTIONS, (round(float(x), 4) for x in w))),
+        "total": len(found),
+        "missing_cv_ids": [cv_id for cv_id in cv_ids if cv_id not in found],
+        "per_jd": per_jd,
+        "per_candidate": per_candidate
+    }
+
+async def bulk_match_candidates(jd_ids: List[int], cv_ids: List[int], top_k: int, weights: dict = None) -> dict:
+    jds = {}
+    for jd_id in dict.fromkeys(jd_ids):
+        try:
+            jds[jd_id] = await load_jd_for_matching(jd_id)
+        except HTTPException:
+            raise HTTPException(status_code=404, detail=f"JD {jd_id} not found")
+    return await asyncio.to_thread(bulk_match, jds, cv_ids, top_k, weights)
+
+def rescore_sections(jd_id: int, jd_data: dict, jd_embeddings: dict, sections: tuple,
+                     chunk_size: int = BULK_MATCH_CHUNK_SIZE) -> tuple:
+    """(cv_ids, N x len(SECTIONS) scores) for a JD's candidates with only `sections` recomputed.
+
+    The other sections keep their persisted scores. CVs stored before section scores were persisted are scored on
+    every section.
+    """
+    stored_ids, stored = load_section_scores(jd_id)
+    missing = unscored_cv_ids(jd_id)
+    cv_ids = [int(cv_id) for cv_id in stored_ids] + missing
+    scores = np.vstack([stored, np.zeros((len(missing), len(SECTIONS)))])
+    rescored = np.zeros(len(cv_ids), dtype=bool)
+    model_name = embedding_key()
+    for begin, end, wanted in ((0, len(stored_ids), sections), (len(stored_ids), len(cv_ids), SECTIONS)):
+        if not wanted:
+            continue
+        columns = [SECTIONS.index(section) for section in wanted]
+        for start in range(begin, end, chunk_size):
+            chunk = cv_ids[start:min(start + chunk_size, end)]
+            cvs = load_cvs(chunk)
+            rows = [start + i for i, cv_id in enumerate(chunk) if cv_id in cvs]
+            if not rows:
+                continue
+            present = [cv_ids[row] for row in rows]
+            cv_embeddings = load_cv_embeddings(present, model_name)
+            block = section_score_blocks(
+                [jd_data], [cvs[cv_id] for cv_id in present], [jd_embeddings],
+                [cv_embeddings.get(cv_id, {}) for cv_id in present], wanted
+            )[0]
+            scores[np.ix_(rows, columns)] = block
+            rescored[rows] = True
+    return [cv_id for cv_id, done in zip(cv_ids, rescored) if done], scores[rescored]
+
+def apply_jd_update(jd_id: int, jd_data: dict, changes: dict) -> dict:
+    jd_data = dict(jd_data, **changes)
+    model_name = embedding_key()
+    # Only sections whose texts changed are embedded again, and only the scores that depend on changed fields recomputed
+    jd_embeddings, reembedded = update_jd_embeddings(jd_data, load_jd_embeddings(jd_id, model_name))
+    sections = affected_sections(changes)
+    cv_ids, scores = rescore_sections(jd_id, jd_data, jd_embeddings, sections)
+    matches = [(s['overall_match'] * 100, match_breakdown_from_scores(s)) for s in scores_from_sections(scores)]
+    with timed("db_write", len(cv_ids)):
+        save_jd_update(jd_id, changes, jd_embeddings, cv_ids, scores, matches, model_name)
+    logger.info(f"Updated JD ID {jd_id} ({', '.join(changes) or 'no changes'}): re-embedded {len(reembedded)} sections, "
+                f"re-scored {len(cv_ids)} CVs on {', '.join(sections) or 'no sections'}")
+    return {
+        "jd_id": jd_id,
+        "jd_data": jd_data,
+        "changed_fields": list(changes),
+        "reembedded_sections": reembedded,
+        "rescored_sections": list(sections),
+        "rescored": len(cv_ids)
+    }
+
+async def update_job_description(jd_id: int, updates: dict) -> dict:
+    """Apply edited structured fields to a stored JD and re-score its candidates where the edit affects them."""
+    jd_data = await asyncio.to_thread(load_jd, jd_id)
+    if not jd_data:
+        raise HTTPException(status_code=404, detail="JD not found")
+    if "education" in updates:
+        updates = dict(updates, education=normalize_jd_education(updates["education"]))
+    changes = {field: value for field, value in updates.items() if jd_data.get(field) != value}
+    return await asyncio.to_thread(apply_jd_update, jd_id, jd_data, changes)
 
-    logger.info(f"Final processed_cvs before return: {processed_cvs}")
+async def load_jd_for_matching(jd_id: int):
+    jd_data = await asyncio.to_thread(load_jd, jd_id)
+    if not jd_data:
+        raise HTTPException(status_code=404, detail="JD not found")
+    logger.debug("Retrieved JD data for matching: %s", jd_data)
+    # Resolving the embedding key loads the model, so none of this may run on the event loop
+    return jd_data, await asyncio.to_thread(jd_embeddings_for_matching, jd_id, jd_data)
+
+def jd_embeddings_for_matching(jd_id: int, jd_data: dict) -> dict:
+    model_name = embedding_key()
+    jd_embeddings = load_jd_embeddings(jd_id, model_name)
+    if not jd_embeddings:
+        # JDs saved before embeddings were persisted, or embedded by another backend, are backfilled on first use
+        jd_embeddings = compute_jd_embeddings(jd_data)
+        try:
+            save_jd_embeddings(jd_id, jd_embeddings, model_name)
+        except sqlite3.Error:
+            pass
+    return jd_embeddings
+
+async def process_cvs(jd_id: int, files: List[UploadFile]):
+    jd_data, jd_embeddings = await load_jd_for_matching(jd_id)
+
+    # Files are extracted and parsed concurrently; Gemini calls are bounded by the client's concurrency and quota
+    uploads = []
+    for file in files:
+        logger.info(f"Processing file: {file.filename}, type: {file.content_type}, size: {file.size} bytes")
+        uploads.append((file.filename, file.content_type, await file.read()))
+    extracted = await extract_upload_texts([(content_type, content) for _, content_type, content in uploads])
+    texts = []
+    for (filename, _, _), (text, error) in zip(uploads, extracted):
+        if error:
+            logger.warning(f"Skipping {filename}: {error}")
+        else:
+            texts.append(text)
+    parsed_cvs = [cv_data for cv_data in await parse_uploaded_cvs(texts) if cv_data is not None]
+
+    # Score the whole upload at once so the JD side and repeated phrases are embedded a single time
+    processed_cvs = await asyncio.to_thread(score_and_store, jd_id, jd_data, jd_embeddings, parsed_cvs)
+
+    logger.info(f"Processed {len(processed_cvs)} of {len(files)} CVs for JD ID {jd_id}")
     return {"processed_cvs": processed_cvs, "success": True}
 
-init_db()
\ No newline at end of file
+async def stream_cvs(jd_id: int, uploads: List[tuple], jd_data: dict, jd_embeddings: dict):
+    """Yield progress, candidate and error events as each parse batch of (filename, content_type, content) finishes."""
+    total = len(uploads)
+    completed = 0
+    yield {"type": "progress", "total": total, "completed": completed}
+
+    extracted = await extract_upload_texts([(content_type, content) for _, content_type, content in uploads])
+    ready = []
+    for index, ((filename, _, _), (text, error)) in enumerate(zip(uploads, extracted)):
+        if error:
+            logger.warning(f"Skipping {filename}: {error}")
+            completed += 1
+            yield {"type": "error", "index": index, "file": filename, "detail": error}
+        else:
+            ready.append((index, filename, text))
+
+    async def handle(chunk):
+        try:
+            parsed = await parse_uploaded_cvs([text for _, _, text in chunk])
+            ok = [(item, cv_data) for item, cv_data in zip(chunk, parsed) if cv_data is not None]
+            failed = [item for item, cv_data in zip(chunk, parsed) if cv_data is None]
+            cvs = [cv_data for _, cv_data in ok]
+            candidates = await asyncio.to_thread(score_and_store, jd_id, jd_data, jd_embeddings, cvs)
+            return chunk, [item for item, _ in ok], failed, candidates
+        except Exception as e:
+            logger.error(f"Error processing CV batch: {str(e)}", exc_info=True)
+            return chunk, [], chunk, []
+
+    if CV_BATCH_PARSING:
+        chunks = [[ready[i] for i in batch] for batch in pack_cv_batches([text for _, _, text in ready])]
+    else:
+        chunks = [[item] for item in ready]
+    tasks = [asyncio.create_task(handle(chunk)) for chunk in chunks]
+    next_id = 1
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            chunk, ok, failed, candidates = await next_done
+            for (index, filename, _), candidate in zip(ok, candidates):
+                candidate["id"] = next_id
+                next_id += 1
+                yield {"type": "candidate", "index": index, "file": filename, "candidate": candidate}
+            for index, filename, _ in failed:
+                yield {"type": "error", "index": index, "file": filename, "detail": "Failed to parse CV"}
+            completed += len(chunk)
+            yield {"type": "progress", "total": total, "completed": completed}
+    finally:
+        # Stop outstanding work if the client disconnects mid-stream
+        for task in tasks:
+            task.cancel()
+
+    yield {"type": "done", "total": total, "processed": next_id - 1}
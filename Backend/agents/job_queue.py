@@ -0,0 +1,274 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from typing import List, Optional
+from fastapi import HTTPException, UploadFile
+from .jd_summarizer import load_jd_for_matching
+from .ingest import INGEST_MAX_ENTRIES, INGEST_MAX_FILE_BYTES, INGEST_MAX_TOTAL_BYTES, ingest_cvs, read_entries
+from .metrics import trace_id
+from db.database import get_db_connection, transaction
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_SPOOL_DIR = os.getenv("JOB_SPOOL_DIR", "job_spool")
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "5"))
+# A running job whose heartbeat is older than this is assumed orphaned and requeued
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "300"))
+# How often a running job refreshes its heartbeat, independent of how long any one batch takes
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", str(JOB_STALE_SECONDS / 5)))
+# Disable when several server processes share one database, otherwise a restart steals their running jobs
+JOB_REQUEUE_ON_START = os.getenv("JOB_REQUEUE_ON_START", "1") == "1"
+
+_wakeup = asyncio.Event()
+_workers: List[asyncio.Task] = []
+
+def init_job_tables():
+    with transaction() as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                jd_id INTEGER,
+                status TEXT,
+                total INTEGER,
+                completed INTEGER DEFAULT 0,
+                failed INTEGER DEFAULT 0,
+                error TEXT,
+                created_at REAL,
+                updated_at REAL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS job_items (
+                job_id TEXT,
+                idx INTEGER,
+                filename TEXT,
+                content_type TEXT,
+                spool_path TEXT,
+                status TEXT DEFAULT 'pending',
+                result TEXT,
+                error TEXT,
+                PRIMARY KEY (job_id, idx)
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+
+async def submit_job(jd_id: int, files: List[UploadFile]) -> str:
+    # The ingestion caps are enforced here, so a queued job never stops partway through at one of them
+    if len(files) > INGEST_MAX_ENTRIES:
+        raise HTTPException(status_code=413, detail=f"Upload has more than {INGEST_MAX_ENTRIES} files")
+    job_id = uuid.uuid4().hex
+    job_dir = os.path.join(JOB_SPOOL_DIR, job_id)
+    os.makedirs(job_dir, exist_ok=True)
+
+    # Uploads are spooled to disk so the job survives restarts and client disconnects
+    items = []
+    total = 0
+    for idx, file in enumerate(files):
+        path = os.path.join(job_dir, str(idx))
+        size = await asyncio.to_thread(_copy_file, file.file, path)
+        # Files over the per-file cap are skipped when the job runs, so they do not count towards the total
+        total += size if size <= INGEST_MAX_FILE_BYTES else 0
+        if total > INGEST_MAX_TOTAL_BYTES:
+            await asyncio.to_thread(shutil.rmtree, job_dir, ignore_errors=True)
+            raise HTTPException(status_code=413, detail=f"Upload is larger than {INGEST_MAX_TOTAL_BYTES} bytes")
+        items.append((job_id, idx, file.filename, file.content_type, path))
+
+    await asyncio.to_thread(_insert_job, job_id, jd_id, items)
+    logger.info(f"Queued job {job_id} for JD ID {jd_id} with {len(items)} files")
+    _wakeup.set()
+    return job_id
+
+def _insert_job(job_id: str, jd_id: int, items: list):
+    now = time.time()
+    with transaction() as conn:
+        conn.executemany(
+            "INSERT INTO job_items (job_id, idx, filename, content_type, spool_path) VALUES (?, ?, ?, ?, ?)",
+            items
+        )
+        conn.execute(
+            "INSERT INTO jobs (id, jd_id, status, total, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+            (job_id, jd_id, len(items), now, now)
+        )
+
+def _copy_file(source, path: str) -> int:
+    # Copied in chunks so a large upload is never held in memory whole
+    source.seek(0)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(source, f)
+        return f.tell()
+
+def get_job(job_id: str) -> Optional[dict]:
+    row = get_db_connection().execute(
+        "SELECT id, jd_id, status, total, completed, failed, error, created_at, updated_at FROM jobs WHERE id = ?",
+        (job_id,)
+    ).fetchone()
+    if not row:
+        return None
+    job = dict(zip(("job_id", "jd_id", "status", "total", "completed", "failed", "error", "created_at", "updated_at"), row))
+    job["progress"] = round(job["completed"] / job["total"], 4) if job["total"] else 1.0
+    return job
+
+def get_job_results(job_id: str, offset: int = 0, limit: int = 50) -> dict:
+    rows = get_db_connection().execute('''
+        SELECT idx, filename, status, result, error FROM job_items
+        WHERE job_id = ? AND status != 'pending'
+        ORDER BY idx LIMIT ? OFFSET ?
+    ''', (job_id, limit, offset)).fetchall()
+    results = []
+    for idx, filename, status, result, error in rows:
+        entry = {"index": idx, "file": filename, "status": status}
+        if result:
+            entry["candidate"] = json.loads(result)
+        if error:
+            entry["error"] = error
+        results.append(entry)
+    return {"job_id": job_id, "offset": offset, "limit": limit, "results": results}
+
+def _claim_next_job() -> Optional[tuple]:
+    now = time.time()
+    try:
+        # The IMMEDIATE transaction serialises claims across worker processes sharing the database
+        with transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued' WHERE status = 'running' AND updated_at < ?",
+                (now - JOB_STALE_SECONDS,)
+            )
+            row = conn.execute(
+                "SELECT id, jd_id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row:
+                conn.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?", (now, row[0]))
+        return row
+    except sqlite3.Error as e:
+        logger.error(f"Failed to claim job: {str(e)}")
+        return None
+
+def _update_counts(conn: sqlite3.Connection, job_id: str):
+    conn.execute('''
+        UPDATE jobs SET
+            completed = (SELECT COUNT(*) FROM job_items WHERE job_id = ? AND status != 'pending'),
+            failed = (SELECT COUNT(*) FROM job_items WHERE job_id = ? AND status = 'failed'),
+            updated_at = ?
+        WHERE id = ?
+    ''', (job_id, job_id, time.time(), job_id))
+
+def _record_item(job_id: str, idx: int, status: str, result: Optional[dict], error: Optional[str]):
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE job_items SET status = ?, result = ?, error = ? WHERE job_id = ? AND idx = ?",
+            (status, json.dumps(result) if result else None, error, job_id, idx)
+        )
+        _update_counts(conn, job_id)
+
+def _fail_pending(job_id: str, error: str):
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE job_items SET status = 'failed', error = ? WHERE job_id = ? AND status = 'pending'", (error, job_id)
+        )
+        _update_counts(conn, job_id)
+
+def _finish_job(job_id: str, status: str, error: Optional[str] = None):
+    get_db_connection().execute(
+        "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?", (status, error, time.time(), job_id)
+    )
+
+def _pending_items(job_id: str) -> list:
+    return get_db_connection().execute(
+        "SELECT idx, filename, content_type, spool_path FROM job_items WHERE job_id = ? AND status = 'pending' ORDER BY idx",
+        (job_id,)
+    ).fetchall()
+
+def _touch_job(job_id: str):
+    get_db_connection().execute(
+        "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = 'running'", (time.time(), job_id)
+    )
+
+async def _heartbeat(job_id: str):
+    # Keeps a job that is stuck on one slow batch from looking orphaned and being run a second time
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        try:
+            await asyncio.to_thread(_touch_job, job_id)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to refresh heartbeat of job {job_id}: {str(e)}")
+
+async def run_job(job_id: str, jd_id: int):
+    heartbeat = asyncio.create_task(_heartbeat(job_id))
+    try:
+        await _run_job(job_id, jd_id)
+    finally:
+        heartbeat.cancel()
+
+async def _run_job(job_id: str, jd_id: int):
+    pending = await asyncio.to_thread(_pending_items, job_id)
+    logger.info(f"Running job {job_id}: {len(pending)} CVs left to process")
+
+    cap_error = None
+    try:
+        jd_data, jd_embeddings = await load_jd_for_matching(jd_id)
+        # Spooled files are read as the pipeline reaches them, so a large job holds only its in-flight window in memory
+        entries = read_entries(
+            (filename, content_type, None, lambda path=path: open(path, "rb")) for _, filename, content_type, path in pending
+        )
+        async for event in ingest_cvs(jd_id, entries, jd_data, jd_embeddings):
+            if event["type"] == "error" and event["index"] is None:
+                raise RuntimeError(event["detail"])
+            if event["type"] == "error" and (event["file"] is None or event["index"] >= len(pending)):
+                # A whole-upload cap: this entry and the ones after it were skipped, the earlier ones still finish
+                cap_error = event["detail"]
+                continue
+            if event["type"] == "candidate":
+                idx = pending[event["index"]][0]
+                candidate = dict(event["candidate"], id=idx + 1)
+                await asyncio.to_thread(_record_item, job_id, idx, "done", candidate, None)
+            elif event["type"] == "error":
+                idx = pending[event["index"]][0]
+                await asyncio.to_thread(_record_item, job_id, idx, "failed", None, event["detail"])
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {str(e)}", exc_info=True)
+        await asyncio.to_thread(_finish_job, job_id, "failed", str(getattr(e, "detail", e)))
+    else:
+        if cap_error:
+            await asyncio.to_thread(_fail_pending, job_id, cap_error)
+        await asyncio.to_thread(_finish_job, job_id, "completed", cap_error)
+        logger.info(f"Job {job_id} completed")
+    # Failed jobs are never run again, so their uploads go too; a job cancelled at shutdown keeps them to resume
+    await asyncio.to_thread(shutil.rmtree, os.path.join(JOB_SPOOL_DIR, job_id), ignore_errors=True)
+
+async def _worker(n: int):
+    while True:
+        claimed = await asyncio.to_thread(_claim_next_job)
+        if claimed is None:
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        job_id, jd_id = claimed
+        # Log lines of a background job carry its id in place of a request trace id
+        trace_id.set(f"job-{job_id}")
+        logger.info(f"Worker {n} picked up job {job_id}")
+        await run_job(job_id, jd_id)
+
+def start_workers():
+    if JOB_REQUEUE_ON_START:
+        # Jobs left running by a previous process are picked up again, skipping CVs already finished
+        get_db_connection().execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+    for n in range(JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker(n)))
+    logger.info(f"Started {JOB_WORKERS} job workers")
+
+async def stop_workers():
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+init_job_tables()
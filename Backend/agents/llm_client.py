@@ -0,0 +1,262 @@
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from email.utils import parsedate_to_datetime
+from typing import Optional
+import httpx
+from .metrics import inc, observe, timed
+
+logger = logging.getLogger(__name__)
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "your_default_api_key_here")
+# Overridable so benchmarks and local testing can point at a stand-in server
+GEMINI_API_URL = os.getenv(
+    "GEMINI_API_URL",
+    f"https://generativelanguage.googleapis.com/v1/models/gemini-1.5-flash:generateContent?key={GEMINI_API_KEY}"
+)
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "8"))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "60"))
+GEMINI_CONNECT_TIMEOUT = float(os.getenv("GEMINI_CONNECT_TIMEOUT", "10"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "4"))
+GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "1"))
+GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "30"))
+# Client-side quota; 0 disables the limit. Set these to the project's requests and tokens per minute
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "1000"))
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", "0"))
+GEMINI_BURST = float(os.getenv("GEMINI_BURST", "10"))
+# The token quota may be spent this many seconds ahead, so one large batch prompt fits
+GEMINI_TOKEN_BURST_SECONDS = 10
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class LLMError(Exception):
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class TokenBucket:
+    """Thread-safe token bucket that hands out reservations: a caller takes its tokens now and sleeps off the debt.
+
+    Shared by the sync and async paths, and waiters are served in arrival order.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: float):
+        self.rate = rate_per_minute / 60
+        self.capacity = max(burst, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, cost: float = 1.0) -> float:
+        """Take cost tokens and return how many seconds to wait before using them."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            # A single request larger than the bucket would otherwise never fit
+            self._tokens -= min(cost, self.capacity)
+            return max(0.0, -self._tokens / self.rate)
+
+    def drain(self):
+        # After a 429 the server's view of our quota is exhausted; stop the burst allowance for everyone
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0)
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text
+    return len(text) // 4 + 1
+
+class LLMClient:
+    """Pooled client for a generateContent-style endpoint with retries, rate limiting and request coalescing.
+
+    Identical prompts in flight at the same time share one HTTP call. Returns the decoded JSON response body.
+    """
+
+    def __init__(self, url: str = GEMINI_API_URL, concurrency: int = GEMINI_CONCURRENCY, timeout: float = GEMINI_TIMEOUT,
+                 max_retries: int = GEMINI_MAX_RETRIES, rpm: float = GEMINI_RPM, tpm: float = GEMINI_TPM,
+                 burst: float = GEMINI_BURST):
+        self.url = url
+        self.concurrency = concurrency
+        self.timeout = httpx.Timeout(timeout, connect=min(GEMINI_CONNECT_TIMEOUT, timeout))
+        self.max_retries = max_retries
+        self.requests_bucket = TokenBucket(rpm, burst)
+        self.tokens_bucket = TokenBucket(tpm, tpm / 60 * GEMINI_TOKEN_BURST_SECONDS)
+        self._async_client = None
+        self._sync_client = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._sync_semaphore = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._inflight_sync = {}
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(timeout=self.timeout, limits=self._limits())
+        return self._async_client
+
+    def _get_sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._sync_client is None or self._sync_client.is_closed:
+                self._sync_client = httpx.Client(timeout=self.timeout, limits=self._limits())
+            return self._sync_client
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        with self._lock:
+            if self._sync_client is not None:
+                self._sync_client.close()
+                self._sync_client = None
+
+    def _reserve(self, prompt: str) -> float:
+        delay = max(self.requests_bucket.reserve(), self.tokens_bucket.reserve(estimate_tokens(prompt)))
+        if delay > 0:
+            observe("stage_seconds", delay, stage="gemini_throttle")
+        return delay
+
+    def _payload(self, prompt: str) -> dict:
+        return {"contents": [{"parts": [{"text": prompt}]}]}
+
+    @staticmethod
+    def _body(response: httpx.Response) -> dict:
+        try:
+            return response.json()
+        except ValueError as e:
+            raise LLMError(f"Response body is not JSON: {str(e)}", response.status_code)
+
+    def _outcome(self, response: Optional[httpx.Response], error: Optional[Exception], kind: str, attempt: int):
+        """(retry delay or None, final error or None) for one attempt; records the attempt's outcome."""
+        if error is not None:
+            reason = "timeout" if isinstance(error, httpx.TimeoutException) else "transport_error"
+            retry_after = None
+            message = type(error).__name__ + (f": {error}" if str(error) else "")
+            status = None
+        else:
+            status = response.status_code
+            if status < 400:
+                inc("gemini_requests_total", kind=kind, outcome="ok")
+                return None, None
+            reason = str(status)
+            retry_after = _retry_after(response)
+            message = f"HTTP {status}: {response.text[:200]}"
+            if status == 429:
+                self.requests_bucket.drain()
+        inc("gemini_requests_total", kind=kind, outcome=reason)
+        if (status is not None and status not in RETRY_STATUSES) or attempt >= self.max_retries:
+            return None, LLMError(message, status)
+        # Full jitter spreads retries from a burst; the server's Retry-After is a floor
+        delay = random.uniform(0, min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * 2 ** attempt))
+        delay = max(delay, retry_after or 0.0)
+        logger.warning(f"Gemini request for {kind} failed ({message}), retry {attempt + 1} in {delay:.1f}s")
+        inc("gemini_retries_total", reason=reason)
+        return delay, None
+
+    async def _request_async(self, prompt: str, kind: str, items: int) -> dict:
+        for attempt in range(self.max_retries + 1):
+            async with self._semaphore:
+                await asyncio.sleep(self._reserve(prompt))
+                logger.info(f"Sending request to Gemini API for {kind}" + (f" ({items} CVs)" if items > 1 else ""))
+                response, error = None, None
+                try:
+                    with timed("gemini"):
+                        response = await self._get_async_client().post(self.url, json=self._payload(prompt))
+                except httpx.TransportError as e:
+                    error = e
+            delay, failure = self._outcome(response, error, kind, attempt)
+            if failure is not None:
+                raise failure
+            if delay is None:
+                inc("stage_items_total", items, stage="gemini")
+                return self._body(response)
+            await asyncio.sleep(delay)
+
+    def _request(self, prompt: str, kind: str, items: int) -> dict:
+        for attempt in range(self.max_retries + 1):
+            with self._sync_semaphore:
+                time.sleep(self._reserve(prompt))
+                logger.info(f"Sending request to Gemini API for {kind}")
+                response, error = None, None
+                try:
+                    with timed("gemini"):
+                        response = self._get_sync_client().post(self.url, json=self._payload(prompt))
+                except httpx.TransportError as e:
+                    error = e
+            delay, failure = self._outcome(response, error, kind, attempt)
+            if failure is not None:
+                raise failure
+            if delay is None:
+                inc("stage_items_total", items, stage="gemini")
+                return self._body(response)
+            time.sleep(delay)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark a failure as retrieved even if every caller was cancelled before it arrived
+        if not task.cancelled():
+            task.exception()
+
+    async def generate_async(self, prompt: str, kind: str, items: int = 1) -> dict:
+        key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        task = self._inflight.get(key)
+        if task is None:
+            # The call runs as its own task so a cancelled caller does not cancel it for the others sharing it
+            task = asyncio.ensure_future(self._request_async(prompt, kind, items))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            inc("gemini_coalesced_total", kind=kind)
+        return await asyncio.shield(task)
+
+    def generate(self, prompt: str, kind: str, items: int = 1) -> dict:
+        key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        with self._lock:
+            future = self._inflight_sync.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight_sync[key] = Future()
+        if not owner:
+            inc("gemini_coalesced_total", kind=kind)
+            return future.result()
+        try:
+            body = self._request(prompt, kind, items)
+            future.set_result(body)
+            return body
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight_sync.pop(key, None)
+
+gemini_client = LLMClient()
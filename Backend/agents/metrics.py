@@ -0,0 +1,118 @@
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+
+METRICS_PREFIX = os.getenv("METRICS_PREFIX", "smartrecruit")
+# Upper bounds in seconds; spans sub-millisecond cache lookups up to slow Gemini batches
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HELP = {
+    "stage_seconds": ("histogram", "Time spent in each pipeline stage"),
+    "stage_errors_total": ("counter", "Pipeline stage calls that raised"),
+    "stage_items_total": ("counter", "Documents, texts or rows handled by each pipeline stage"),
+    "cache_lookups_total": ("counter", "Cache lookups by cache and result"),
+    "gemini_requests_total": ("counter", "Gemini API requests by kind and outcome"),
+    "gemini_retries_total": ("counter", "Gemini requests retried, by reason"),
+    "gemini_coalesced_total": ("counter", "Gemini requests answered by an identical request already in flight"),
+    "cv_preparse_total": ("counter", "CVs by pre-parser outcome: Gemini skipped, asked for some fields, or a full parse"),
+    "identity_lookups_total": ("counter", "Uploaded CVs found on file before parsing: exact text, near-duplicate, or none"),
+    "http_requests_total": ("counter", "HTTP requests by route and status"),
+    "http_request_seconds": ("histogram", "HTTP request latency by route")
+}
+
+trace_id = contextvars.ContextVar("trace_id", default="-")
+TRACE_ID_RE = re.compile(r"^[\w.-]{1,64}$")
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def inc(name: str, value: float = 1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name: str, seconds: float, **labels):
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0]
+        histogram[0][bisect_left(BUCKETS, seconds)] += 1
+        histogram[1] += seconds
+
+@contextmanager
+def timed(stage: str, items: int = None):
+    """Record the duration of a pipeline stage, and count it as an error if the block raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        inc("stage_errors_total", stage=stage)
+        raise
+    finally:
+        observe("stage_seconds", time.perf_counter() - started, stage=stage)
+    if items:
+        inc("stage_items_total", items, stage=stage)
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, (list(counts), total)) for key, (counts, total) in _histograms.items())
+
+    lines = []
+    described = set()
+
+    def describe(name):
+        if name not in described:
+            described.add(name)
+            kind, text = HELP.get(name, ("untyped", name))
+            lines.append(f"# HELP {METRICS_PREFIX}_{name} {text}")
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name} {kind}")
+
+    for (name, labels), value in counters:
+        describe(name)
+        lines.append(f"{METRICS_PREFIX}_{name}{_labels(labels)} {float(value)!r}")
+    for (name, labels), (counts, total) in histograms:
+        describe(name)
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (None,), counts):
+            cumulative += count
+            le = "+Inf" if bound is None else repr(bound)
+            lines.append(f"{METRICS_PREFIX}_{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+        lines.append(f"{METRICS_PREFIX}_{name}_sum{_labels(labels)} {total!r}")
+        lines.append(f"{METRICS_PREFIX}_{name}_count{_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+def new_trace_id(incoming: str = None) -> str:
+    # Caller-supplied ids are echoed into logs, so only short, plain ones are accepted
+    if incoming and TRACE_ID_RE.match(incoming):
+        return incoming
+    return uuid.uuid4().hex[:16]
+
+class TraceIdFilter(logging.Filter):
+    """Stamp every log record with the trace id of the request or job that produced it."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id.get()
+        return True
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+from .metrics import inc
+
+logger = logging.getLogger(__name__)
+
+PARSE_CACHE_FILE = os.getenv("PARSE_CACHE_FILE", "parse_cache.db")
+PARSE_CACHE_MAX_ENTRIES = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", "5000"))
+
+class ParseCache:
+    """SQLite-backed LRU cache of LLM parse results, keyed by a hash of the input text and prompt version."""
+
+    def __init__(self, path: str = PARSE_CACHE_FILE, max_entries: int = PARSE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS parse_cache (
+                key TEXT PRIMARY KEY,
+                kind TEXT,
+                prompt_version TEXT,
+                data TEXT,
+                created_at REAL,
+                last_access REAL,
+                hit_count INTEGER DEFAULT 0
+            )
+        ''')
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_parse_cache_last_access ON parse_cache (last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(kind: str, prompt_version: str, text: str) -> str:
+        return hashlib.sha256(f"{kind}\0{prompt_version}\0{text}".encode("utf-8")).hexdigest()
+
+    def get(self, kind: str, prompt_version: str, text: str) -> Optional[dict]:
+        key = self.make_key(kind, prompt_version, text)
+        with self._lock:
+            try:
+                row = self._conn.execute("SELECT data FROM parse_cache WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    inc("cache_lookups_total", cache="parse", result="miss")
+                    return None
+                self._conn.execute(
+                    "UPDATE parse_cache SET last_access = ?, hit_count = hit_count + 1 WHERE key = ?",
+                    (time.time(), key)
+                )
+                self._conn.commit()
+                self.hits += 1
+                inc("cache_lookups_total", cache="parse", result="hit")
+                return json.loads(row[0])
+            except (sqlite3.Error, json.JSONDecodeError) as e:
+                logger.error(f"Parse cache lookup failed: {str(e)}")
+                self.misses += 1
+                return None
+
+    def put(self, kind: str, prompt_version: str, text: str, data: dict):
+        key = self.make_key(kind, prompt_version, text)
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute('''
+                    INSERT OR REPLACE INTO parse_cache (key, kind, prompt_version, data, created_at, last_access)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (key, kind, prompt_version, json.dumps(data), now, now))
+                self._evict()
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Parse cache write failed: {str(e)}")
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM parse_cache").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute('''
+                DELETE FROM parse_cache WHERE key IN (
+                    SELECT key FROM parse_cache ORDER BY last_access ASC LIMIT ?
+                )
+            ''', (overflow,))
+            logger.debug(f"Evicted {overflow} entries from parse cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM parse_cache").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "entries": count,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+parse_cache = ParseCache()
@@ -0,0 +1,264 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+import numpy as np
+from .embeddings import embedding_key, encode, expected_embedding_key
+from .metrics import inc
+
+logger = logging.getLogger(__name__)
+
+PHRASE_CACHE_ENABLED = os.getenv("PHRASE_CACHE_ENABLED", "1") == "1"
+PHRASE_CACHE_DIR = os.getenv("PHRASE_CACHE_DIR", "phrase_cache")
+PHRASE_CACHE_MEMORY_ENTRIES = int(os.getenv("PHRASE_CACHE_MEMORY_ENTRIES", "50000"))
+PHRASE_CACHE_MAX_ROWS = int(os.getenv("PHRASE_CACHE_MAX_ROWS", "1000000"))
+# Skills, industries and fields of study repeat across documents; longer texts like work history rarely do
+PHRASE_MAX_CHARS = int(os.getenv("PHRASE_MAX_CHARS", "64"))
+INITIAL_CAPACITY = 4096
+
+def normalize_phrase(text: str) -> str:
+    return " ".join(text.lower().split())
+
+class PhraseCache:
+    """Two-tier cache of phrase embeddings: an in-memory LRU in front of a memory-mapped float32 matrix on disk.
+
+    The on-disk tier is one matrix file per model and backend plus a SQLite index mapping each phrase to its row.
+    Without a model_name the cache follows the embedding engine's key, so vectors from different backends are never
+    mixed. Hits are served under the configured backend's key without loading the model.
+    """
+
+    def __init__(self, directory: str = PHRASE_CACHE_DIR, model_name: str = None,
+                 memory_entries: int = PHRASE_CACHE_MEMORY_ENTRIES, max_rows: int = PHRASE_CACHE_MAX_ROWS):
+        self.directory = directory
+        self.model_name = model_name
+        self.memory_entries = memory_entries
+        self.max_rows = max_rows
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._conn = None
+        self._matrix = None
+        self._capacity = 0
+        self._dim = None
+        self._key = None
+        self._matrix_path = None
+
+    def _use(self, key: str):
+        """Point the cache at the vectors stored under key, dropping what was held for another one."""
+        if key == self._key:
+            return
+        self._key = key
+        self._memory.clear()
+        self._matrix = None
+        self._capacity = 0
+        self._dim = None
+        self._matrix_path = os.path.join(self.directory, re.sub(r"[^\w.-]", "_", key) + ".f32")
+        if self._conn is not None:
+            self._load_dim()
+
+    def _load_dim(self):
+        row = self._conn.execute("SELECT dim FROM phrase_matrix WHERE model_name = ?", (self._key,)).fetchone()
+        if row:
+            self._dim = row[0]
+
+    def _open(self):
+        # Opened on first use so importing the app does not touch the disk
+        if self._conn is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(self.directory, "index.db"), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS phrase_index (
+                model_name TEXT,
+                phrase TEXT,
+                row INTEGER,
+                PRIMARY KEY (model_name, phrase)
+            )
+        ''')
+        self._conn.execute("CREATE TABLE IF NOT EXISTS phrase_matrix (model_name TEXT PRIMARY KEY, dim INTEGER)")
+        self._load_dim()
+
+    def _map(self, min_rows: int = 0):
+        """(Re)map the matrix file, growing it to hold at least min_rows rows."""
+        row_bytes = self._dim * 4
+        size = os.path.getsize(self._matrix_path) if os.path.exists(self._matrix_path) else 0
+        capacity = size // row_bytes
+        if capacity < min_rows:
+            capacity = max(min_rows, 2 * capacity, INITIAL_CAPACITY)
+            with open(self._matrix_path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        if self._matrix is None or capacity != self._capacity:
+            self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self._dim))
+            self._capacity = capacity
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def lookup(self, keys: List[str], model_key: str = None) -> Dict[str, np.ndarray]:
+        model_key = model_key or self.model_name or expected_embedding_key()
+        found = {}
+        with self._lock:
+            self._use(model_key)
+            remaining = []
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is None:
+                    remaining.append(key)
+                else:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            self.memory_hits += len(found)
+            if remaining:
+                try:
+                    found.update(self._lookup_disk(remaining))
+                except (sqlite3.Error, OSError, ValueError) as e:
+                    logger.error(f"Phrase cache lookup failed: {str(e)}")
+            self.misses += len(keys) - len(found)
+        memory_hits = len(keys) - len(remaining)
+        inc("cache_lookups_total", memory_hits, cache="phrase", result="memory_hit")
+        inc("cache_lookups_total", len(found) - memory_hits, cache="phrase", result="disk_hit")
+        inc("cache_lookups_total", len(keys) - len(found), cache="phrase", result="miss")
+        return found
+
+    def _lookup_disk(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        self._open()
+        if self._dim is None:
+            return {}
+        rows = []
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows += self._conn.execute(
+                f"SELECT phrase, row FROM phrase_index WHERE model_name = ? AND phrase IN ({','.join('?' * len(chunk))})",
+                [self._key] + chunk
+            ).fetchall()
+        if not rows:
+            return {}
+        last_row = max(row for _, row in rows)
+        if self._matrix is None or last_row >= self._capacity:
+            # Another process may have grown the file since it was mapped
+            self._map(last_row + 1)
+        found = {}
+        for phrase, row in rows:
+            vector = np.array(self._matrix[row])
+            self._remember(phrase, vector)
+            found[phrase] = vector
+        self.disk_hits += len(found)
+        return found
+
+    def store(self, vectors: Dict[str, np.ndarray], model_key: str = None):
+        if not vectors:
+            return
+        model_key = model_key or self.model_name or embedding_key()
+        with self._lock:
+            self._use(model_key)
+            for key, vector in vectors.items():
+                self._remember(key, vector)
+            try:
+                self._store_disk(vectors)
+            except (sqlite3.Error, OSError, ValueError) as e:
+                logger.error(f"Phrase cache write failed: {str(e)}")
+
+    def _store_disk(self, vectors: Dict[str, np.ndarray]):
+        self._open()
+        dim = len(next(iter(vectors.values())))
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._dim is None:
+                self._conn.execute("INSERT OR IGNORE INTO phrase_matrix (model_name, dim) VALUES (?, ?)", (self._key, dim))
+                self._dim = self._conn.execute(
+                    "SELECT dim FROM phrase_matrix WHERE model_name = ?", (self._key,)
+                ).fetchone()[0]
+            if dim != self._dim:
+                raise ValueError(f"embedding dimension {dim} does not match cached dimension {self._dim}")
+            (next_row,) = self._conn.execute(
+                "SELECT COALESCE(MAX(row) + 1, 0) FROM phrase_index WHERE model_name = ?", (self._key,)
+            ).fetchone()
+            keys = list(vectors)
+            existing = set()
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                existing.update(phrase for (phrase,) in self._conn.execute(
+                    f"SELECT phrase FROM phrase_index WHERE model_name = ? AND phrase IN ({','.join('?' * len(chunk))})",
+                    [self._key] + chunk
+                ))
+            new = [key for key in keys if key not in existing][:max(0, self.max_rows - next_row)]
+            if new:
+                self._map(next_row + len(new))
+                self._matrix[next_row:next_row + len(new)] = np.stack([vectors[key] for key in new])
+                # Vectors reach the file before the index rows pointing at them are committed
+                self._matrix.flush()
+                self._conn.executemany(
+                    "INSERT INTO phrase_index (model_name, phrase, row) VALUES (?, ?, ?)",
+                    [(self._key, key, next_row + i) for i, key in enumerate(new)]
+                )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Drop-in for embeddings.encode: short phrases come from the cache, everything else in one model call."""
+        if not PHRASE_CACHE_ENABLED:
+            return encode(texts)
+        model_key = self.model_name or expected_embedding_key()
+        positions = {}
+        long_texts = []
+        for i, text in enumerate(texts):
+            if len(text) <= PHRASE_MAX_CHARS:
+                positions.setdefault(normalize_phrase(text), []).append(i)
+            else:
+                long_texts.append(i)
+
+        found = self.lookup(list(positions), model_key)
+        missing = [key for key in positions if key not in found]
+        out = [None] * len(texts)
+        to_encode = missing + [texts[i] for i in long_texts]
+        if to_encode:
+            embs = encode(to_encode)
+            if (self.model_name or embedding_key()) != model_key:
+                # The engine loaded as another backend, e.g. torch after a failed accuracy check: the hits don't match
+                logger.warning(f"Phrase cache keyed {model_key} but the engine is {embedding_key()}, looking up again")
+                return self.encode(texts)
+            new = dict(zip(missing, embs[:len(missing)]))
+            self.store(new, model_key)
+            found.update(new)
+            for i, vector in zip(long_texts, embs[len(missing):]):
+                out[i] = vector
+        for key, indices in positions.items():
+            for i in indices:
+                out[i] = found[key]
+        return np.stack(out).astype(np.float32, copy=False) if out else np.empty((0, 0), dtype=np.float32)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._use(self._key or self.model_name or expected_embedding_key())
+            persistent = 0
+            if os.path.isdir(self.directory):
+                self._open()
+                (persistent,) = self._conn.execute(
+                    "SELECT COUNT(*) FROM phrase_index WHERE model_name = ?", (self._key,)
+                ).fetchone()
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "model_name": self._key,
+                "memory_entries": len(self._memory),
+                "max_memory_entries": self.memory_entries,
+                "persistent_entries": persistent,
+                "max_persistent_entries": self.max_rows,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+            }
+
+phrase_cache = PhraseCache()
@@ -0,0 +1,110 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional
+from .metrics import inc
+
+logger = logging.getLogger(__name__)
+
+TEXT_CACHE_FILE = os.getenv("TEXT_CACHE_FILE", "text_cache.db")
+# Limit on the compressed size of all cached texts
+TEXT_CACHE_MAX_BYTES = int(os.getenv("TEXT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+def content_digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+class TextCache:
+    """SQLite-backed LRU cache of extracted document text, keyed by the SHA-256 of the uploaded bytes."""
+
+    def __init__(self, path: str = TEXT_CACHE_FILE, max_bytes: int = TEXT_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS text_cache (
+                digest TEXT,
+                content_type TEXT,
+                data BLOB,
+                size INTEGER,
+                created_at REAL,
+                last_access REAL,
+                hit_count INTEGER DEFAULT 0,
+                PRIMARY KEY (digest, content_type)
+            )
+        ''')
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_text_cache_last_access ON text_cache (last_access)")
+        self._conn.commit()
+
+    def get(self, digest: str, content_type: str) -> Optional[str]:
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT data FROM text_cache WHERE digest = ? AND content_type = ?", (digest, content_type)
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    inc("cache_lookups_total", cache="text", result="miss")
+                    return None
+                self._conn.execute(
+                    "UPDATE text_cache SET last_access = ?, hit_count = hit_count + 1 WHERE digest = ? AND content_type = ?",
+                    (time.time(), digest, content_type)
+                )
+                self._conn.commit()
+                self.hits += 1
+                inc("cache_lookups_total", cache="text", result="hit")
+                return zlib.decompress(row[0]).decode("utf-8")
+            except (sqlite3.Error, zlib.error) as e:
+                logger.error(f"Text cache lookup failed: {str(e)}")
+                self.misses += 1
+                return None
+
+    def put(self, digest: str, content_type: str, text: str):
+        data = zlib.compress(text.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute('''
+                    INSERT OR REPLACE INTO text_cache (digest, content_type, data, size, created_at, last_access)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (digest, content_type, data, len(data), now, now))
+                self._evict()
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Text cache write failed: {str(e)}")
+
+    def _evict(self):
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM text_cache").fetchone()
+        if total <= self.max_bytes:
+            return
+        # Keep the most recently used entries that fit in the budget
+        deleted = self._conn.execute('''
+            DELETE FROM text_cache WHERE rowid IN (
+                SELECT rowid FROM (
+                    SELECT rowid, SUM(size) OVER (ORDER BY last_access DESC, rowid DESC) AS running
+                    FROM text_cache
+                ) WHERE running > ?
+            )
+        ''', (self.max_bytes,)).rowcount
+        logger.debug(f"Evicted {deleted} entries from text cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM text_cache").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "entries": count,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+text_cache = TextCache()
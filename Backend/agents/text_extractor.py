@@ -0,0 +1,142 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+from .text_cache import text_cache, content_digest
+from .metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# pdfminer is pure Python and CPU-bound, so documents are extracted in worker processes; 0 runs them in threads
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+# Caps for pathological uploads: extraction stops after this many pages or characters
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "50"))
+MAX_TEXT_CHARS = int(os.getenv("MAX_TEXT_CHARS", "200000"))
+
+SUPPORTED_TYPES = [
+    "text/plain",
+    "application/pdf",
+    "application/msword",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+]
+WORD_TYPES = SUPPORTED_TYPES[2:]
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _extract_pdf(content: bytes) -> str:
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextBox
+    pages, size = [], 0
+    # Same layout as pdfminer's extract_text, one page at a time so the caps apply before the rest is parsed
+    for page in extract_pages(io.BytesIO(content), maxpages=MAX_PDF_PAGES):
+        text = "".join(element.get_text() + "\n" for element in page if isinstance(element, LTTextBox)) + "\f"
+        pages.append(text)
+        size += len(text)
+        if size >= MAX_TEXT_CHARS:
+            break
+    return "".join(pages)
+
+def _extract_docx(content: bytes) -> str:
+    import docx
+    doc = docx.Document(io.BytesIO(content))
+    paragraphs, size = [], 0
+    for para in doc.paragraphs:
+        paragraphs.append(para.text)
+        size += len(para.text) + 1
+        if size >= MAX_TEXT_CHARS:
+            break
+    return "\n".join(paragraphs)
+
+def extract_document_text(content: bytes, content_type: str) -> str:
+    """Extract plain text from an uploaded document. Runs inside the worker processes."""
+    if content_type == "text/plain":
+        text = content.decode('utf-8')
+    elif content_type == "application/pdf":
+        text = _extract_pdf(content)
+    elif content_type in WORD_TYPES:
+        text = _extract_docx(content)
+    else:
+        raise ValueError(f"Unsupported file type: {content_type}")
+    return text[:MAX_TEXT_CHARS].strip()
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn keeps workers from inheriting the server's threads, sockets and loaded models
+            _executor = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            logger.info(f"Started text extraction pool with {EXTRACT_WORKERS} workers")
+        return _executor
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+def _reset_executor(broken: ProcessPoolExecutor):
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+async def _extract_uncached(content: bytes, content_type: str) -> str:
+    with timed("extract", 1):
+        # Plain text is cheap to decode, so it skips the round trip to a worker
+        if content_type == "text/plain" or EXTRACT_WORKERS <= 0:
+            return await asyncio.to_thread(extract_document_text, content, content_type)
+        executor = get_executor()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, extract_document_text, content, content_type)
+        except BrokenProcessPool:
+            # A worker died (e.g. a crafted PDF exhausting memory); start a fresh pool for the next upload
+            logger.error("Text extraction worker crashed, restarting the pool")
+            _reset_executor(executor)
+            raise ValueError("Failed to extract text from file")
+
+async def extract_text_async(content: bytes, content_type: str, digest: Optional[str] = None) -> str:
+    digest = digest or content_digest(content)
+    # The cache is SQLite, so lookups and writes run in a thread rather than on the event loop
+    cached = await asyncio.to_thread(text_cache.get, digest, content_type)
+    if cached is not None:
+        logger.debug(f"Text cache hit for {digest[:12]}")
+        return cached
+    text = await _extract_uncached(content, content_type)
+    await asyncio.to_thread(text_cache.put, digest, content_type, text)
+    return text
+
+async def extract_upload_text(content_type: str, content: bytes, digest: Optional[str] = None) -> str:
+    if content_type not in SUPPORTED_TYPES:
+        raise ValueError(f"Unsupported file type: {content_type}")
+    text = await extract_text_async(content, content_type, digest)
+    if not text:
+        raise ValueError("File content is empty")
+    return text
+
+async def extract_upload_texts(uploads: List[tuple]) -> List[tuple]:
+    """(text, error) for each (content_type, content) upload; identical files in the batch are extracted once."""
+    keys = [(content_digest(content), content_type) for content_type, content in uploads]
+    unique = {}
+    for key, (content_type, content) in zip(keys, uploads):
+        unique.setdefault(key, content)
+
+    async def extract(key, content):
+        digest, content_type = key
+        try:
+            return await extract_upload_text(content_type, content, digest), None
+        except Exception as e:
+            return None, str(e)
+
+    outcomes = await asyncio.gather(*(extract(key, content) for key, content in unique.items()))
+    by_key = dict(zip(unique, outcomes))
+    if len(unique) < len(uploads):
+        logger.info(f"Extracted {len(unique)} distinct files out of {len(uploads)} uploads")
+    return [by_key[key] for key in keys]
@@ -0,0 +1,192 @@
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Above this many candidates the index is partitioned IVF-style and only the closest lists are scanned
+IVF_MIN_SIZE = int(os.getenv("IVF_MIN_SIZE", "20000"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+IVF_TRAIN_ITERATIONS = 10
+IVF_TRAIN_SAMPLE = 50000
+
+# How each embedded section contributes to a candidate's (or JD's) profile vector
+PROFILE_WEIGHTS = {'skills': 0.5, 'experience_text': 0.3, 'projects': 0.2}
+
+def profile_vector(embeddings: Dict) -> Optional[np.ndarray]:
+    """Collapse per-section embeddings into one unit vector used for retrieval."""
+    profile = None
+    for section, weight in PROFILE_WEIGHTS.items():
+        texts, embs = embeddings.get(section, ([], None))
+        if not texts:
+            continue
+        centroid = embs.mean(axis=0)
+        norm = np.linalg.norm(centroid)
+        if norm == 0:
+            continue
+        contribution = weight * centroid / norm
+        profile = contribution if profile is None else profile + contribution
+    if profile is None:
+        return None
+    norm = np.linalg.norm(profile)
+    return (profile / norm).astype(np.float32) if norm else None
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if k >= scores.size:
+        return np.argsort(-scores)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+class CandidateIndex:
+    """In-memory matrix of candidate profile vectors with optional IVF partitioning."""
+
+    def __init__(self, ivf_min_size: int = IVF_MIN_SIZE, nprobe: int = IVF_NPROBE):
+        self.ivf_min_size = ivf_min_size
+        self.nprobe = nprobe
+        self.loaded = False
+        self._building = False
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._ids = np.empty(0, dtype=np.int64)
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        # (cv_id, vector) to add or replace, or (cv_id, None) to remove
+        self._pending: List[Tuple[int, Optional[np.ndarray]]] = []
+        self._centroids = None
+        self._lists: List[np.ndarray] = []
+        self._trained_size = 0
+
+    def build(self, embeddings_by_id: Dict[int, Dict]):
+        ids, vectors = [], []
+        for cv_id, embeddings in embeddings_by_id.items():
+            vector = profile_vector(embeddings)
+            if vector is not None:
+                ids.append(cv_id)
+                vectors.append(vector)
+        with self._lock:
+            self._ids = np.array(ids, dtype=np.int64)
+            self._matrix = np.stack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+            # Adds queued while the embeddings were loading are kept; flushing replaces any row they duplicate
+            self._centroids = None
+            self._train()
+            self.loaded = True
+        logger.info(f"Candidate index built with {len(ids)} candidates")
+
+    def ensure_built(self, load: Callable[[], Dict[int, Dict]]):
+        """Build from load() once; concurrent first callers wait for that build instead of running their own."""
+        if self.loaded:
+            return
+        with self._build_lock:
+            if self.loaded:
+                return
+            # From here adds are queued, so rows committed after load() reads its snapshot still reach the index
+            with self._lock:
+                self._building = True
+            try:
+                self.build(load())
+            finally:
+                with self._lock:
+                    self._building = False
+
+    def add(self, cv_id: int, embeddings: Dict):
+        """Add a candidate, or replace its vector if it is already indexed; one without a profile vector is removed."""
+        self._queue([(cv_id, profile_vector(embeddings))])
+
+    def remove(self, cv_ids: List[int]):
+        self._queue([(cv_id, None) for cv_id in cv_ids])
+
+    def _queue(self, changes: List[Tuple[int, Optional[np.ndarray]]]):
+        with self._lock:
+            if not (self.loaded or self._building):
+                # Not built yet: the full load from the database will reflect these changes
+                return
+            self._pending.extend(changes)
+
+    def _flush(self):
+        if not self._pending:
+            return
+        # The latest vector of each candidate wins
+        latest = dict(self._pending)
+        self._pending = []
+        added = {cv_id: vector for cv_id, vector in latest.items() if vector is not None}
+        ids = np.fromiter(added, dtype=np.int64, count=len(added))
+        replaced = np.isin(self._ids, np.fromiter(latest, dtype=np.int64, count=len(latest)))
+        if replaced.any():
+            # Row positions shift, so the IVF lists are rebuilt rather than extended
+            self._ids = np.concatenate([self._ids[~replaced], ids])
+            self._matrix = np.vstack([self._matrix[~replaced]] + list(added.values()))
+            self._reassign()
+            return
+        if not added:
+            return
+        vectors = np.stack(list(added.values()))
+        start = self._ids.size
+        self._ids = np.concatenate([self._ids, ids])
+        self._matrix = vectors if self._matrix.size == 0 else np.vstack([self._matrix, vectors])
+        if self._centroids is not None and self._ids.size < 2 * self._trained_size:
+            assign = np.argmax(vectors @ self._centroids.T, axis=1)
+            for c in np.unique(assign):
+                self._lists[c] = np.concatenate([self._lists[c], start + np.flatnonzero(assign == c)])
+        else:
+            self._train()
+
+    def _reassign(self):
+        if self._centroids is None or self._ids.size >= 2 * self._trained_size:
+            self._train()
+            return
+        assign = np.argmax(self._matrix @ self._centroids.T, axis=1)
+        self._lists = [np.flatnonzero(assign == c) for c in range(len(self._centroids))]
+
+    def _train(self):
+        n = self._ids.size
+        if n < self.ivf_min_size:
+            self._centroids = None
+            self._lists = []
+            return
+        # Spherical k-means on a sample; vectors are unit length so dot product is cosine
+        rng = np.random.default_rng(0)
+        nlist = int(np.sqrt(n))
+        sample = self._matrix[rng.choice(n, size=min(n, IVF_TRAIN_SAMPLE), replace=False)]
+        centroids = sample[rng.choice(sample.shape[0], size=nlist, replace=False)]
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assign == c]
+                if members.size:
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+        assign = np.argmax(self._matrix @ centroids.T, axis=1)
+        self._centroids = centroids
+        self._lists = [np.flatnonzero(assign == c) for c in range(nlist)]
+        self._trained_size = n
+        logger.info(f"Trained IVF partitioning with {nlist} lists over {n} candidates")
+
+    def search(self, query: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        with self._lock:
+            self._flush()
+            if self._ids.size == 0 or top_k <= 0:
+                return []
+            rows = None
+            if self._centroids is not None:
+                probes = _top_k(self._centroids @ query, self.nprobe)
+                rows = np.concatenate([self._lists[c] for c in probes])
+                if rows.size < top_k:
+                    rows = None
+            if rows is None:
+                scores = self._matrix @ query
+                top = _top_k(scores, top_k)
+                return [(int(self._ids[i]), float(scores[i])) for i in top]
+            scores = self._matrix[rows] @ query
+            top = _top_k(scores, top_k)
+            return [(int(self._ids[rows[i]]), float(scores[i])) for i in top]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "candidates": int(self._ids.size) + len(self._pending),
+                "ivf_lists": len(self._lists)
+            }
+
+candidate_index = CandidateIndex()
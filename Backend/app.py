@@ -1,17 +1,51 @@
 import os
+import re
+import json
+import hashlib
+import asyncio
 import logging
-from fastapi import FastAPI, File, UploadFile, HTTPException
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
-from pdfminer.high_level import extract_text
-import docx
-from agents.jd_summarizer import summarize_job_description, process_cvs
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, Union
+from agents.jd_summarizer import (
+    summarize_job_description, process_cvs, load_jd_for_matching, stream_cvs, search_candidates,
+    rerank_candidates, bulk_match_candidates, update_job_description
+)
+from agents.llm_client import gemini_client
+from agents.text_extractor import SUPPORTED_TYPES, extract_text_async, shutdown_executor
+from agents.parse_cache import parse_cache
+from agents.text_cache import text_cache
+from agents.phrase_cache import phrase_cache
+from agents.embeddings import warm_up
+from agents.metrics import TraceIdFilter, inc, new_trace_id, observe, render, trace_id
+from agents.ingest import ingest_cvs, receive_upload
+from agents.job_queue import submit_job, get_job, get_job_results, start_workers, stop_workers
+from db.database import CANDIDATE_SORT_COLUMNS, candidate_list_version, list_candidates, load_jd
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:[%(trace_id)s] %(message)s")
+for handler in logging.getLogger().handlers:
+    handler.addFilter(TraceIdFilter())
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+WARMUP_MODELS = os.environ.get("WARMUP_MODELS", "0") == "1"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARMUP_MODELS:
+        # Load the embedding model in the background so the API accepts requests immediately
+        app.state.warmup_task = asyncio.create_task(asyncio.to_thread(warm_up))
+    start_workers()
+    yield
+    await stop_workers()
+    await gemini_client.aclose()
+    shutdown_executor()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -22,40 +56,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # Every log line written while serving the request carries this id; clients can pass their own
+    request_trace_id = new_trace_id(request.headers.get("x-request-id"))
+    trace_id.set(request_trace_id)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        # Route templates rather than raw paths keep the label set bounded
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        inc("http_requests_total", method=request.method, route=route, status=status)
+        observe("http_request_seconds", time.perf_counter() - started, route=route)
+    response.headers["X-Request-ID"] = request_trace_id
+    return response
+
 # Root endpoint to confirm the API is running
 @app.get("/")
 async def root():
     return {"message": "API is running"}
 
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "parse_cache": parse_cache.stats(),
+        "text_cache": text_cache.stats(),
+        "phrase_cache": await asyncio.to_thread(phrase_cache.stats)
+    }
+
+@app.get("/metrics")
+async def metrics():
+    return Response(content=render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/process-jd/")
 async def process_job_description(file: UploadFile):
-    supported_types = [
-        "text/plain",
-        "application/pdf",
-        "application/msword",
-        "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-    ]
-    
-    if file.content_type not in supported_types:
+    if file.content_type not in SUPPORTED_TYPES:
         logger.warning(f"Unsupported file type: {file.content_type}")
         raise HTTPException(status_code=400, detail="Unsupported file format")
 
     try:
         logger.info(f"Processing file: {file.filename} (type: {file.content_type})")
-        if file.content_type == "text/plain":
-            text = await file.read()
-            text = text.decode("utf-8").strip()
-        elif file.content_type == "application/pdf":
-            text = extract_text(file.file).strip()
-        elif file.content_type in [
-            "application/msword",
-            "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-        ]:
-            doc = docx.Document(file.file)
-            text = "\n".join([para.text for para in doc.paragraphs]).strip()
-        else:
-            logger.error(f"Unexpected file type processed: {file.content_type}")
-            raise HTTPException(status_code=400, detail="Unsupported file format")
+        content = await file.read()
+        text = await extract_text_async(content, file.content_type)
     except Exception as e:
         logger.error(f"Text extraction failed for {file.filename}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=400, detail="Failed to extract text from file")
@@ -66,7 +111,7 @@ async def process_job_description(file: UploadFile):
 
     try:
         logger.info(f"Summarizing job description for file: {file.filename}")
-        jd_data, jd_id = summarize_job_description(text)
+        jd_data, jd_id = await asyncio.to_thread(summarize_job_description, text)
         logger.info(f"Successfully processed JD ID: {jd_id}")
         return {"jd_data": jd_data, "jd_id": jd_id}
     except Exception as e:
@@ -87,6 +132,151 @@ async def process_candidate_cvs(jd_id: int, files: List[UploadFile] = File(...))
         logger.error(f"Unexpected error during CV processing: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.post("/process-cvs/{jd_id}/stream")
+async def stream_candidate_cvs(jd_id: int, files: List[UploadFile] = File(...)):
+    logger.info(f"Starting streamed CV processing for JD ID: {jd_id} with {len(files)} files")
+    jd_data, jd_embeddings = await load_jd_for_matching(jd_id)
+    # Uploaded files are closed once this handler returns, so read them before streaming starts
+    uploads = [(file.filename, file.content_type, await file.read()) for file in files]
+
+    async def events():
+        async for event in stream_cvs(jd_id, uploads, jd_data, jd_embeddings):
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/process-cvs/{jd_id}/ingest")
+async def ingest_candidate_cvs(jd_id: int, request: Request):
+    """Stream results for a zip or tar sent as the request body, or for multipart files; archives in them are expanded."""
+    jd_data, jd_embeddings = await load_jd_for_matching(jd_id)
+    # The body is parsed here rather than by FastAPI so the spooled files stay open while the response streams
+    entries, close = await receive_upload(request)
+    logger.info(f"Starting streamed ingestion for JD ID: {jd_id}")
+
+    async def events():
+        try:
+            async for event in ingest_cvs(jd_id, entries, jd_data, jd_embeddings):
+                yield json.dumps(event) + "\n"
+        finally:
+            await close()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/jobs/process-cvs/{jd_id}", status_code=202)
+async def submit_cv_job(jd_id: int, files: List[UploadFile] = File(...)):
+    if not await asyncio.to_thread(load_jd, jd_id):
+        raise HTTPException(status_code=404, detail="JD not found")
+    job_id = await submit_job(jd_id, files)
+    return {"job_id": job_id, "status": "queued", "total": len(files)}
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await asyncio.to_thread(get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/results")
+async def job_results(job_id: str, offset: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=500)):
+    if not await asyncio.to_thread(get_job, job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return await asyncio.to_thread(get_job_results, job_id, offset, limit)
+
+@app.get("/jd/{jd_id}/search-candidates")
+async def search_jd_candidates(jd_id: int, top_k: int = Query(20, ge=1, le=200)):
+    jd_data, jd_embeddings = await load_jd_for_matching(jd_id)
+    candidates = await asyncio.to_thread(search_candidates, jd_data, jd_embeddings, top_k)
+    return {"jd_id": jd_id, "candidates": candidates}
+
+ENTITY_TAG_RE = re.compile(r'(?:W/)?("[^"]*")')
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match per RFC 9110: "*" or a list of entity tags, compared weakly (a W/ prefix is ignored)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in ENTITY_TAG_RE.findall(if_none_match)
+
+@app.get("/jd/{jd_id}/candidates")
+async def list_jd_candidates(
+    jd_id: int,
+    request: Request,
+    sort: str = Query("matchScore"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str = Query(None),
+    min_score: float = Query(None, ge=0, le=100),
+    skill: str = Query(None, max_length=100),
+    min_experience: int = Query(None, ge=0),
+    max_experience: int = Query(None, ge=0)
+):
+    if sort not in CANDIDATE_SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(CANDIDATE_SORT_COLUMNS)}")
+    version = await asyncio.to_thread(candidate_list_version, jd_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="JD not found")
+    # The page is fully determined by the JD's CV rows and the query, so the ETag is known before reading it
+    query = [jd_id, version, sort, order, limit, cursor, min_score, skill, min_experience, max_experience]
+    etag = '"' + hashlib.sha256(json.dumps(query).encode()).hexdigest()[:32] + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    try:
+        page = await asyncio.to_thread(
+            list_candidates, jd_id, sort, order == "desc", limit, cursor, min_score, skill, min_experience, max_experience
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(content=json.dumps(dict(page, jd_id=jd_id)), media_type="application/json", headers=headers)
+
+class JDUpdateRequest(BaseModel):
+    title: Optional[str] = None
+    summary: Optional[str] = None
+    skills: Optional[List[str]] = None
+    responsibilities: Optional[List[str]] = None
+    requirements: Optional[List[str]] = None
+    keywords: Optional[List[str]] = None
+    education: Optional[Union[Dict[str, Union[str, float]], str]] = None
+    experience: Optional[int] = Field(None, ge=0)
+    projects: Optional[List[str]] = None
+    field_of_study: Optional[str] = None
+    industry: Optional[str] = None
+
+@app.patch("/jd/{jd_id}")
+async def update_jd(jd_id: int, body: JDUpdateRequest):
+    updates = body.model_dump(exclude_unset=True)
+    if any(value is None for value in updates.values()):
+        raise HTTPException(status_code=400, detail="JD fields cannot be set to null")
+    return await update_job_description(jd_id, updates)
+
+class RerankRequest(BaseModel):
+    weights: Dict[str, float]
+    limit: int = Field(50, ge=1, le=1000)
+    offset: int = Field(0, ge=0)
+
+@app.post("/jd/{jd_id}/rerank")
+async def rerank_jd_candidates(jd_id: int, body: RerankRequest):
+    if not await asyncio.to_thread(load_jd, jd_id):
+        raise HTTPException(status_code=404, detail="JD not found")
+    try:
+        return await rerank_candidates(jd_id, body.weights, body.limit, body.offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+class BulkMatchRequest(BaseModel):
+    jd_ids: List[int] = Field(..., min_length=1, max_length=100)
+    cv_ids: List[int] = Field(..., min_length=1, max_length=100000)
+    top_k: int = Field(10, ge=1, le=200)
+    weights: Dict[str, float] = None
+
+@app.post("/match/bulk")
+async def bulk_match_jds(body: BulkMatchRequest):
+    try:
+        return await bulk_match_candidates(body.jd_ids, body.cv_ids, body.top_k, body.weights)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 if __name__ == "__main__":
     import uvicorn
     logger.info("Starting FastAPI application...")
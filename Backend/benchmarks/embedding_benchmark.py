@@ -0,0 +1,123 @@
+"""Compare embedding backends: encode throughput per batch size and thread count, drift from PyTorch, and score drift.
+
+Score drift scores synthetic CVs against synthetic JDs with each backend and reports how far the overall match
+scores and the candidate rankings move from the PyTorch baseline.
+
+Run from the Backend directory:
+    python benchmarks/embedding_benchmark.py --backends torch,onnx,onnx-int8 --output embeddings.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARK_DIR)
+# Every backend must compute its own vectors rather than read the baseline's from the phrase cache
+os.environ["PHRASE_CACHE_ENABLED"] = "0"
+sys.path.insert(0, BACKEND_DIR)
+
+def workload(cvs: int, jds: int, seed: int) -> tuple:
+    from synthetic import make_cv, make_jd
+    from fake_gemini import parse_cv, parse_jd
+    rng = random.Random(seed)
+    return [parse_jd(make_jd(rng)) for _ in range(jds)], [parse_cv(make_cv(rng, i)) for i in range(cvs)]
+
+def phrases(jd_list: list, cv_list: list) -> list:
+    from agents.cv_matcher import extract_sections, _section_texts
+    texts = []
+    for item, key in [(jd, "responsibilities") for jd in jd_list] + [(cv, "work_experience") for cv in cv_list]:
+        texts.extend(_section_texts(extract_sections(item, key)))
+    return list(dict.fromkeys(t for t in texts if t))
+
+def overall_scores(jd_list: list, cv_list: list):
+    import numpy as np
+    from agents.cv_matcher import calculate_match_scores
+    return np.array([[s["overall_match"] for s in calculate_match_scores(jd, cv_list)] for jd in jd_list])
+
+def rank_agreement(a, b, top_k: int) -> dict:
+    import numpy as np
+    spearman, overlap = [], []
+    for row_a, row_b in zip(a, b):
+        ranks_a, ranks_b = np.argsort(np.argsort(-row_a)), np.argsort(np.argsort(-row_b))
+        spearman.append(np.corrcoef(ranks_a, ranks_b)[0, 1] if len(row_a) > 1 else 1.0)
+        top_a, top_b = set(np.argsort(-row_a)[:top_k]), set(np.argsort(-row_b)[:top_k])
+        overlap.append(len(top_a & top_b) / max(len(top_a), 1))
+    return {"spearman": float(np.mean(spearman)), f"top{top_k}_overlap": float(np.mean(overlap))}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8", help="comma-separated embedding backends")
+    parser.add_argument("--cvs", type=int, default=200, help="synthetic CVs scored per backend")
+    parser.add_argument("--jds", type=int, default=5, help="synthetic JDs the CVs are scored against")
+    parser.add_argument("--rounds", type=int, default=2, help="timed runs per batch size and thread count")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+    import numpy as np
+    from agents.embeddings import ENCODE_BATCH_SIZE, MODEL_NAME, accuracy_check, autotune, load_engine, set_engine
+
+    jd_list, cv_list = workload(args.cvs, args.jds, args.seed)
+    texts = phrases(jd_list, cv_list)
+    baseline = load_engine("torch")
+    set_engine(baseline)
+    baseline_scores = overall_scores(jd_list, cv_list)
+
+    results = {}
+    for backend in args.backends.split(","):
+        started = time.perf_counter()
+        try:
+            engine = baseline if backend == "torch" else load_engine(backend)
+        except Exception as e:
+            print(f"{backend:<10} unavailable: {type(e).__name__}: {e}")
+            results[backend] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        load_s = time.perf_counter() - started
+        tuned = autotune(engine, texts, rounds=args.rounds)
+        set_engine(engine, tuned["batch_size"])
+        scores = overall_scores(jd_list, cv_list)
+        drift = np.abs(scores - baseline_scores)
+        results[backend] = dict({
+            "load_s": round(load_s, 3),
+            "autotune": tuned,
+            "accuracy": accuracy_check(engine, baseline, texts),
+            "score_drift": dict({"max_abs": float(drift.max()), "mean_abs": float(drift.mean())},
+                                **rank_agreement(scores, baseline_scores, args.top_k))
+        })
+        r = results[backend]
+        print(f"{backend:<10} {tuned['texts_per_s']:>9} texts/s (batch {tuned['batch_size']}, "
+              f"{tuned['threads'] or 'default'} threads)  min cosine {r['accuracy']['min_cosine']:.4f}  "
+              f"score drift max {r['score_drift']['max_abs']:.2f} mean {r['score_drift']['mean_abs']:.3f}  "
+              f"spearman {r['score_drift']['spearman']:.4f}")
+    set_engine(baseline, ENCODE_BATCH_SIZE)
+
+    torch_speed = (results.get("torch") or {}).get("autotune", {}).get("texts_per_s")
+    for backend, r in results.items():
+        if torch_speed and "autotune" in r:
+            r["speedup_vs_torch"] = round(r["autotune"]["texts_per_s"] / torch_speed, 2)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "model": MODEL_NAME,
+            "phrases": len(texts),
+            "cvs": args.cvs,
+            "jds": args.jds
+        },
+        "backends": results
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Local stand-in for the Gemini generateContent API with configurable latency.
+
+It understands the JD prompt, the single-CV prompt and the multi-CV batch prompt, and answers with fields read
+back out of the synthetic documents. It can also fail a fraction of requests with 503 and enforce a requests-per-second
+quota with 429, to exercise the client's retries and rate limiting. Run it standalone and point the backend at it with GEMINI_API_URL:
+    python benchmarks/fake_gemini.py --port 8089 --latency 0.8
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BATCH_CV_RE = re.compile(r"<<<CV (\d+)>>>\n(.*?)\n<<<END CV \1>>>", re.S)
+ROLE_RE = re.compile(r"^(.+) at (.+) \((\d{4})-(\d{4}|Present)\)$", re.M)
+
+def _section(text: str, title: str) -> list:
+    match = re.search(rf"^{title}\n(.*?)(?:\n\n|\Z)", text, re.S | re.M)
+    lines = match.group(1).split("\n") if match else []
+    return [line.lstrip("- ").strip() for line in lines if line.strip() and not line.startswith("Industry:")]
+
+def _field(text: str, label: str) -> str:
+    match = re.search(rf"^{label}: (.+)$", text, re.M)
+    return match.group(1).strip() if match else ""
+
+def parse_cv(text: str) -> dict:
+    lines = text.strip().split("\n")
+    roles = ROLE_RE.findall(text)
+    this_year = time.localtime().tm_year
+    experience = sum((this_year if end == "Present" else int(end)) - int(start) for _, _, start, end in roles)
+    education = _section(text, "Education")
+    degree, _, rest = (education[0] if education else "").partition(", ")
+    institution, _, gpa = rest.partition(", GPA ")
+    skills = _section(text, "Skills")
+    contact = lines[1] if len(lines) > 1 else ""
+    return {
+        "name": lines[0] if lines else "Unknown",
+        "email": (re.search(r"[\w.]+@[\w.]+", contact) or [""])[0],
+        "phone": (re.search(r"\+?[\d ]{10,}", contact) or [""])[0].strip(),
+        "skills": skills[0].split(", ") if skills else [],
+        "education": {"institution": institution, "degree": degree, "gpa": gpa},
+        "experience": experience,
+        "work_experience": [line for line in _section(text, "Experience") if not ROLE_RE.match(line)],
+        "certifications": _section(text, "Certifications"),
+        "projects": _section(text, "Projects"),
+        "field_of_study": degree.split(" in ")[-1] if " in " in degree else "",
+        "industry": _field(text, "Industry"),
+        "experience_details": [
+            {"company": company, "role": role, "duration": f"{start}-{end}"} for role, company, start, end in roles
+        ]
+    }
+
+def parse_jd(text: str) -> dict:
+    education = _field(text, "Education")
+    skills = _section(text, "Skills")
+    return {
+        "title": _field(text, "Title") or "Unknown Title",
+        "summary": " ".join(_section(text, "About the role")),
+        "skills": skills[0].split(", ") if skills else [],
+        "responsibilities": _section(text, "Responsibilities"),
+        "requirements": [],
+        "keywords": [],
+        "education": {"institution": "", "degree": education, "gpa": ""},
+        "experience": int((re.search(r"\d+", _field(text, "Experience")) or ["0"])[0]),
+        "projects": _section(text, "Projects"),
+        "field_of_study": education.split(" in ")[-1] if " in " in education else "",
+        "industry": _field(text, "Industry")
+    }
+
+def answer(prompt: str) -> tuple:
+    """(response object, number of documents in the prompt)."""
+    if "<<<CV " in prompt:
+        items = [dict(parse_cv(body), id=int(n)) for n, body in BATCH_CV_RE.findall(prompt)]
+        return items, len(items)
+    if "CV Text:\n" in prompt:
+        return parse_cv(prompt.split("CV Text:\n", 1)[1]), 1
+    return parse_jd(prompt.split("Job Description:\n", 1)[-1]), 1
+
+class FakeGemini:
+    def __init__(self, latency: float = 0.5, per_item: float = 0.1, jitter: float = 0.2, failure_rate: float = 0.0,
+                 max_rps: float = 0.0):
+        self.latency = latency
+        self.per_item = per_item
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.max_rps = max_rps
+        self.requests = 0
+        self.rejected = 0
+        self._recent = deque()
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _over_quota(self) -> bool:
+        if self.max_rps <= 0:
+            return False
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] >= 1.0:
+            self._recent.popleft()
+        if len(self._recent) >= self.max_rps:
+            self.rejected += 1
+            return True
+        self._recent.append(now)
+        return False
+
+    def start(self, port: int = 0) -> str:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake._lock:
+                    fake.requests += 1
+                    limited = fake._over_quota()
+                if limited:
+                    # Quota exceeded: answer at once, like the real API, with a hint of when to come back
+                    self.send_response(429)
+                    self.send_header("Retry-After", "1")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                data, items = answer(body["contents"][0]["parts"][0]["text"])
+                # Response time grows with the number of documents, as output tokens do
+                delay = fake.latency + fake.per_item * (items - 1)
+                time.sleep(max(0.0, delay * (1 + random.uniform(-fake.jitter, fake.jitter))))
+                if random.random() < fake.failure_rate:
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                payload = json.dumps({"candidates": [{"content": {"parts": [{"text": json.dumps(data)}]}}]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}/generateContent"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per request")
+    parser.add_argument("--per-item", type=float, default=0.1, help="extra seconds per additional CV in a batch prompt")
+    parser.add_argument("--jitter", type=float, default=0.2, help="relative random variation of the latency")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--max-rps", type=float, default=0.0, help="requests per second before answering 429 (0: no limit)")
+    args = parser.parse_args()
+    url = FakeGemini(args.latency, args.per_item, args.jitter, args.failure_rate, args.max_rps).start(args.port)
+    print(f"Fake Gemini listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Benchmark the CV pipeline stage by stage: extract, parse, embed, score and persist.
+
+Synthetic CVs are rendered as real documents and parsed against a local fake Gemini server, so the numbers cover
+everything except the network and the model behind the API. Each batch size runs in a fresh interpreter with its
+own scratch databases and caches, which keeps peak RSS per size meaningful.
+
+Run from the Backend directory:
+    python benchmarks/pipeline_benchmark.py --sizes 1,10,100,1000 --output baseline.json
+    python benchmarks/pipeline_benchmark.py --output candidate.json --compare baseline.json
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARK_DIR)
+STAGES = ("extract", "parse", "embed", "score", "persist")
+
+def percentiles(values: list) -> dict:
+    import numpy as np
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50_s": float(p50), "p95_s": float(p95), "p99_s": float(p99), "mean_s": float(np.mean(values)),
+            "max_s": float(max(values)), "samples": len(values)}
+
+def peak_rss_mb() -> dict:
+    try:
+        import resource
+    except ImportError:
+        return {}
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1)
+    }
+
+async def run_size(size: int, repeat: int, doc_type: str, seed: int) -> dict:
+    sys.path.insert(0, BACKEND_DIR)
+    from synthetic import make_cv, make_jd, render
+    from agents.embeddings import warm_up
+    from agents.text_extractor import extract_upload_texts, shutdown_executor
+    from agents.cv_matcher import compute_jd_embeddings, compute_cv_embeddings, section_scores, scores_from_sections
+    from agents.jd_summarizer import summarize_job_description, parse_cvs_async, store_scored_cvs
+    from agents.llm_client import gemini_client
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    await asyncio.to_thread(warm_up)
+    jd_data, jd_id = await asyncio.to_thread(summarize_job_description, make_jd(rng))
+    jd_embeddings = await asyncio.to_thread(compute_jd_embeddings, jd_data)
+
+    async def pipeline_pass(uploads: list) -> tuple:
+        t0 = time.perf_counter()
+        extracted = await extract_upload_texts(uploads)
+        t1 = time.perf_counter()
+        parsed = await parse_cvs_async([text for text, _ in extracted if text])
+        parsed = [cv for cv in parsed if cv is not None]
+        t2 = time.perf_counter()
+        cv_embeddings = await asyncio.to_thread(compute_cv_embeddings, parsed)
+        t3 = time.perf_counter()
+        raw_scores = await asyncio.to_thread(section_scores, jd_data, parsed, jd_embeddings, cv_embeddings)
+        all_scores = scores_from_sections(raw_scores)
+        t4 = time.perf_counter()
+        await asyncio.to_thread(store_scored_cvs, jd_id, copy.deepcopy(parsed), all_scores, cv_embeddings, raw_scores)
+        t5 = time.perf_counter()
+        return len(parsed), (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4)
+
+    # One untimed CV loads the model, starts the extraction pool and imports the lazily loaded libraries
+    await pipeline_pass([render(make_cv(rng, -1), doc_type)])
+    warmup_s = time.perf_counter() - started
+
+    timings = {stage: [] for stage in STAGES}
+    totals = []
+    failures = 0
+    for rep in range(repeat):
+        # Fresh documents every repetition so the text and parse caches start cold
+        uploads = [render(make_cv(rng, rep * size + i), doc_type) for i in range(size)]
+        parsed_count, elapsed = await pipeline_pass(uploads)
+        failures += size - parsed_count
+        for stage, seconds in zip(STAGES, elapsed):
+            timings[stage].append(seconds)
+        totals.append(sum(elapsed))
+
+    await gemini_client.aclose()
+    shutdown_executor()
+    stages = {}
+    for stage, values in timings.items():
+        stats = percentiles(values)
+        stats["throughput_per_s"] = round(size / stats["p50_s"], 2) if stats["p50_s"] else None
+        stages[stage] = stats
+    total = percentiles(totals)
+    total["throughput_per_s"] = round(size / total["p50_s"], 2) if total["p50_s"] else None
+    return dict({"size": size, "warmup_s": warmup_s, "failures": failures, "stages": stages, "total": total}, **peak_rss_mb())
+
+def run_worker(size: int, args, gemini_url: str) -> dict:
+    path = [BENCHMARK_DIR, BACKEND_DIR] + ([os.environ["PYTHONPATH"]] if os.environ.get("PYTHONPATH") else [])
+    env = dict(os.environ, GEMINI_API_URL=gemini_url, PYTHONPATH=os.pathsep.join(path))
+    command = [sys.executable, os.path.abspath(__file__), "--worker-size", str(size), "--repeat", str(args.repeat),
+               "--doc-type", args.doc_type, "--seed", str(args.seed)]
+    with tempfile.TemporaryDirectory() as workdir:
+        # A scratch working directory keeps the benchmark's databases and caches out of the real ones
+        out = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f"Benchmark worker for {size} CVs failed:\n{out.stderr}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Print p50 changes against a baseline run and return the regressions beyond the threshold."""
+    regressions = []
+    print(f"\n{'size':>6} {'stage':<8} {'baseline p50':>13} {'current p50':>12} {'change':>8}")
+    for size, result in current["sizes"].items():
+        base = baseline.get("sizes", {}).get(size)
+        if not base:
+            continue
+        for stage in STAGES + ("total",):
+            old = (base["stages"].get(stage) if stage != "total" else base["total"]) or {}
+            new = result["stages"][stage] if stage != "total" else result["total"]
+            if not old.get("p50_s"):
+                continue
+            change = new["p50_s"] / old["p50_s"] - 1
+            flag = "  REGRESSION" if change > threshold else ""
+            print(f"{size:>6} {stage:<8} {old['p50_s']:>12.4f}s {new['p50_s']:>11.4f}s {change:>+7.1%}{flag}")
+            if flag:
+                regressions.append((size, stage, change))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1,10,100,1000", help="comma-separated CV batch sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="timed repetitions per size")
+    parser.add_argument("--doc-type", choices=("pdf", "docx", "txt"), default="pdf")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake Gemini seconds per request")
+    parser.add_argument("--per-item", type=float, default=0.1, help="fake Gemini extra seconds per CV in a batch prompt")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of fake Gemini requests failing with 503")
+    parser.add_argument("--max-rps", type=float, default=0.0, help="fake Gemini quota in requests per second (0: none)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.10, help="p50 slowdown reported as a regression")
+    parser.add_argument("--worker-size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker_size is not None:
+        import logging
+        logging.basicConfig(level=logging.WARNING)
+        print(json.dumps(asyncio.run(run_size(args.worker_size, args.repeat, args.doc_type, args.seed))))
+        return
+
+    from fake_gemini import FakeGemini
+    fake = FakeGemini(latency=args.latency, per_item=args.per_item, failure_rate=args.failure_rate, max_rps=args.max_rps)
+    url = fake.start()
+    sizes = {}
+    try:
+        for size in (int(s) for s in args.sizes.split(",")):
+            result = run_worker(size, args, url)
+            sizes[str(size)] = result
+            print(f"{size:>6} CVs: total p50 {result['total']['p50_s']:.3f}s "
+                  f"({result['total']['throughput_per_s']} CVs/s), peak RSS {result.get('peak_rss_mb')} MB")
+            for stage in STAGES:
+                stats = result["stages"][stage]
+                print(f"         {stage:<8} p50 {stats['p50_s']:.4f}s  p95 {stats['p95_s']:.4f}s  {stats['throughput_per_s']} CVs/s")
+    finally:
+        fake.stop()
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "doc_type": args.doc_type,
+            "repeat": args.repeat,
+            "gemini_latency_s": args.latency,
+            "gemini_per_item_s": args.per_item,
+            "gemini_requests": fake.requests,
+            "gemini_rejected": fake.rejected,
+            "gemini_failure_rate": args.failure_rate,
+            "env": {k: v for k, v in os.environ.items() if k in (
+                "GEMINI_CONCURRENCY", "GEMINI_RPM", "GEMINI_TPM", "GEMINI_MAX_RETRIES", "CV_PREPARSE", "CV_BATCH_PARSING",
+                "CV_BATCH_TOKEN_BUDGET", "CV_BATCH_MAX_ITEMS",
+                "EXTRACT_WORKERS", "EMBEDDING_MODEL", "EMBEDDING_BACKEND", "EMBEDDING_THREADS", "EMBEDDING_AUTOTUNE",
+                "ENCODE_BATCH_SIZE", "SKILL_FUZZY_METHOD", "PHRASE_CACHE_ENABLED"
+            )}
+        },
+        "sizes": sizes
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Compare the fuzzy fallback of skills matching against the per-pair SequenceMatcher loop it replaced.
+
+Scores synthetic CVs against synthetic JDs with the original loop and with each SKILL_FUZZY_METHOD, and reports the
+time taken and how far the skills scores move from the original. Overall match scores move by at most the skills
+weight times that. The 'sequence' method must reproduce the original exactly; the script exits with status 1 if
+it does not.
+
+Run from the Backend directory:
+    python benchmarks/skill_match_benchmark.py --cvs 500 --jds 5 --output skills.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from difflib import SequenceMatcher
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+METHODS = ("sequence", "ngram")
+
+def workload(cvs: int, jds: int, seed: int) -> tuple:
+    from synthetic import make_cv, make_jd
+    from fake_gemini import parse_cv, parse_jd
+    rng = random.Random(seed)
+    return [parse_jd(make_jd(rng)) for _ in range(jds)], [parse_cv(make_cv(rng, i)) for i in range(cvs)]
+
+def reference_skills_scores(jd_skills: list, cv_skill_lists: list, vectors: dict):
+    """Skills scores of every CV against one JD, computed the way they were before the fallback was batched."""
+    import numpy as np
+    from agents.cv_matcher import SKILL_FUZZY_THRESHOLD, SKILL_STRONG_MATCH, normalize_text
+    scores = np.zeros(len(cv_skill_lists), dtype=np.float64)
+    counts = np.array([len(s) for s in cv_skill_lists])
+    has = np.flatnonzero(counts)
+    if not jd_skills or not has.size:
+        return scores
+    jd_mat = np.stack([vectors[normalize_text(s)] for s in jd_skills])
+    cv_mat = np.stack([vectors[normalize_text(s)] for i in has for s in cv_skill_lists[i]])
+    starts = np.concatenate(([0], np.cumsum(counts[has])[:-1]))
+    best = np.maximum.reduceat(jd_mat @ cv_mat.T, starts, axis=1).astype(np.float64)
+    for col, i in enumerate(has):
+        sims = best[:, col]
+        for row in np.flatnonzero(sims < SKILL_FUZZY_THRESHOLD):
+            sims[row] = max(SequenceMatcher(None, jd_skills[row].lower(), cv.lower()).ratio()
+                            for cv in cv_skill_lists[i])
+        score = sims.mean()
+        if np.count_nonzero(sims >= SKILL_STRONG_MATCH) / len(jd_skills) >= 0.75:
+            score += 0.1
+        scores[i] = min(score, 1.0)
+    return scores
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cvs", type=int, default=500, help="synthetic CVs scored against every JD")
+    parser.add_argument("--jds", type=int, default=5, help="synthetic JDs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+    import numpy as np
+    from agents import cv_matcher
+    from agents.cv_matcher import embed_texts, extract_sections, normalize_text
+
+    jd_list, cv_list = workload(args.cvs, args.jds, args.seed)
+    jd_skills = [extract_sections(jd, "responsibilities")["skills"] for jd in jd_list]
+    cv_skills = [extract_sections(cv, "work_experience")["skills"] for cv in cv_list]
+    vectors = embed_texts(list(dict.fromkeys(normalize_text(s) for skills in jd_skills + cv_skills for s in skills)))
+
+    started = time.perf_counter()
+    baseline = np.array([reference_skills_scores(skills, cv_skills, vectors) for skills in jd_skills])
+    results = {"reference": {"seconds": round(time.perf_counter() - started, 4)}}
+    print(f"{'reference':<10} {results['reference']['seconds']:>8.3f}s")
+
+    # The n-gram vectorizer pulls in scikit-learn on first use; that one-off import is reported, not timed per method
+    started = time.perf_counter()
+    cv_matcher._get_char_vectorizer()
+    results["ngram_import_seconds"] = round(time.perf_counter() - started, 4)
+
+    failed = False
+    for method in METHODS:
+        cv_matcher.SKILL_FUZZY_METHOD = method
+        # Timed with a cold ratio cache, as in a fresh process
+        cv_matcher._sequence_ratio.cache_clear()
+        started = time.perf_counter()
+        scores = cv_matcher._skills_scores(jd_skills, cv_skills, vectors)
+        seconds = time.perf_counter() - started
+        drift = np.abs(scores - baseline)
+        results[method] = {
+            "seconds": round(seconds, 4),
+            "speedup_vs_reference": round(results["reference"]["seconds"] / seconds, 2) if seconds else None,
+            "skills_drift": {"max_abs": float(drift.max()), "mean_abs": float(drift.mean())}
+        }
+        print(f"{method:<10} {seconds:>8.3f}s  speedup {results[method]['speedup_vs_reference']}x  "
+              f"skills drift max {drift.max():.4f} mean {drift.mean():.5f}")
+        if method == "sequence" and drift.max() > 1e-12:
+            failed = True
+            print("sequence does not reproduce the reference skills scores")
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cvs": args.cvs,
+            "jds": args.jds,
+            "skills_weight": cv_matcher.DEFAULT_CONFIG["weights"]["skills"]
+        },
+        "methods": results
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
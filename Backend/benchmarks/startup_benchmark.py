@@ -0,0 +1,74 @@
+"""Measure API cold-start cost: importing app.py, serving the first request and loading the embedding model.
+
+Run from the Backend directory:
+    python benchmarks/startup_benchmark.py --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executed in a fresh interpreter per run so nothing is cached between measurements
+PROBE = r"""
+import json, sys, time
+sys.path.insert(0, {backend!r})
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.app) as client:
+    client.get("/")
+    first_request = time.perf_counter()
+    model_load = None
+    if {with_model}:
+        from agents.embeddings import warm_up
+        t = time.perf_counter()
+        warm_up()
+        model_load = time.perf_counter() - t
+print(json.dumps({{
+    "import_s": imported - started,
+    "first_request_s": first_request - started,
+    "model_load_s": model_load
+}}))
+"""
+
+def run_once(with_model: bool) -> dict:
+    probe = PROBE.format(backend=BACKEND_DIR, with_model=with_model)
+    with tempfile.TemporaryDirectory() as workdir:
+        # A scratch working directory keeps the benchmark's SQLite files out of the real ones
+        env = dict(os.environ, JOB_WORKERS="0", WARMUP_MODELS="0")
+        out = subprocess.run([sys.executable, "-c", probe], cwd=workdir, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def summarize(values: list) -> dict:
+    values = [v for v in values if v is not None]
+    if not values:
+        return {}
+    return {"min": min(values), "median": statistics.median(values), "max": max(values)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--with-model", action="store_true", help="also time loading the embedding model")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    runs = [run_once(args.with_model) for _ in range(args.runs)]
+    result = {
+        "runs": args.runs,
+        "import_s": summarize([r["import_s"] for r in runs]),
+        "first_request_s": summarize([r["first_request_s"] for r in runs]),
+        "model_load_s": summarize([r["model_load_s"] for r in runs])
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Synthetic job descriptions and CVs of realistic size, rendered as plain text, PDF or DOCX."""
+import io
+import random
+
+FIRST_NAMES = ["Aarav", "Priya", "Rahul", "Sneha", "Arjun", "Meera", "Vikram", "Ananya", "Rohan", "Kavya",
+               "James", "Maria", "Chen", "Fatima", "Lucas", "Sofia", "Omar", "Elena", "David", "Yuki"]
+LAST_NAMES = ["Sharma", "Patel", "Iyer", "Reddy", "Gupta", "Nair", "Singh", "Khan", "Smith", "Garcia",
+              "Wang", "Müller", "Rossi", "Silva", "Kim", "Ali", "Novak", "Cohen", "Brown", "Tanaka"]
+SKILLS = ["Python", "Java", "JavaScript", "TypeScript", "React", "Node.js", "SQL", "PostgreSQL", "MongoDB", "AWS",
+          "Azure", "GCP", "Docker", "Kubernetes", "Terraform", "Machine Learning", "Deep Learning", "PyTorch",
+          "TensorFlow", "NLP", "Data Analysis", "Pandas", "Spark", "Kafka", "Airflow", "FastAPI", "Django",
+          "Flask", "Spring Boot", "REST APIs", "GraphQL", "CI/CD", "Git", "Linux", "Agile", "Scrum",
+          "Microservices", "Redis", "Elasticsearch", "Tableau", "Power BI", "Excel", "C++", "Go", "Rust",
+          "Computer Vision", "MLOps", "Statistics", "A/B Testing", "Project Management"]
+ROLES = ["Software Engineer", "Senior Software Engineer", "Data Scientist", "Machine Learning Engineer",
+         "Backend Developer", "Full Stack Developer", "DevOps Engineer", "Data Engineer", "Product Analyst",
+         "Technical Lead"]
+COMPANIES = ["Infosys", "TCS", "Wipro", "Accenture", "Google", "Microsoft", "Amazon", "Flipkart", "Zomato",
+             "Freshworks", "Razorpay", "Swiggy", "IBM", "Oracle", "SAP", "Deloitte", "Capgemini", "Atlassian"]
+INDUSTRIES = ["Information Technology", "Financial Services", "E-commerce", "Healthcare", "Education Technology",
+              "Telecommunications", "Logistics", "Media and Entertainment"]
+FIELDS = ["Computer Science", "Information Technology", "Electronics and Communication", "Data Science",
+          "Mathematics", "Statistics", "Mechanical Engineering"]
+DEGREES = ["Bachelor of Technology", "Bachelor of Science", "Master of Technology", "Master of Science", "PhD"]
+INSTITUTIONS = ["IIT Bombay", "IIT Delhi", "NIT Trichy", "BITS Pilani", "Anna University", "VIT Vellore",
+                "University of Mumbai", "Stanford University", "University of Toronto"]
+CERTIFICATIONS = ["AWS Certified Solutions Architect", "Google Professional Data Engineer", "Certified Kubernetes Administrator",
+                  "Microsoft Azure Fundamentals", "PMP", "Certified Scrum Master", "TensorFlow Developer Certificate"]
+VERBS = ["Designed", "Built", "Led", "Optimised", "Migrated", "Automated", "Implemented", "Maintained", "Scaled", "Delivered"]
+OBJECTS = ["a real-time analytics pipeline", "the payments service", "an internal recommendation engine",
+           "customer-facing REST APIs", "the CI/CD workflow", "a data warehouse on the cloud",
+           "a fraud detection model", "the search ranking service", "monitoring and alerting dashboards",
+           "a document classification system"]
+OUTCOMES = ["reducing latency by {n}%", "serving {n}k requests per minute", "cutting infrastructure cost by {n}%",
+            "improving accuracy by {n} points", "for a team of {n} engineers", "across {n} product lines"]
+
+def _sentence(rng: random.Random, skills: list) -> str:
+    outcome = rng.choice(OUTCOMES).format(n=rng.randint(5, 60))
+    return f"{rng.choice(VERBS)} {rng.choice(OBJECTS)} using {rng.choice(skills)} and {rng.choice(skills)}, {outcome}."
+
+def make_cv(rng: random.Random, index: int) -> str:
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    skills = rng.sample(SKILLS, rng.randint(10, 22))
+    lines = [
+        name,
+        f"Email: {name.lower().replace(' ', '.')}{index}@example.com | Phone: +91 9{rng.randint(100000000, 999999999)}",
+        "",
+        "Summary",
+        " ".join(_sentence(rng, skills) for _ in range(3)),
+        "",
+        "Skills",
+        ", ".join(skills),
+        "",
+        "Experience"
+    ]
+    year = 2024
+    for _ in range(rng.randint(2, 5)):
+        length = rng.randint(1, 4)
+        end = "Present" if year == 2024 else str(year)
+        lines.append(f"{rng.choice(ROLES)} at {rng.choice(COMPANIES)} ({year - length}-{end})")
+        lines += [f"- {_sentence(rng, skills)}" for _ in range(rng.randint(3, 6))]
+        year -= length
+    lines += [
+        "",
+        "Education",
+        f"{rng.choice(DEGREES)} in {rng.choice(FIELDS)}, {rng.choice(INSTITUTIONS)}, GPA {rng.uniform(6.5, 9.8):.1f}",
+        "",
+        "Projects"
+    ]
+    lines += [f"- {_sentence(rng, skills)}" for _ in range(rng.randint(2, 4))]
+    lines += ["", "Certifications"]
+    lines += [f"- {cert}" for cert in rng.sample(CERTIFICATIONS, rng.randint(0, 3))]
+    lines += ["", f"Industry: {rng.choice(INDUSTRIES)}"]
+    return "\n".join(lines)
+
+def make_jd(rng: random.Random) -> str:
+    skills = rng.sample(SKILLS, rng.randint(8, 14))
+    lines = [
+        f"Title: {rng.choice(ROLES)}",
+        f"Industry: {rng.choice(INDUSTRIES)}",
+        f"Experience: {rng.randint(2, 8)} years",
+        f"Education: {rng.choice(DEGREES[:4])} in {rng.choice(FIELDS)}",
+        "",
+        "About the role",
+        " ".join(_sentence(rng, skills) for _ in range(4)),
+        "",
+        "Skills",
+        ", ".join(skills),
+        "",
+        "Responsibilities"
+    ]
+    lines += [f"- {_sentence(rng, skills)}" for _ in range(rng.randint(6, 10))]
+    lines += ["", "Projects"]
+    lines += [f"- {_sentence(rng, skills)}" for _ in range(2)]
+    return "\n".join(lines)
+
+def _pdf_escape(line: str) -> str:
+    line = line.encode("latin-1", "replace").decode("latin-1")
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def to_pdf(text: str, lines_per_page: int = 50) -> bytes:
+    """Minimal multi-page PDF with one Helvetica text line per input line (long lines are wrapped)."""
+    wrapped = []
+    for line in text.split("\n"):
+        while len(line) > 95:
+            cut = line.rfind(" ", 0, 95)
+            cut = cut if cut > 0 else 95
+            wrapped.append(line[:cut])
+            line = line[cut:].lstrip()
+        wrapped.append(line)
+    pages = [wrapped[i:i + lines_per_page] for i in range(0, len(wrapped), lines_per_page)] or [[]]
+    font_id = 3 + 2 * len(pages)
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{3 + 2 * i} 0 R' for i in range(len(pages)))}] /Count {len(pages)} >>"
+    ]
+    for i, page in enumerate(pages):
+        stream = "BT /F1 10 Tf 40 760 Td 14 TL " + "".join(f"({_pdf_escape(line)}) Tj T* " for line in page) + "ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    out.write("".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+def to_docx(text: str) -> bytes:
+    import docx
+    document = docx.Document()
+    for line in text.split("\n"):
+        document.add_paragraph(line)
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+CONTENT_TYPES = {
+    "txt": "text/plain",
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+}
+
+def render(text: str, doc_type: str) -> tuple:
+    """(content_type, bytes) for a document of the given type."""
+    if doc_type == "pdf":
+        return CONTENT_TYPES[doc_type], to_pdf(text)
+    if doc_type == "docx":
+        return CONTENT_TYPES[doc_type], to_docx(text)
+    return CONTENT_TYPES["txt"], text.encode("utf-8")
@@ -1,25 +1,697 @@
+import base64
+import json
+import logging
+import os
 import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DB_FILE = os.getenv("DB_FILE", "job_descriptions.db")
+# Seconds a writer waits for the lock before failing with "database is locked"
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "30"))
+
+# matchBreakdown keys and the cvs columns that store them, so candidates can be sorted and filtered by each one
+BREAKDOWN_COLUMNS = {
+    "skills": "skills_score",
+    "experience": "experience_score",
+    "education": "education_score",
+    "industryRelevance": "industry_score"
+}
+
+# Columns of section_scores: the sections agents.cv_matcher.SECTIONS scores, in the same order
+SECTIONS = ('skills', 'education', 'experience', 'industry', 'projects', 'certifications')
+
+IDENTITY_COLUMNS = {"candidate_id": "INTEGER", "content_hash": "TEXT", "source_cv_id": "INTEGER"}
+
+_local = threading.local()
+
+def get_db_connection() -> sqlite3.Connection:
+    """Connection owned by the calling thread, kept open so its prepared statement cache is reused."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        # Autocommit mode: writes are grouped explicitly with transaction()
+        conn = sqlite3.connect(DB_FILE, timeout=DB_BUSY_TIMEOUT, isolation_level=None, cached_statements=256)
+        # WAL lets readers run alongside a writer; NORMAL sync only fsyncs at checkpoints
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+    return conn
+
+@contextmanager
+def transaction():
+    """Run a block of writes as one IMMEDIATE transaction on this thread's connection."""
+    conn = get_db_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
 
 def init_db():
-    conn = sqlite3.connect("recruitment.db")
-    cursor = conn.cursor()
-    
-    # Create table for job descriptions
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS job_descriptions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            summary TEXT NOT NULL,
-            skills TEXT NOT NULL,
-            responsibilities TEXT NOT NULL,
-            requirements TEXT NOT NULL,
-            keywords TEXT NOT NULL,
-            original_text TEXT NOT NULL
-        )
-    """)
-    
-    conn.commit()
-    conn.close()
-
-def get_db_connection():
-    return sqlite3.connect("recruitment.db")
\ No newline at end of file
+    with transaction() as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS job_descriptions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT,
+                summary TEXT,
+                skills TEXT,
+                responsibilities TEXT,
+                requirements TEXT,
+                keywords TEXT,
+                education TEXT,
+                experience INTEGER,
+                projects TEXT,
+                field_of_study TEXT,
+                industry TEXT,
+                original_text TEXT
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cvs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                jd_id INTEGER,
+                name TEXT,
+                email TEXT,
+                phone TEXT,
+                skills TEXT,
+                education TEXT,
+                experience INTEGER,
+                work_experience TEXT,
+                certifications TEXT,
+                projects TEXT,
+                field_of_study TEXT,
+                industry TEXT,
+                match_score REAL,
+                match_breakdown TEXT,
+                experience_details TEXT
+            )
+        ''')
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(cvs)")}
+        for key, column in BREAKDOWN_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE cvs ADD COLUMN {column} REAL")
+                conn.execute(
+                    f"UPDATE cvs SET {column} = json_extract(match_breakdown, '$.{key}') WHERE json_valid(match_breakdown)"
+                )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_cvs_jd_{column} ON cvs (jd_id, {column} DESC)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cvs_jd_score ON cvs (jd_id, match_score DESC)")
+        # Unrounded per-section scores of each CV against a JD, kept so candidates can be re-ranked with new weights
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS section_scores (
+                jd_id INTEGER,
+                cv_id INTEGER,
+                {", ".join(f"{section} REAL" for section in SECTIONS)},
+                PRIMARY KEY (jd_id, cv_id)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS jd_embeddings (
+                jd_id INTEGER,
+                model_name TEXT,
+                section TEXT,
+                texts TEXT,
+                dim INTEGER,
+                vectors BLOB,
+                PRIMARY KEY (jd_id, model_name, section)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cv_embeddings (
+                cv_id INTEGER,
+                model_name TEXT,
+                section TEXT,
+                texts TEXT,
+                dim INTEGER,
+                vectors BLOB,
+                PRIMARY KEY (cv_id, model_name, section)
+            )
+        ''')
+        # Bumped by triggers on every change to a JD's CVs, so a candidate list's ETag can be checked without reading it
+        conn.execute("CREATE TABLE IF NOT EXISTS cv_list_versions (jd_id INTEGER PRIMARY KEY, version INTEGER)")
+        for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS cvs_version_{event.lower()} AFTER {event} ON cvs BEGIN
+                    INSERT OR IGNORE INTO cv_list_versions (jd_id, version) VALUES ({row}.jd_id, 0);
+                    UPDATE cv_list_versions SET version = version + 1 WHERE jd_id = {row}.jd_id;
+                END
+            ''')
+        # The candidate each CV belongs to, the hash of its text, and the CV whose parsed data and embeddings it reuses
+        for column, kind in IDENTITY_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE cvs ADD COLUMN {column} {kind}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cvs_candidate ON cvs (candidate_id, jd_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cvs_content_hash ON cvs (content_hash)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cvs_source ON cvs (source_cv_id)")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS candidates (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        # Normalized emails and phone numbers, each pointing at the one candidate it identifies
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS candidate_keys (
+                kind TEXT,
+                key TEXT,
+                candidate_id INTEGER,
+                PRIMARY KEY (kind, key)
+            )
+        ''')
+        # MinHash signatures of the CVs that hold their own parsed data, and their LSH buckets
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cv_signatures (
+                cv_id INTEGER PRIMARY KEY,
+                signature BLOB
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cv_signature_bands (
+                band INTEGER,
+                bucket INTEGER,
+                cv_id INTEGER,
+                PRIMARY KEY (band, bucket, cv_id)
+            )
+        ''')
+
+def save_jd_to_db(jd_data: dict):
+    serialized_jd_data = {
+        'title': jd_data['title'],
+        'summary': jd_data['summary'],
+        'skills': json.dumps(jd_data['skills']),
+        'responsibilities': json.dumps(jd_data['responsibilities']),
+        'requirements': json.dumps(jd_data['requirements']),
+        'keywords': json.dumps(jd_data['keywords']),
+        'education': json.dumps(jd_data['education']),
+        'experience': jd_data['experience'],
+        'projects': json.dumps(jd_data['projects']),
+        'field_of_study': jd_data['field_of_study'],
+        'industry': jd_data['industry'],
+        'originalText': jd_data['originalText']
+    }
+    try:
+        with transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO job_descriptions (
+                    title, summary, skills, responsibilities, requirements, keywords,
+                    education, experience, projects, field_of_study, industry, original_text
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                serialized_jd_data['title'],
+                serialized_jd_data['summary'],
+                serialized_jd_data['skills'],
+                serialized_jd_data['responsibilities'],
+                serialized_jd_data['requirements'],
+                serialized_jd_data['keywords'],
+                serialized_jd_data['education'],
+                serialized_jd_data['experience'],
+                serialized_jd_data['projects'],
+                serialized_jd_data['field_of_study'],
+                serialized_jd_data['industry'],
+                serialized_jd_data['originalText']
+            ))
+            jd_id = cursor.lastrowid
+        logger.debug(f"JD saved with ID: {jd_id}")
+        return jd_id
+    except sqlite3.Error as e:
+        logger.error(f"Database error while saving JD: {str(e)}")
+        raise
+
+def load_jd(jd_id: int) -> Optional[dict]:
+    """Stored JD in the shape used for matching, or None if it does not exist."""
+    row = get_db_connection().execute('''
+        SELECT title, summary, skills, responsibilities, requirements, keywords, education, experience, projects,
+               field_of_study, industry
+        FROM job_descriptions WHERE id = ?
+    ''', (jd_id,)).fetchone()
+    if not row:
+        return None
+    title, summary, skills, responsibilities, requirements, keywords, education, experience, projects, field_of_study, industry = row
+    return {
+        "title": title,
+        "skills": json.loads(skills) if skills else [],
+        "education": json.loads(education) if education else {},
+        "experience": experience,
+        "responsibilities": json.loads(responsibilities) if responsibilities else [],
+        "projects": json.loads(projects) if projects else [],
+        "field_of_study": field_of_study,
+        "summary": summary,
+        "requirements": json.loads(requirements) if requirements else [],
+        "keywords": json.loads(keywords) if keywords else [],
+        "industry": industry
+    }
+
+def _embedding_rows(owner_id: int, embeddings: dict, model_name: str) -> list:
+    return [
+        (owner_id, model_name, section, json.dumps(texts), int(embs.shape[1]) if embs.size else 0,
+         np.ascontiguousarray(embs, dtype=np.float32).tobytes())
+        for section, (texts, embs) in embeddings.items()
+    ]
+
+def _decode_embedding(texts: str, dim: int, blob: bytes) -> tuple:
+    texts = json.loads(texts)
+    embs = np.frombuffer(blob, dtype=np.float32).reshape(len(texts), dim) if texts else np.empty((0, 0), dtype=np.float32)
+    return texts, embs
+
+def _insert_jd_embeddings(conn: sqlite3.Connection, rows: list):
+    conn.executemany('''
+        INSERT OR REPLACE INTO jd_embeddings (jd_id, model_name, section, texts, dim, vectors)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', rows)
+
+def save_jd_embeddings(jd_id: int, embeddings: dict, model_name: str):
+    rows = _embedding_rows(jd_id, embeddings, model_name)
+    try:
+        with transaction() as conn:
+            _insert_jd_embeddings(conn, rows)
+        logger.debug(f"Stored {len(rows)} embedding sections for JD ID: {jd_id}")
+    except sqlite3.Error as e:
+        logger.error(f"Database error while saving JD embeddings: {str(e)}")
+        raise
+
+def load_jd_embeddings(jd_id: int, model_name: str) -> dict:
+    rows = get_db_connection().execute(
+        "SELECT section, texts, dim, vectors FROM jd_embeddings WHERE jd_id = ? AND model_name = ?",
+        (jd_id, model_name)
+    ).fetchall()
+    return {section: _decode_embedding(texts, dim, blob) for section, texts, dim, blob in rows}
+
+def _insert_cv_embeddings(conn: sqlite3.Connection, rows: list):
+    conn.executemany('''
+        INSERT OR REPLACE INTO cv_embeddings (cv_id, model_name, section, texts, dim, vectors)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', rows)
+
+def load_cv_embeddings(cv_ids: Optional[list], model_name: str) -> dict:
+    """Stored CV embeddings keyed by cv_id; all stored CVs when cv_ids is None.
+
+    A CV that reuses another CV's parsed data gets that CV's embeddings. Without cv_ids each stored set is returned
+    once, under the CV that holds it.
+    """
+    if cv_ids is None:
+        query = "SELECT cv_id, section, texts, dim, vectors FROM cv_embeddings WHERE model_name = ?"
+        params = [model_name]
+    else:
+        query = f'''
+            SELECT c.id, e.section, e.texts, e.dim, e.vectors
+            FROM cvs c JOIN cv_embeddings e ON e.cv_id = COALESCE(c.source_cv_id, c.id)
+            WHERE e.model_name = ? AND c.id IN ({','.join('?' * len(cv_ids))})
+        '''
+        params = [model_name] + list(cv_ids)
+    embeddings = {}
+    for cv_id, section, texts, dim, blob in get_db_connection().execute(query, params):
+        embeddings.setdefault(cv_id, {})[section] = _decode_embedding(texts, dim, blob)
+    return embeddings
+
+def _maybe_json(value):
+    if not isinstance(value, str):
+        return value
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        return value
+
+def load_cvs(cv_ids: list) -> dict:
+    """Stored parsed CVs keyed by cv_id, in the shape produced by parse_cv."""
+    if not cv_ids:
+        return {}
+    rows = get_db_connection().execute(f'''
+        SELECT id, jd_id, name, email, phone, skills, education, experience, work_experience,
+               certifications, projects, field_of_study, industry, experience_details
+        FROM cvs WHERE id IN ({','.join('?' * len(cv_ids))})
+    ''', list(cv_ids)).fetchall()
+    cvs = {}
+    for row in rows:
+        cvs[row[0]] = {
+            "jd_id": row[1],
+            "name": row[2],
+            "email": row[3],
+            "phone": row[4],
+            "skills": _maybe_json(row[5]) or [],
+            "education": _maybe_json(row[6]) or {},
+            "experience": row[7] or 0,
+            "work_experience": _maybe_json(row[8]) or [],
+            "certifications": _maybe_json(row[9]) or [],
+            "projects": _maybe_json(row[10]) or [],
+            "field_of_study": _maybe_json(row[11]) or "",
+            "industry": _maybe_json(row[12]) or "",
+            "experience_details": _maybe_json(row[13]) or []
+        }
+    return cvs
+
+# The cvs columns filled by _cv_row, in order
+CV_COLUMNS = (
+    "jd_id", "name", "email", "phone", "skills", "education", "experience", "work_experience",
+    "certifications", "projects", "field_of_study", "industry", "match_score", "match_breakdown", "experience_details",
+    *BREAKDOWN_COLUMNS.values()
+)
+INSERT_CV_SQL = f"INSERT INTO cvs ({', '.join(CV_COLUMNS)}) VALUES ({', '.join('?' * len(CV_COLUMNS))})"
+LINKED_COLUMNS = CV_COLUMNS + tuple(IDENTITY_COLUMNS)
+INSERT_LINKED_CV_SQL = f"INSERT INTO cvs ({', '.join(LINKED_COLUMNS)}) VALUES ({', '.join('?' * len(LINKED_COLUMNS))})"
+UPDATE_LINKED_CV_SQL = f"UPDATE cvs SET {', '.join(f'{column} = ?' for column in LINKED_COLUMNS)} WHERE id = ?"
+UPDATE_MATCH_SQL = (
+    f"UPDATE cvs SET match_score = ?, match_breakdown = ?, "
+    f"{', '.join(f'{column} = ?' for column in BREAKDOWN_COLUMNS.values())} WHERE id = ?"
+)
+
+def _cv_row(jd_id: int, cv_data: dict, match_score: float, match_breakdown: dict, experience_details: list) -> tuple:
+    education = cv_data['education']
+    if isinstance(education, (list, dict)):
+        education = json.dumps(education)
+    # Serialize experience_details as JSON
+    experience_details_json = json.dumps(experience_details) if experience_details else "[]"
+    # Serialize field_of_study and industry to handle lists or dictionaries
+    field_of_study = json.dumps(cv_data['field_of_study']) if isinstance(cv_data['field_of_study'], (list, dict)) else cv_data['field_of_study']
+    industry = json.dumps(cv_data['industry']) if isinstance(cv_data['industry'], (list, dict)) else cv_data['industry']
+    return (
+        jd_id,
+        cv_data['name'],
+        cv_data['email'],
+        cv_data['phone'],
+        json.dumps(cv_data['skills']),
+        education,
+        int(cv_data['experience']),
+        json.dumps(cv_data['work_experience']),
+        json.dumps(cv_data['certifications']),
+        json.dumps(cv_data['projects']),
+        field_of_study,
+        industry,
+        match_score,
+        json.dumps(match_breakdown),
+        experience_details_json,
+        *(match_breakdown.get(key) for key in BREAKDOWN_COLUMNS)
+    )
+
+def _insert_section_scores(conn: sqlite3.Connection, jd_id: int, cv_ids: List[int], scores: np.ndarray):
+    conn.executemany(
+        f"INSERT OR REPLACE INTO section_scores (jd_id, cv_id, {', '.join(SECTIONS)}) VALUES (?, ?{', ?' * len(SECTIONS)})",
+        [(jd_id, cv_id, *map(float, row)) for cv_id, row in zip(cv_ids, scores)]
+    )
+
+def save_section_scores(jd_id: int, cv_ids: List[int], scores: np.ndarray):
+    with transaction() as conn:
+        _insert_section_scores(conn, jd_id, cv_ids, scores)
+
+def load_section_scores(jd_id: int) -> tuple:
+    """(cv_ids, N x len(SECTIONS) score matrix) for every scored CV of a JD."""
+    rows = get_db_connection().execute(
+        f"SELECT cv_id, {', '.join(SECTIONS)} FROM section_scores WHERE jd_id = ?", (jd_id,)
+    ).fetchall()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, len(SECTIONS)))
+    matrix = np.array(rows, dtype=np.float64)
+    return matrix[:, 0].astype(np.int64), matrix[:, 1:]
+
+def unscored_cv_ids(jd_id: int) -> List[int]:
+    """CVs of a JD stored before section scores were persisted."""
+    rows = get_db_connection().execute('''
+        SELECT id FROM cvs WHERE jd_id = ? AND id NOT IN (SELECT cv_id FROM section_scores WHERE jd_id = ?)
+    ''', (jd_id, jd_id)).fetchall()
+    return [row[0] for row in rows]
+
+def save_cvs(jd_id: int, scored_cvs: List[tuple], cv_embeddings: List[dict] = None, scores: np.ndarray = None,
+             model_name: str = None) -> List[int]:
+    """Insert (cv_data, match_score, match_breakdown, experience_details) rows, their embeddings and section scores
+    in one transaction.
+
+    Returns the new CV ids in input order.
+    """
+    if not scored_cvs:
+        return []
+    try:
+        with transaction() as conn:
+            conn.executemany(INSERT_CV_SQL, [_cv_row(jd_id, *scored) for scored in scored_cvs])
+            # AUTOINCREMENT ids are allocated consecutively while this transaction holds the write lock
+            (last_id,) = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'cvs'").fetchone()
+            cv_ids = list(range(last_id - len(scored_cvs) + 1, last_id + 1))
+            if cv_embeddings:
+                rows = []
+                for cv_id, embeddings in zip(cv_ids, cv_embeddings):
+                    rows.extend(_embedding_rows(cv_id, embeddings, model_name))
+                _insert_cv_embeddings(conn, rows)
+            if scores is not None:
+                _insert_section_scores(conn, jd_id, cv_ids, scores)
+        logger.debug(f"Saved {len(cv_ids)} CVs for JD ID {jd_id}")
+        return cv_ids
+    except sqlite3.Error as e:
+        logger.error(f"Database error while saving CVs: {str(e)}", exc_info=True)
+        raise
+
+def find_cvs_by_content(content_hashes: list) -> dict:
+    """content_hash -> id of a stored CV with that text which holds its own parsed data and embeddings."""
+    if not content_hashes:
+        return {}
+    rows = get_db_connection().execute(f'''
+        SELECT content_hash, COALESCE(source_cv_id, id) FROM cvs
+        WHERE content_hash IN ({','.join('?' * len(content_hashes))})
+    ''', list(content_hashes)).fetchall()
+    return dict(rows)
+
+def find_signatures_in_buckets(buckets: List[tuple]) -> dict:
+    """cv_id -> MinHash signature bytes of stored CVs sharing at least one (band, bucket) pair."""
+    if not buckets:
+        return {}
+    rows = get_db_connection().execute(f'''
+        SELECT DISTINCT s.cv_id, s.signature
+        FROM cv_signature_bands b JOIN cv_signatures s ON s.cv_id = b.cv_id
+        WHERE (b.band, b.bucket) IN (VALUES {', '.join(['(?, ?)'] * len(buckets))})
+    ''', [value for pair in buckets for value in pair]).fetchall()
+    return dict(rows)
+
+def _link_candidate(conn: sqlite3.Connection, identity: dict) -> int:
+    """The candidate a CV belongs to: the one whose text it shares, else the one with its email or phone, else new.
+
+    A near-identical stored CV (near_cv_id) only decides when neither matches, and only if its candidate has no email
+    or phone of a kind the new CV has, since those would differ: a shared template is not a shared person.
+    """
+    row = None
+    if identity["source_cv_id"] is not None:
+        row = conn.execute("SELECT candidate_id FROM cvs WHERE id = ?", (identity["source_cv_id"],)).fetchone()
+    if not (row and row[0]):
+        row = conn.execute(
+            "SELECT candidate_id FROM cvs WHERE content_hash = ? AND candidate_id IS NOT NULL LIMIT 1",
+            (identity["content_hash"],)
+        ).fetchone()
+    keys = identity.get("keys", [])
+    if not (row and row[0]) and keys:
+        row = conn.execute(f'''
+            SELECT candidate_id FROM candidate_keys WHERE (kind, key) IN (VALUES {', '.join(['(?, ?)'] * len(keys))})
+            ORDER BY kind LIMIT 1
+        ''', [value for pair in keys for value in pair]).fetchone()
+    if not (row and row[0]) and identity.get("near_cv_id") is not None:
+        row = conn.execute(f'''
+            SELECT c.candidate_id FROM cvs c
+            WHERE c.id = ? AND NOT EXISTS (
+                SELECT 1 FROM candidate_keys k
+                WHERE k.candidate_id = c.candidate_id AND k.kind IN ({','.join('?' * len(keys))})
+            )
+        ''', [identity["near_cv_id"]] + [kind for kind, _ in keys]).fetchone()
+    candidate_id = row[0] if row and row[0] else conn.execute("INSERT INTO candidates DEFAULT VALUES").lastrowid
+    conn.executemany(
+        "INSERT OR IGNORE INTO candidate_keys (kind, key, candidate_id) VALUES (?, ?, ?)",
+        [(kind, key, candidate_id) for kind, key in keys]
+    )
+    return candidate_id
+
+def _release_content(conn: sqlite3.Connection, cv_id: int) -> Optional[int]:
+    """Hand a CV's embeddings and signature to a CV reusing them, or drop them, before its content is replaced.
+
+    Returns the CV that took them over, if any.
+    """
+    (heir,) = conn.execute("SELECT MIN(id) FROM cvs WHERE source_cv_id = ?", (cv_id,)).fetchone()
+    for table in ("cv_embeddings", "cv_signatures", "cv_signature_bands"):
+        if heir is None:
+            conn.execute(f"DELETE FROM {table} WHERE cv_id = ?", (cv_id,))
+        else:
+            conn.execute(f"UPDATE {table} SET cv_id = ? WHERE cv_id = ?", (heir, cv_id))
+    if heir is not None:
+        conn.execute("UPDATE cvs SET source_cv_id = NULL WHERE id = ?", (heir,))
+        conn.execute("UPDATE cvs SET source_cv_id = ? WHERE source_cv_id = ?", (heir, cv_id))
+    return heir
+
+def save_linked_cvs(jd_id: int, scored_cvs: List[tuple], identities: List[dict], cv_embeddings: List[dict] = None,
+                    scores: np.ndarray = None, model_name: str = None) -> tuple:
+    """Store scored CVs linked to their candidates in one transaction; a (cv_id, candidate_id, status) per CV.
+
+    A candidate has one CV per JD, so a re-upload updates that row: status is "unchanged" when the text is the same
+    and only the scores were refreshed, "updated" when its content was replaced, and "new" for an inserted row. A CV
+    whose identity has a source_cv_id reuses that CV's embeddings rather than storing a copy.
+
+    Also returns the stored CVs whose embeddings were replaced or handed over, mapped to whether they now hold
+    embeddings of their own, so the search index can be brought up to date.
+    """
+    results = []
+    moved = set()
+    try:
+        with transaction() as conn:
+            for i, (scored, identity) in enumerate(zip(scored_cvs, identities)):
+                if identity is None:
+                    # Blank CVs identify nobody and are stored unlinked
+                    cv_id = conn.execute(INSERT_CV_SQL, _cv_row(jd_id, *scored)).lastrowid
+                    if cv_embeddings:
+                        _insert_cv_embeddings(conn, _embedding_rows(cv_id, cv_embeddings[i], model_name))
+                    results.append((cv_id, None, "new"))
+                    continue
+                candidate_id = _link_candidate(conn, identity)
+                source = identity["source_cv_id"]
+                row = conn.execute(
+                    "SELECT id, content_hash, COALESCE(source_cv_id, id) FROM cvs WHERE candidate_id = ? AND jd_id = ?",
+                    (candidate_id, jd_id)
+                ).fetchone()
+                if row and (row[1] == identity["content_hash"] or row[2] == source):
+                    _, match_score, breakdown, _ = scored
+                    conn.execute(UPDATE_MATCH_SQL, (match_score, json.dumps(breakdown),
+                                                    *(breakdown.get(key) for key in BREAKDOWN_COLUMNS), row[0]))
+                    results.append((row[0], candidate_id, "unchanged"))
+                    continue
+                linked = _cv_row(jd_id, *scored) + (candidate_id, identity["content_hash"], source)
+                if row:
+                    cv_id = row[0]
+                    heir = _release_content(conn, cv_id)
+                    moved.update({cv_id, heir} - {None})
+                    conn.execute(UPDATE_LINKED_CV_SQL, linked + (cv_id,))
+                else:
+                    cv_id = conn.execute(INSERT_LINKED_CV_SQL, linked).lastrowid
+                if source is None:
+                    if cv_embeddings:
+                        _insert_cv_embeddings(conn, _embedding_rows(cv_id, cv_embeddings[i], model_name))
+                    conn.execute("INSERT OR REPLACE INTO cv_signatures (cv_id, signature) VALUES (?, ?)",
+                                 (cv_id, identity["signature"].tobytes()))
+                    conn.executemany("INSERT OR IGNORE INTO cv_signature_bands (band, bucket, cv_id) VALUES (?, ?, ?)",
+                                     [(band, bucket, cv_id) for band, bucket in identity["buckets"]])
+                results.append((cv_id, candidate_id, "updated" if row else "new"))
+            if scores is not None:
+                _insert_section_scores(conn, jd_id, [cv_id for cv_id, _, _ in results], scores)
+            holders = {cv_id for (cv_id,) in conn.execute(
+                f"SELECT id FROM cvs WHERE source_cv_id IS NULL AND id IN ({','.join('?' * len(moved))})", list(moved)
+            )}
+        logger.debug(f"Saved {len(results)} CVs for JD ID {jd_id}, "
+                     f"{sum(status != 'new' for _, _, status in results)} of them re-uploads")
+        return results, {cv_id: cv_id in holders for cv_id in moved}
+    except sqlite3.Error as e:
+        logger.error(f"Database error while saving CVs: {str(e)}", exc_info=True)
+        raise
+
+# Structured JD fields that can be edited, and those stored as JSON
+JD_FIELDS = ("title", "summary", "skills", "responsibilities", "requirements", "keywords", "education", "experience",
+             "projects", "field_of_study", "industry")
+JD_JSON_FIELDS = {"skills", "responsibilities", "requirements", "keywords", "education", "projects"}
+
+def save_jd_update(jd_id: int, fields: dict, embeddings: dict, cv_ids: List[int], scores: np.ndarray,
+                   matches: List[tuple], model_name: str):
+    """Write edited JD fields, the JD's embeddings and its candidates' re-computed scores in one transaction.
+
+    matches holds a (match_score, match_breakdown) pair for each of cv_ids, in the same order as the rows of scores.
+    """
+    columns = [field for field in JD_FIELDS if field in fields]
+    values = [json.dumps(fields[c]) if c in JD_JSON_FIELDS else fields[c] for c in columns]
+    breakdown_columns = ", ".join(f"{column} = ?" for column in BREAKDOWN_COLUMNS.values())
+    try:
+        with transaction() as conn:
+            if columns:
+                conn.execute(f"UPDATE job_descriptions SET {', '.join(f'{c} = ?' for c in columns)} WHERE id = ?",
+                             values + [jd_id])
+            _insert_jd_embeddings(conn, _embedding_rows(jd_id, embeddings, model_name))
+            if cv_ids:
+                _insert_section_scores(conn, jd_id, cv_ids, scores)
+                conn.executemany(
+                    f"UPDATE cvs SET match_score = ?, match_breakdown = ?, {breakdown_columns} WHERE id = ? AND jd_id = ?",
+                    [
+                        (match_score, json.dumps(breakdown), *(breakdown.get(key) for key in BREAKDOWN_COLUMNS), cv_id, jd_id)
+                        for cv_id, (match_score, breakdown) in zip(cv_ids, matches)
+                    ]
+                )
+        logger.debug(f"Updated JD ID {jd_id} and re-scored {len(cv_ids)} CVs")
+    except sqlite3.Error as e:
+        logger.error(f"Database error while updating JD: {str(e)}", exc_info=True)
+        raise
+
+CANDIDATE_SORT_COLUMNS = dict({"matchScore": "match_score"}, **BREAKDOWN_COLUMNS)
+CANDIDATE_SUMMARY_COLUMNS = f"id, name, email, phone, skills, experience, match_score, {', '.join(BREAKDOWN_COLUMNS.values())}"
+
+def _candidate_summary(row: tuple) -> dict:
+    return {
+        "cvId": row[0],
+        "name": row[1],
+        "email": row[2],
+        "phone": row[3],
+        "skills": _maybe_json(row[4]) or [],
+        "experience": row[5] or 0,
+        "matchScore": round(row[6], 2),
+        "matchBreakdown": dict(zip(BREAKDOWN_COLUMNS, row[7:]))
+    }
+
+def load_candidate_summaries(cv_ids: list) -> dict:
+    """The list_candidates projection for specific CVs, keyed by cv_id."""
+    if not cv_ids:
+        return {}
+    rows = get_db_connection().execute(
+        f"SELECT {CANDIDATE_SUMMARY_COLUMNS} FROM cvs WHERE id IN ({','.join('?' * len(cv_ids))})", list(cv_ids)
+    ).fetchall()
+    return {row[0]: _candidate_summary(row) for row in rows}
+
+def candidate_list_version(jd_id: int) -> Optional[int]:
+    """Counter that changes whenever any CV of the JD is written, or None if the JD does not exist."""
+    row = get_db_connection().execute('''
+        SELECT COALESCE(v.version, 0) FROM job_descriptions j LEFT JOIN cv_list_versions v ON v.jd_id = j.id
+        WHERE j.id = ?
+    ''', (jd_id,)).fetchone()
+    return row[0] if row else None
+
+def _encode_cursor(score: float, cv_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([score, cv_id]).encode()).decode()
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        score, cv_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), int(cv_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+def list_candidates(jd_id: int, sort: str = "matchScore", descending: bool = True, limit: int = 50,
+                    cursor: Optional[str] = None, min_score: Optional[float] = None, skill: Optional[str] = None,
+                    min_experience: Optional[int] = None, max_experience: Optional[int] = None) -> dict:
+    """One page of a JD's stored candidates, ordered by a score column and paginated by (score, id) keyset."""
+    column = CANDIDATE_SORT_COLUMNS[sort]
+    where = ["jd_id = ?", f"{column} IS NOT NULL"]
+    params = [jd_id]
+    if min_score is not None:
+        where.append("match_score >= ?")
+        params.append(min_score)
+    if skill:
+        # skills is stored as a JSON array, so a substring match finds the skill in any entry
+        escaped = skill.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        where.append("skills LIKE ? ESCAPE '\\'")
+        params.append(f"%{escaped}%")
+    if min_experience is not None:
+        where.append("experience >= ?")
+        params.append(min_experience)
+    if max_experience is not None:
+        where.append("experience <= ?")
+        params.append(max_experience)
+    if cursor:
+        score, cv_id = _decode_cursor(cursor)
+        # Ties are broken by id in the opposite direction, matching the order of the (jd_id, score DESC) indexes
+        op, tie = ("<", ">") if descending else (">", "<")
+        where.append(f"({column} {op} ? OR ({column} = ? AND id {tie} ?))")
+        params += [score, score, cv_id]
+    order = f"{column} DESC, id ASC" if descending else f"{column} ASC, id DESC"
+
+    rows = get_db_connection().execute(f'''
+        SELECT {CANDIDATE_SUMMARY_COLUMNS}, {column}
+        FROM cvs WHERE {" AND ".join(where)}
+        ORDER BY {order} LIMIT ?
+    ''', params + [limit + 1]).fetchall()
+
+    candidates = [_candidate_summary(row[:-1]) for row in rows[:limit]]
+    # The cursor carries the raw (unrounded) sort value of the last row on this page
+    next_cursor = _encode_cursor(rows[limit - 1][-1], rows[limit - 1][0]) if len(rows) > limit else None
+    return {"candidates": candidates, "next_cursor": next_cursor}
+
+init_db()
@@ -12,6 +12,7 @@ interface CVUploaderProps {
 const CVUploader: FC<CVUploaderProps> = ({ onCVsProcessed, jdId }) => {
   const [isDragging, setIsDragging] = useState(false);
   const [isProcessing, setIsProcessing] = useState(false);
+  const [progress, setProgress] = useState<{ completed: number; total: number } | null>(null);
   const [uploadedFiles, setUploadedFiles] = useState<File[]>([]);
   const fileInputRef = useRef<HTMLInputElement>(null);
   const { toast } = useToast();
@@ -76,6 +77,7 @@ const CVUploader: FC<CVUploaderProps> = ({ onCVsProcessed, jdId }) => {
     if (uploadedFiles.length === 0) return;
 
     setIsProcessing(true);
+    setProgress(null);
 
     const formData = new FormData();
     uploadedFiles.forEach(file => {
@@ -83,23 +85,50 @@ const CVUploader: FC<CVUploaderProps> = ({ onCVsProcessed, jdId }) => {
     });
 
     try {
-      const response = await fetch(`http://127.0.0.1:8000/process-cvs/${jdId}`, {
+      const response = await fetch(`http://127.0.0.1:8000/process-cvs/${jdId}/stream`, {
         method: "POST",
         body: formData,
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         const errorText = await response.text();
         throw new Error(`Server responded with ${response.status}: ${errorText}`);
       }
 
-      const data = await response.json();
-      console.log("Full response from backend:", data); // Log full response
-      console.log("Received processed CVs from backend:", data.processed_cvs); // Debug log
-      onCVsProcessed(data);
+      // The backend streams one JSON event per line as each batch of CVs is scored
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      const candidates: any[] = [];
+      const failedFiles: string[] = [];
+      let buffer = "";
+
+      const handleEvent = (event: any) => {
+        if (event.type === "candidate") {
+          candidates.push(event.candidate);
+          onCVsProcessed({ processed_cvs: [...candidates] });
+        } else if (event.type === "progress") {
+          setProgress({ completed: event.completed, total: event.total });
+        } else if (event.type === "error") {
+          failedFiles.push(event.file);
+        }
+      };
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop() ?? "";
+        lines.filter(line => line.trim()).forEach(line => handleEvent(JSON.parse(line)));
+      }
+      if (buffer.trim()) handleEvent(JSON.parse(buffer));
+
+      onCVsProcessed({ processed_cvs: candidates });
       toast({
         title: "CVs Processed",
-        description: "Candidate CVs successfully analyzed.",
+        description: failedFiles.length
+          ? `${candidates.length} CVs analyzed, ${failedFiles.length} could not be processed.`
+          : "Candidate CVs successfully analyzed.",
       });
     } catch (error: any) {
       console.error("Error processing CVs:", error);
@@ -187,7 +216,7 @@ const CVUploader: FC<CVUploaderProps> = ({ onCVsProcessed, jdId }) => {
               {isProcessing ? (
                 <>
                   <div className="mr-2 h-4 w-4 animate-spin rounded-full border-2 border-current border-t-transparent"></div>
-                  Processing...
+                  {progress ? `Processing ${progress.completed}/${progress.total}...` : "Processing..."}
                 </>
               ) : (
                 <>